@@ -0,0 +1,97 @@
+"""
+Throughput benchmarks for the PSSA models.
+
+Run from the repository root with ``python benchmark/pssa_benchmark.py``.
+"""
+import random
+import time
+import tracemalloc
+
+import networkx as nx
+
+from ember.hardware.chimera import D_WAVE_2000Q, ChimeraGraph, ChimeraLattice
+from ember.pssa.model import CliqueOverlapModel, ProbabilisticSwapShiftModel
+from ember.sample import barabasi_albert_graph
+
+
+def moves_per_second(model, steps: int, shift_ratio: float = 0.3, seed: int = 0):
+    """
+    Propose, evaluate and greedily accept random moves on a model and return the rate.
+    """
+    random.seed(seed)
+    start = time.perf_counter()
+    for _ in range(steps):
+        if random.random() < shift_ratio:
+            move = model.random_shift_move(True)
+            if move is None:
+                continue
+            if model.delta_shift(move) >= 0:
+                model.shift(move)
+        else:
+            move = model.random_swap_move()
+            if model.delta_swap(move) >= 0:
+                model.swap(move)
+    return steps / (time.perf_counter() - start)
+
+
+def benchmark_construction(repeat: int = 5):
+    host = D_WAVE_2000Q()
+    guest = barabasi_albert_graph(95, "medium", seed=10)
+    for model_cls in (ProbabilisticSwapShiftModel, CliqueOverlapModel):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            model_cls(guest, host)
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"{model_cls.__name__:<28} construction {elapsed * 1000:>8.1f} ms")
+
+
+def benchmark_graph_engines(steps: int = 20000):
+    host = D_WAVE_2000Q()
+    guest = barabasi_albert_graph(95, "medium", seed=10)
+    for model_cls in (ProbabilisticSwapShiftModel, CliqueOverlapModel):
+        for engine in ("dict", "array"):
+            random.seed(0)
+            model = model_cls(guest, host, graph_engine=engine)
+            rate = moves_per_second(model, steps)
+            print(f"{model_cls.__name__:<28} engine={engine:<6} {rate:>10.0f} moves/sec")
+
+
+def _measure(build):
+    """
+    Returns: Tuple (result, seconds, peak MB allocated) of calling build.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def benchmark_large_host(sizes=(16, 32, 64, 160), steps: int = 20000):
+    """
+    Host and ProbabilisticSwapShiftModel construction on growing Chimera hosts, comparing the
+    default setup (networkx host, dictionaries, dict contact graph) with large-host mode
+    (ChimeraLattice, large_host=True, array contact graph). The guest has m * l vertices of
+    average degree 6.
+    """
+    for m in sizes:
+        guest = nx.fast_gnp_random_graph(m * 4, 6 / (m * 4), seed=m)
+        for host_cls, engine, large_host in ((ChimeraGraph, "dict", False),
+                                             (ChimeraLattice, "array", True)):
+            host, host_time, host_peak = _measure(lambda: host_cls(m, 4))
+            random.seed(0)
+            model, model_time, model_peak = _measure(
+                lambda: ProbabilisticSwapShiftModel(guest, host, graph_engine=engine,
+                                                    large_host=large_host))
+            rate = moves_per_second(model, steps)
+            print(f"m={m:<4} {host_cls.__name__:<15} host {host_time:>7.2f} s {host_peak:>8.1f} MB"
+                  f"   model {model_time:>7.2f} s {model_peak:>8.1f} MB"
+                  f"   {rate:>8.0f} moves/sec")
+
+
+if __name__ == '__main__':
+    benchmark_construction()
+    benchmark_graph_engines()
+    benchmark_large_host()
@@ -0,0 +1,45 @@
+import numpy as np
+from networkx import Graph
+
+
+def csr_adjacency(graph: Graph, num_nodes: int = None):
+    """
+    Compressed sparse row adjacency of a graph whose nodes are labelled 0..len(graph)-1.
+
+    Args:
+        graph: the graph
+        num_nodes: number of node labels, if some are missing from graph such as the faulty
+            qubits of a Chimera host. Missing nodes have no neighbours. Default len(graph).
+
+    Returns: Tuple (indptr, indices) where the neighbours of node n are
+        indices[indptr[n]:indptr[n + 1]].
+    """
+    if num_nodes is None:
+        num_nodes = len(graph)
+    edges = np.array(list(graph.edges), dtype=np.int64).reshape(-1, 2)
+    rows = np.concatenate((edges[:, 0], edges[:, 1]))
+    cols = np.concatenate((edges[:, 1], edges[:, 0]))
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+    return indptr, cols[order]
+
+
+def adjacency_matrix(graph: Graph) -> np.ndarray:
+    """
+    Dense 0/1 adjacency matrix of a graph whose nodes are labelled 0..len(graph)-1.
+    """
+    adj = np.zeros((len(graph), len(graph)), dtype=np.int8)
+    edges = np.array(list(graph.edges), dtype=np.int64).reshape(-1, 2)
+    adj[edges[:, 0], edges[:, 1]] = 1
+    adj[edges[:, 1], edges[:, 0]] = 1
+    return adj
+
+
+def read_only(array) -> np.ndarray:
+    """
+    Returns: a read-only copy of array, which may be shared between models and processes
+    """
+    array = np.array(array)
+    array.flags.writeable = False
+    return array
@@ -2,6 +2,7 @@ from random import sample
 from typing import List
 
 import dwave_networkx as dnx
+import numpy as np
 from networkx import Graph
 
 
@@ -49,6 +50,57 @@ class ChimeraGraph(Graph):
         return self.internal.subgraph(nodes)
 
 
+class ChimeraLattice:
+    """
+    Fault-free Chimera host held as a CSR adjacency instead of a networkx graph. Construction is
+    vectorised and linear in the number of qubits, which makes hosts of 10^5 qubits practical
+    where building a ChimeraGraph dominates the cost of a run. Node labels follow
+    dwave_networkx.chimera_graph.
+
+    Supports the parts of the ChimeraGraph interface the PSSA models use: params,
+    faulty_nodes, faulty_edges, len() and host[g] for the neighbours of qubit g.
+    """
+
+    def __init__(self, m, l):
+        """
+        Args:
+            m: Number of cell rows and cols in Chimera lattice topology
+            l: Number of nodes in a partition of a Chimera cell
+        """
+        self.params = (m, l)
+        self.faulty_nodes = set()
+        self.faulty_edges = set()
+
+        # Linear label of (i, j, u, k) is ((i * m + j) * 2 + u) * l + k
+        labels = np.arange(m * m * 2 * l, dtype=np.int64).reshape(m, m, 2, l)
+        intra = np.stack(np.broadcast_arrays(labels[:, :, 0, :, None], labels[:, :, 1, None, :]),
+                         axis=-1)
+        vertical = np.stack((labels[:-1, :, 0], labels[1:, :, 0]), axis=-1)
+        horizontal = np.stack((labels[:, :-1, 1], labels[:, 1:, 1]), axis=-1)
+        edges = np.concatenate([intra.reshape(-1, 2), vertical.reshape(-1, 2),
+                                horizontal.reshape(-1, 2)])
+
+        rows = np.concatenate((edges[:, 0], edges[:, 1]))
+        cols = np.concatenate((edges[:, 1], edges[:, 0]))
+        order = np.argsort(rows, kind="stable")
+        self.indptr = np.zeros(labels.size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=labels.size), out=self.indptr[1:])
+        self.indices = cols[order]
+
+    def csr(self):
+        """
+        Returns: Tuple (indptr, indices) where the neighbours of qubit g are
+            indices[indptr[g]:indptr[g + 1]].
+        """
+        return self.indptr, self.indices
+
+    def __getitem__(self, g: int) -> List[int]:
+        return self.indices[self.indptr[g]:self.indptr[g + 1]].tolist()
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+
 def D_WAVE_2000Q(**kwargs):
     return ChimeraGraph(16, 4, **kwargs)
 
@@ -0,0 +1,112 @@
+from typing import Iterable, Optional, Tuple
+
+import dwave_networkx as dnx
+import numpy as np
+
+from ember.hardware.adjacency import csr_adjacency, read_only
+from ember.hardware.chimera import ChimeraLattice
+from ember.hardware.transform import double_triangle_clique, overlap_clique
+
+__all__ = ["PreparedHost"]
+
+_SOLVERS = ("pssa", "coa", "bipartite", "quadripartite")
+# Solvers which only accept hosts without faults, and are prepared by default for those
+_FAULT_FREE_SOLVERS = ("pssa", "coa")
+
+
+class PreparedHost:
+    """
+    Host-only data of the embedding algorithms, computed once and shared by any number of
+    guests. Pass it in place of the host to ProbabilisticSwapShiftModel, CliqueOverlapModel,
+    BipartiteSat or QuadripartiteSat, or to ember.util.embed_many.
+
+    The data is held in tuples and read-only arrays and must not be modified; solvers copy
+    what they consume. A PreparedHost pickles with its data, so it can be sent to worker
+    processes once instead of being recomputed by each of them.
+    """
+
+    def __init__(self, host, solvers: Optional[Iterable[str]] = None):
+        """
+        Args:
+            host: ChimeraGraph, or a ChimeraLattice for "pssa" and "coa"
+            solvers: solvers to prepare for, any of "pssa" (ProbabilisticSwapShiftModel), "coa"
+                (CliqueOverlapModel), "bipartite" (BipartiteSat) and "quadripartite"
+                (QuadripartiteSat). "pssa" and "coa" only support hosts without faults. None
+                for "pssa" and "coa" if the host has no faults, else for none of them; the
+                template solvers are only prepared when asked for, as "quadripartite" needs
+                ortools.
+        """
+        faulty = bool(host.faulty_nodes or host.faulty_edges)
+        if solvers is None:
+            solvers = () if faulty else _FAULT_FREE_SOLVERS
+        solvers = tuple(solvers)
+        for solver in solvers:
+            if solver not in _SOLVERS:
+                raise Exception("Unsupported solver: {}".format(solver))
+            if faulty and solver in _FAULT_FREE_SOLVERS:
+                raise ValueError("Chimera graphs with faults are not supported by solver: "
+                                 "{}".format(solver))
+        self.host = host
+        self.params = tuple(host.params)
+        self.solvers = solvers
+        m, l = self.params
+        self.coordinates = dnx.chimera_coordinates(m, t=l)
+
+        # Adjacency of the models, which only accept hosts without faults
+        self.csr = None
+        if not faulty:
+            if isinstance(host, ChimeraLattice):
+                indptr, indices = host.csr()
+            else:
+                indptr, indices = csr_adjacency(host)
+            self.csr = (read_only(indptr), read_only(indices))
+        if "pssa" in solvers:
+            pattern = double_triangle_clique(host)
+            self.double_triangle_clique = _freeze(pattern[i] for i in range(len(pattern)))
+            qubits, offsets = double_triangle_clique(host, return_arrays=True)
+            labels = np.full(len(self.csr[0]) - 1, -1, dtype=np.int32)
+            labels[qubits] = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32),
+                                       np.diff(offsets))
+            # Guiding pattern chain of every qubit, -1 outside the pattern
+            self.double_triangle_labels = read_only(labels)
+        if "coa" in solvers:
+            pattern = overlap_clique(host)
+            self.overlap_clique = _freeze(pattern[i] for i in range(len(pattern)))
+        if "bipartite" in solvers:
+            from ember.template.bipartite import prepare_bipartite
+            h_groups, v_groups, adj = prepare_bipartite(host)
+            self.bipartite = (_freeze_groups(h_groups), _freeze_groups(v_groups),
+                              read_only(adj))
+        if "quadripartite" in solvers:
+            from ember.template.quadripartite import prepare_quadripartite
+            *groups, adj12, adj23, adj34, pairs = prepare_quadripartite(host)
+            self.quadripartite = tuple(_freeze_groups(group) for group in groups) + (
+                read_only(adj12), read_only(adj23), read_only(adj34),
+                {(int(i2), int(i3)): tuple((tuple(c2), tuple(c3)) for c2, c3 in value)
+                 for (i2, i3), value in pairs.items()})
+
+    @classmethod
+    def of(cls, host, solver: Optional[str]) -> "PreparedHost":
+        """
+        Args:
+            host: a host or a PreparedHost
+            solver: solver the data is needed for, None for the coordinates and adjacency only
+
+        Returns: host if it is a PreparedHost covering solver, else host prepared for solver
+        """
+        if isinstance(host, PreparedHost):
+            if solver is not None and solver not in host.solvers:
+                raise Exception("Host not prepared for solver: {}".format(solver))
+            return host
+        return cls(host, () if solver is None else (solver,))
+
+
+def _freeze(chains) -> Tuple[Tuple[int, ...], ...]:
+    return tuple(tuple(chain) for chain in chains)
+
+
+def _freeze_groups(groups) -> Tuple[Tuple[Tuple[int, ...], ...], ...]:
+    """
+    Chains of a template partition grouped by their index, see prepare_bipartite.
+    """
+    return tuple(_freeze(groups[i]) for i in range(len(groups)))
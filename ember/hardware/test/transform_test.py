@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from ember.hardware import transform
+from ember.hardware.chimera import ChimeraGraph
+from ember.hardware.transform import bipartite_with_faults, double_triangle_clique, \
+    klymko_max_clique, overlap_clique, quadripartite_with_faults, set_pattern_cache_dir
+
+host = ChimeraGraph(6, 4, node_faults=[3, 40, 77])
+patterns = [double_triangle_clique, overlap_clique, klymko_max_clique]
+templates = [bipartite_with_faults, quadripartite_with_faults]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    transform._chain_arrays.cache_clear()
+    yield
+    set_pattern_cache_dir(None)
+
+
+def test_results_are_fresh_copies():
+    pattern = double_triangle_clique(host)
+    pattern[0].append(-1)
+    assert double_triangle_clique(host)[0][-1] != -1
+
+    qubits, offsets = double_triangle_clique(host, return_arrays=True)
+    assert not qubits.flags.writeable and qubits.dtype == np.int32
+    assert [qubits[offsets[i]:offsets[i + 1]].tolist() for i in range(len(offsets) - 1)] \
+        == [double_triangle_clique(host)[i] for i in range(len(offsets) - 1)]
+
+
+def test_templates_keyed_by_faults():
+    used = {g for group in bipartite_with_faults(host) for chain in group for g in chain}
+    assert not used & host.faulty_nodes
+    assert len(used) == len(ChimeraGraph(6, 4)) - 3
+    assert len(bipartite_with_faults(ChimeraGraph(6, 4))[0]) == 6 * 4
+
+
+def test_disk_cache(tmp_path):
+    expected = [fn(host) for fn in patterns + templates]
+    # Chains already in memory are computed again and saved to the new directory
+    set_pattern_cache_dir(str(tmp_path))
+    assert [fn(host) for fn in patterns + templates] == expected
+    assert len(list(tmp_path.iterdir())) == 5
+
+    transform._chain_arrays.cache_clear()
+    assert [fn(host) for fn in patterns + templates] == expected
+
+    # A corrupt file is computed again and replaced
+    file = sorted(tmp_path.iterdir())[0]
+    file.write_bytes(file.read_bytes()[:40])
+    transform._chain_arrays.cache_clear()
+    assert [fn(host) for fn in patterns + templates] == expected
+    assert all(f.stat().st_size > 40 for f in tmp_path.iterdir())
+
+
+if __name__ == '__main__':
+    pytest.main()
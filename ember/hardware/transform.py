@@ -1,28 +1,58 @@
+import hashlib
 import math
-from typing import Dict, List
+import os
+import zipfile
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
 
 import dwave_networkx as dnx
 import numpy as np
 
+from ember.hardware.adjacency import read_only
 from ember.hardware.chimera import ChimeraGraph
 
+# Chains of a group as a pair (qubits, offsets): chain i is qubits[offsets[i]:offsets[i + 1]]
+ChainArrays = Tuple[np.ndarray, np.ndarray]
 
-def quadripartite_with_faults(chimera_graph: ChimeraGraph):
+_FORMAT_VERSION = 1
+
+# Directory of the on-disk pattern cache, see set_pattern_cache_dir
+_cache_dir = None
+
+
+def set_pattern_cache_dir(path: Optional[str]):
+    """
+    Keep the chains computed by the functions of this module in .npz files under path as well
+    as in memory, so that other processes and later runs load them instead of computing them.
+    Files are keyed by function, topology parameters and, for the templates with faults, the
+    faulty qubits. None disables the on-disk cache.
+    """
+    global _cache_dir
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+    _cache_dir = path
+    # Chains kept in memory were loaded from, or saved to, the previous directory
+    _chain_arrays.cache_clear()
+
+
+def quadripartite_with_faults(chimera_graph: ChimeraGraph, return_arrays: bool = False):
     """
     Create a quadripartite template embedding which allows for faulty nodes and edges.
 
     Args:
         chimera_graph: Chimera host to transform.
+        return_arrays: return every partition as read-only ChainArrays instead of lists.
 
     Returns: Tuple (U1, U2, U3, U4) for embedding in each respective partition.
     """
+    return _cached_chains(_quadripartite_with_faults, chimera_graph, True, return_arrays)
 
+
+def _quadripartite_with_faults(m: int, l: int, faulty) -> tuple:
     def append_nonempty(super, sub):
         if sub:
             super.append(sub)
 
-    m, l = chimera_graph.params
-    faulty = chimera_graph.faulty_nodes
     to_linear = dnx.chimera_coordinates(m, t=l).chimera_to_linear
 
     U1, U4 = [], []
@@ -70,22 +100,24 @@ def quadripartite_with_faults(chimera_graph: ChimeraGraph):
     return U1, U2, U3, U4
 
 
-def bipartite_with_faults(chimera_graph: ChimeraGraph):
+def bipartite_with_faults(chimera_graph: ChimeraGraph, return_arrays: bool = False):
     """
     Create a bipartite template embedding which allows for faulty nodes and edges.
 
     Args:
         chimera_graph: Chimera host to transform.
+        return_arrays: return every partition as read-only ChainArrays instead of lists.
 
     Returns: Tuple (left, right) for embedding in each respective partition.
     """
+    return _cached_chains(_bipartite_with_faults, chimera_graph, True, return_arrays)
+
 
+def _bipartite_with_faults(m: int, l: int, faulty) -> tuple:
     def append_nonempty(super, sub):
         if sub:
             super.append(sub)
 
-    m, l = chimera_graph.params
-    faulty = chimera_graph.faulty_nodes
     to_linear = dnx.chimera_coordinates(m, t=l).chimera_to_linear
 
     h_embed = []
@@ -117,7 +149,7 @@ def bipartite_with_faults(chimera_graph: ChimeraGraph):
     return h_embed, v_embed
 
 
-def overlap_clique(chimera_graph: ChimeraGraph):
+def overlap_clique(chimera_graph: ChimeraGraph, return_arrays: bool = False):
     """
     Returns a clique overlap template embedding as described in 'Template-based minor embedding
     for adiabatic quantum optimization'.
@@ -128,10 +160,14 @@ def overlap_clique(chimera_graph: ChimeraGraph):
 
     Args:
         chimera_graph: Chimera host to transform.
+        return_arrays: return the chains as read-only ChainArrays instead of a dictionary.
 
     Returns: an embedding.
     """
-    m, l = chimera_graph.params
+    return _cached_chains(_overlap_clique, chimera_graph, False, return_arrays)
+
+
+def _overlap_clique(m: int, l: int, faulty) -> tuple:
     to_linear = dnx.chimera_coordinates(m, t=l).chimera_to_linear
 
     # Embed the clique major
@@ -155,12 +191,11 @@ def overlap_clique(chimera_graph: ChimeraGraph):
         for j in range(cell, m - 1):
             bot_embed[i].append(to_linear((j + 1, cell, 0, unit)))
 
-    combined = top_embed + bot_embed
-
-    return {i: combined[i] for i in range(len(combined))}
+    return (top_embed + bot_embed,)
 
 
-def double_triangle_clique(chimera_graph: ChimeraGraph) -> Dict[int, List[int]]:
+def double_triangle_clique(chimera_graph: ChimeraGraph, return_arrays: bool = False) \
+        -> Dict[int, List[int]]:
     """
     Performs a double-sided triangle embedding in a similar fashion as described by the PSSA paper.
     'Graph Minors from Simulated Annealing for Annealing Machines with Sparse Connectivity'
@@ -173,12 +208,16 @@ def double_triangle_clique(chimera_graph: ChimeraGraph) -> Dict[int, List[int]]:
 
     Args:
         chimera_graph: Chimera host to transform.
+        return_arrays: return the chains as read-only ChainArrays instead of a dictionary.
 
     Returns: an embedding.
         !NOTE: The vertex sets are represented as lists but the ordering matters.
         The nodes should be ordered according to the chain formed on the hardware hardware.
     """
-    m, l = chimera_graph.params
+    return _cached_chains(_double_triangle_clique, chimera_graph, False, return_arrays)
+
+
+def _double_triangle_clique(m: int, l: int, faulty) -> tuple:
     to_linear = dnx.chimera_coordinates(m, t=l).chimera_to_linear
 
     # Embed the upper triangular
@@ -209,12 +248,11 @@ def double_triangle_clique(chimera_graph: ChimeraGraph) -> Dict[int, List[int]]:
         for j in range(cell + 1, m - 1):
             bot_embed[i].append(to_linear((j + 1, cell, 0, unit)))
 
-    combined = top_embed + bot_embed
-
-    return {i: combined[i] for i in range(len(combined))}
+    return (top_embed + bot_embed,)
 
 
-def klymko_max_clique(chimera_graph: ChimeraGraph) -> Dict[int, List[int]]:
+def klymko_max_clique(chimera_graph: ChimeraGraph, return_arrays: bool = False) \
+        -> Dict[int, List[int]]:
     """
     Algorithm adapted from 'Adiabatic Quantum Computing: Minor Embedding with Hard Faults'
 
@@ -224,10 +262,14 @@ def klymko_max_clique(chimera_graph: ChimeraGraph) -> Dict[int, List[int]]:
 
     Args:
         chimera_graph: Chimera host to transform.
+        return_arrays: return the chains as read-only ChainArrays instead of a dictionary.
 
     Returns: an embedding.
     """
-    m, l = chimera_graph.params
+    return _cached_chains(_klymko_max_clique, chimera_graph, False, return_arrays)
+
+
+def _klymko_max_clique(m: int, l: int, faulty) -> tuple:
     V = np.zeros((2 * m + 1, l * m + 2))
     for i in range(1, l * m + 2):
         if i < l:
@@ -254,6 +296,64 @@ def klymko_max_clique(chimera_graph: ChimeraGraph) -> Dict[int, List[int]]:
     V = V.T
 
     # Generate hardware and embedding (and fix 1-indexing)
-    embed = {i: [x - 1 for x in V[i] if x != 0] for i in range(l * m + 1)}
+    return ([[int(x) - 1 for x in V[i] if x != 0] for i in range(l * m + 1)],)
+
 
-    return embed
+def _cached_chains(build: Callable, chimera_graph: ChimeraGraph, faults: bool,
+                   return_arrays: bool):
+    """
+    Chains built by build(m, l, faulty) for the host, a tuple of groups of chains, taken from
+    the cache when possible. Without faults the result of build is returned as a dictionary.
+    """
+    m, l = chimera_graph.params
+    faulty = tuple(sorted(chimera_graph.faulty_nodes)) if faults else ()
+    groups = _chain_arrays(build, m, l, faulty)
+    if not return_arrays:
+        groups = tuple(_chain_lists(qubits, offsets) for qubits, offsets in groups)
+    if faults:
+        return groups
+    return groups[0] if return_arrays else dict(enumerate(groups[0]))
+
+
+@lru_cache(maxsize=64)
+def _chain_arrays(build: Callable, m: int, l: int, faulty: tuple) -> Tuple[ChainArrays, ...]:
+    file = None
+    if _cache_dir is not None:
+        key = "{}|{}".format(_FORMAT_VERSION, faulty)
+        file = os.path.join(_cache_dir, "{}_{}_{}_{}.npz".format(
+            build.__name__.lstrip("_"), m, l, hashlib.sha256(key.encode()).hexdigest()[:16]))
+        try:
+            with np.load(file, allow_pickle=False) as data:
+                if int(data["format_version"]) == _FORMAT_VERSION \
+                        and tuple(data["faulty"].tolist()) == faulty:
+                    return tuple((read_only(data["qubits_{}".format(i)]),
+                                  read_only(data["offsets_{}".format(i)]))
+                                 for i in range(int(data["groups"])))
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            # Missing, being written by another process, or corrupt
+            pass
+
+    groups = tuple(_compact(chains) for chains in build(m, l, set(faulty)))
+    if file is not None:
+        arrays = {"qubits_{}".format(i): qubits for i, (qubits, _) in enumerate(groups)}
+        arrays.update(("offsets_{}".format(i), offsets) for i, (_, offsets) in enumerate(groups))
+        tmp = file + ".tmp{}".format(os.getpid())
+        with open(tmp, "wb") as f:
+            np.savez(f, format_version=_FORMAT_VERSION, faulty=np.array(faulty, dtype=np.int64),
+                     groups=len(groups), **arrays)
+        os.replace(tmp, file)
+    return groups
+
+
+def _compact(chains: List[List[int]]) -> ChainArrays:
+    offsets = np.zeros(len(chains) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, chains), dtype=np.int64, count=len(chains)),
+              out=offsets[1:])
+    qubits = np.fromiter((g for chain in chains for g in chain), dtype=np.int32,
+                         count=offsets[-1])
+    return read_only(qubits), read_only(offsets)
+
+
+def _chain_lists(qubits: np.ndarray, offsets: np.ndarray) -> List[List[int]]:
+    qubits, offsets = qubits.tolist(), offsets.tolist()
+    return [qubits[start:stop] for start, stop in zip(offsets, offsets[1:])]
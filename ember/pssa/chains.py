@@ -0,0 +1,143 @@
+from array import array
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+
+__all__ = ["ChainStore"]
+
+
+class ChainStore:
+    """
+    Ordered chains of an embedding kept in one preallocated integer buffer, a replacement for a
+    list of deques. Chain n occupies buffer[head[n]:tail[n]] within its region
+    [lo[n], hi[n]), which leaves slack on both sides, so that appending or popping at either
+    end and reading an endpoint are O(1). A chain which outgrows its region is moved to the end
+    of the buffer with fresh slack, and the buffer is compacted once abandoned regions make up
+    most of it.
+
+    The buffer and offsets are array.array("i") rather than NumPy arrays since the models read
+    and write them one element at a time, where NumPy scalar access is several times slower;
+    np.frombuffer gives zero-copy views for bulk work.
+    """
+
+    def __init__(self, chains: Iterable[Sequence[int]], slack: int = 8):
+        """
+        Args:
+            chains: qubits of every chain, in chain order
+            slack: free entries kept on each side of a chain when it is (re)placed
+        """
+        self.slack = slack
+        self._layout([list(chain) for chain in chains])
+
+    @classmethod
+    def from_packed(cls, values: np.ndarray, lengths: np.ndarray, slack: int = 8):
+        """
+        Inverse of packed.
+        """
+        chains = np.split(np.asarray(values), np.cumsum(lengths)[:-1])
+        return cls([chain.tolist() for chain in chains], slack)
+
+    def _layout(self, chains: Sequence[Sequence[int]]):
+        self.buffer = array("i")
+        self.lo, self.hi = array("i"), array("i")
+        self.head, self.tail = array("i"), array("i")
+        for chain in chains:
+            for offsets, offset in zip((self.lo, self.hi, self.head, self.tail),
+                                       self._place(chain)):
+                offsets.append(offset)
+        self._live = len(self.buffer)
+
+    def _place(self, chain: Sequence[int]) -> Tuple[int, int, int, int]:
+        """
+        Append a region holding chain to the buffer.
+
+        Returns: Tuple (lo, hi, head, tail) of the region
+        """
+        lo = len(self.buffer)
+        pad = max(self.slack, len(chain) // 2)
+        self.buffer.extend([-1] * pad)
+        self.buffer.extend(chain)
+        self.buffer.extend([-1] * pad)
+        return lo, len(self.buffer), lo + pad, lo + pad + len(chain)
+
+    def packed(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns: Tuple (values, lengths) with the chains concatenated in chain order.
+        """
+        buffer = np.frombuffer(self.buffer, dtype=np.int32)
+        head = np.frombuffer(self.head, dtype=np.int32)
+        lengths = np.frombuffer(self.tail, dtype=np.int32) - head
+        # Index of every chain element in the buffer
+        offsets = np.repeat(head - np.cumsum(lengths) + lengths, lengths)
+        return buffer[offsets + np.arange(len(offsets))].copy(), lengths
+
+    def copy(self) -> "ChainStore":
+        other = ChainStore.__new__(ChainStore)
+        other.slack = self.slack
+        other.buffer = array("i", self.buffer)
+        other.lo, other.hi = array("i", self.lo), array("i", self.hi)
+        other.head, other.tail = array("i", self.head), array("i", self.tail)
+        other._live = self._live
+        return other
+
+    def length(self, n: int) -> int:
+        return self.tail[n] - self.head[n]
+
+    def first(self, n: int) -> int:
+        return self.buffer[self.head[n]]
+
+    def last(self, n: int) -> int:
+        return self.buffer[self.tail[n] - 1]
+
+    def append(self, n: int, g: int):
+        if self.tail[n] == self.hi[n]:
+            self._relocate(n)
+        self.buffer[self.tail[n]] = g
+        self.tail[n] += 1
+
+    def appendleft(self, n: int, g: int):
+        if self.head[n] == self.lo[n]:
+            self._relocate(n)
+        self.head[n] -= 1
+        self.buffer[self.head[n]] = g
+
+    def pop(self, n: int) -> int:
+        self.tail[n] -= 1
+        return self.buffer[self.tail[n]]
+
+    def popleft(self, n: int) -> int:
+        self.head[n] += 1
+        return self.buffer[self.head[n] - 1]
+
+    def swap(self, n1: int, n2: int):
+        """
+        Exchange the contents of chains n1 and n2 by exchanging their regions.
+        """
+        for offsets in (self.lo, self.hi, self.head, self.tail):
+            offsets[n1], offsets[n2] = offsets[n2], offsets[n1]
+
+    def permute(self, order: Sequence[int]):
+        """
+        Relabel the chains so that chain n becomes the former chain order[n].
+        """
+        for name in ("lo", "hi", "head", "tail"):
+            offsets = getattr(self, name)
+            setattr(self, name, array("i", [offsets[n] for n in order]))
+
+    def _relocate(self, n: int):
+        self._live -= self.hi[n] - self.lo[n]
+        if len(self.buffer) > 4 * self._live:
+            self._layout(list(self))
+            return
+        lo, hi, head, tail = self._place(self[n])
+        self.lo[n], self.hi[n], self.head[n], self.tail[n] = lo, hi, head, tail
+        self._live += hi - lo
+
+    def __getitem__(self, n: int) -> array:
+        return self.buffer[self.head[n]:self.tail[n]]
+
+    def __iter__(self):
+        return (self[n] for n in range(len(self)))
+
+    def __len__(self):
+        return len(self.head)
@@ -0,0 +1,77 @@
+import os
+import random
+from typing import Tuple
+
+import numpy as np
+
+from ember.pssa.model import BaseModel
+
+__all__ = ["save_checkpoint", "load_checkpoint"]
+
+_FORMAT_VERSION = 1
+
+
+def save_checkpoint(path: str, model: BaseModel, step: int, cost_best: int):
+    """
+    Write the state of an annealing run to a compressed NumPy archive: the model state (see
+    BaseModel.get_state), the step reached in the schedule, the best cost and the state of the
+    random and numpy.random generators. The file is replaced atomically, so an interrupted
+    write leaves the previous checkpoint intact.
+
+    Args:
+        path: checkpoint file
+        model: model being annealed
+        step: number of schedule steps taken
+        cost_best: cost of the embedding recorded by model.mark_best
+    """
+    version, py_rng, gauss_next = random.getstate()
+    np_rng = np.random.get_state()
+    m, l = model.host.params
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(
+            f,
+            format_version=_FORMAT_VERSION,
+            model=type(model).__name__,
+            guest_edges=model._guest_edge_array,
+            host_params=np.array([m, l]),
+            step=step,
+            cost_best=cost_best,
+            py_rng=np.array(py_rng, dtype=np.uint64),
+            py_rng_version=version,
+            py_gauss_next=np.nan if gauss_next is None else gauss_next,
+            np_rng_keys=np_rng[1],
+            np_rng_pos=np_rng[2],
+            np_rng_has_gauss=np_rng[3],
+            np_rng_cached_gaussian=np_rng[4],
+            **model.get_state())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str, model: BaseModel) -> Tuple[int, int]:
+    """
+    Restore a checkpoint written by save_checkpoint into model, which must be of the same class
+    and built on the same guest and host. The random and numpy.random generators are restored
+    as well.
+
+    Returns: Tuple (step, cost_best) as passed to save_checkpoint. The cost of the restored
+        state is model.initial_cost.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if int(data["format_version"]) != _FORMAT_VERSION:
+            raise Exception("Unsupported checkpoint version: {}".format(data["format_version"]))
+        if str(data["model"]) != type(model).__name__ \
+                or tuple(data["host_params"].tolist()) != tuple(model.host.params) \
+                or not np.array_equal(data["guest_edges"], model._guest_edge_array):
+            raise Exception("Checkpoint does not match the model: {}".format(path))
+
+        model.set_state({key: data[key]
+                         for key in ("chains", "chain_lengths", "weights", "best_labels")})
+        gauss_next = float(data["py_gauss_next"])
+        random.setstate((int(data["py_rng_version"]),
+                         tuple(int(x) for x in data["py_rng"]),
+                         None if np.isnan(gauss_next) else gauss_next))
+        np.random.set_state(("MT19937", data["np_rng_keys"], int(data["np_rng_pos"]),
+                             int(data["np_rng_has_gauss"]),
+                             float(data["np_rng_cached_gaussian"])))
+        return int(data["step"]), int(data["cost_best"])
@@ -0,0 +1,269 @@
+import random
+
+import numpy as np
+
+from ember.pssa.model import BaseModel
+
+__all__ = ["DeltaTable"]
+
+_LOWEST = np.iinfo(np.int64).min
+
+
+class DeltaTable:
+    """
+    Maintained deltas of every move in model.all_moves(), for steepest descent and tabu search.
+
+    With A the guest adjacency matrix and C the 0/1 contact matrix, both indexed by guest
+    vertex, the delta of swapping (c, d) is
+
+        D[c, d] = M[c, d] + M[d, c] - r[c] - r[d] + 2 * A[c, d] * C[c, d]
+
+    where M = C @ A and r[c] = (C * A)[c].sum(). Any move changes C by a set of flipped contact
+    edges, and flipping (u, v) only changes rows u, v of M and r, so only the rows and columns
+    of D of flipped vertices are updated, in O(flips * n). The best swap of every row (over
+    d > c) is kept alongside, so best_move takes O(n): touched rows are rescanned and other
+    rows only compare their best with their changed entries, unless their best entry dropped.
+
+    Shift deltas are cached and recomputed only if a flip touched a vertex in their
+    model.shift_scope, found through an index from vertices to the shifts watching them. If the
+    shift moves of the model change as moves are applied (model.fixed_shift_moves is False), the
+    table follows them after every shift and shift_moves is the current list.
+
+    Moves must be applied through the table to keep it in sync with the model.
+    """
+
+    def __init__(self, model: BaseModel):
+        self.model = model
+        n = len(model.guest)
+        self.adj = model.guest_adj.astype(np.int64)
+        # For the row updates as a BLAS product, exact for these small integers
+        self._adj_float = self.adj.astype(np.float64)
+        self._range = np.arange(n)
+        self._upper = np.triu(np.ones((n, n), dtype=bool), 1)
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Recompute the whole table from the model.
+        """
+        n, adj = len(self.adj), self.adj
+        self.shift_moves = list(self.model.all_moves()[1])
+        self.contact = np.zeros((n, n), dtype=np.int64)
+        for v in range(n):
+            self.contact[v, np.asarray(self.model.contact_graph.neighbours(v), dtype=np.int64)] = 1
+        m = self.contact @ adj
+        r = (self.contact * adj).sum(axis=1)
+        self.swap_deltas = m + m.T - r[:, None] - r[None, :] + 2 * adj * self.contact
+        self._row_best = np.empty(n, dtype=np.int64)
+        self._row_arg = np.empty(n, dtype=np.int64)
+        self._scan_rows(np.arange(n))
+
+        self.shift_deltas = np.array([self.model.delta_shift(z) for z in self.shift_moves],
+                                     dtype=np.int64)
+        self._shift_index = {z: i for i, z in enumerate(self.shift_moves)}
+        # Shifts whose delta depends on each vertex, and shifts of unknown scope
+        self._watchers = [set() for _ in range(n)]
+        self._unscoped = set()
+        self._shift_scopes = {}
+        for z in self.shift_moves:
+            self._watch(z, self.model.shift_scope(z))
+
+    def _scan_rows(self, rows: np.ndarray):
+        """
+        Recompute the best swap (c, d > c) of every row c in rows, the first one on ties.
+        """
+        if not len(rows):
+            return
+        vals = np.where(self._upper[rows], self.swap_deltas[rows], _LOWEST)
+        arg = vals.argmax(axis=1)
+        self._row_arg[rows] = arg
+        self._row_best[rows] = vals[np.arange(len(rows)), arg]
+
+    def _watch(self, z, scope):
+        self._shift_scopes[z] = scope
+        if scope is None:
+            self._unscoped.add(z)
+        else:
+            for n in scope:
+                self._watchers[n].add(z)
+
+    def _rewatch(self, z, scope):
+        """
+        Move z to its new scope, touching only the vertices which entered or left it.
+        """
+        old = self._shift_scopes[z]
+        if old is None or scope is None:
+            self._unwatch(z)
+            self._watch(z, scope)
+            return
+        for n in old - scope:
+            self._watchers[n].discard(z)
+        for n in scope - old:
+            self._watchers[n].add(z)
+        self._shift_scopes[z] = scope
+
+    def _unwatch(self, z):
+        scope = self._shift_scopes.pop(z)
+        if scope is None:
+            self._unscoped.discard(z)
+        else:
+            for n in scope:
+                self._watchers[n].discard(z)
+
+    def best_move(self, vertex_allowed: np.ndarray = None, shift_allowed: np.ndarray = None,
+                  tie_break: str = "first"):
+        """
+        Args:
+            vertex_allowed: boolean mask over guest vertices, swaps of vertices outside it are
+                skipped
+            shift_allowed: boolean mask over the shift moves, shifts outside it are skipped
+            tie_break: "first" picks the first best move in model.all_moves() order, swaps
+                first; "random" picks one of the best moves uniformly at random
+
+        Returns: Tuple (delta, type, move) of the best move, type being "swap" or "shift", or
+            (None, None, None) if every move is masked.
+        """
+        if tie_break not in ("first", "random"):
+            raise Exception("Unsupported tie break: {}".format(tie_break))
+        row_best, row_arg = self._row_best, self._row_arg
+        if vertex_allowed is not None:
+            # Rows whose best swap is with a masked vertex are rescanned under the mask
+            stale = np.flatnonzero(vertex_allowed & ~vertex_allowed[row_arg]
+                                   & (row_best > _LOWEST))
+            row_best = np.where(vertex_allowed, row_best, _LOWEST)
+            if len(stale):
+                row_arg = row_arg.copy()
+                vals = np.where(self._upper[stale] & vertex_allowed[None, :],
+                                self.swap_deltas[stale], _LOWEST)
+                row_arg[stale] = vals.argmax(axis=1)
+                row_best[stale] = vals[np.arange(len(stale)), row_arg[stale]]
+        shift_deltas = self.shift_deltas
+        if shift_allowed is not None:
+            shift_deltas = np.where(shift_allowed, shift_deltas, _LOWEST)
+
+        best_swap = int(row_best.max()) if len(row_best) else _LOWEST
+        best_shift = int(shift_deltas.max()) if len(shift_deltas) else _LOWEST
+        best = max(best_swap, best_shift)
+        if best == _LOWEST:
+            return None, None, None
+        if tie_break == "first":
+            if best_swap == best:
+                c = int(np.argmax(row_best))
+                return best, "swap", (c, int(row_arg[c]))
+            return best, "shift", self.shift_moves[int(np.argmax(shift_deltas))]
+
+        # Every best move in all_moves() order, swaps first
+        swaps = []
+        if best_swap == best:
+            for c in np.flatnonzero(row_best == best).tolist():
+                allowed = self._upper[c]
+                if vertex_allowed is not None:
+                    allowed = allowed & vertex_allowed
+                swaps.extend((c, d) for d in
+                             np.flatnonzero((self.swap_deltas[c] == best) & allowed).tolist())
+        shifts = np.flatnonzero(shift_deltas == best).tolist() if best_shift == best else []
+        i = random.randrange(len(swaps) + len(shifts))
+        if i < len(swaps):
+            return best, "swap", swaps[i]
+        return best, "shift", self.shift_moves[shifts[i - len(swaps)]]
+
+    def swap(self, swap_move):
+        a, b = swap_move
+        # Every other vertex adjacent to exactly one of a and b trades that contact edge
+        ks = np.flatnonzero(self.contact[a] != self.contact[b])
+        ks = ks[(ks != a) & (ks != b)]
+        sign = self.contact[b, ks] - self.contact[a, ks]
+        self.model.swap(swap_move)
+        self._flip(np.concatenate([np.full(len(ks), a), np.full(len(ks), b)]),
+                   np.concatenate([ks, ks]), np.concatenate([sign, -sign]), {a, b})
+
+    def shift(self, shift_move):
+        vertices = self.model.shift_vertices(shift_move)
+        self.model.shift(shift_move)
+        if not self.model.fixed_shift_moves:
+            self._follow_shift_moves()
+        u, v, sign = [], [], []
+        seen = np.zeros(len(self.adj), dtype=bool)
+        for n in vertices:
+            row = np.zeros(len(self.adj), dtype=np.int64)
+            row[np.asarray(self.model.contact_graph.neighbours(n), dtype=np.int64)] = 1
+            ks = np.flatnonzero((row != self.contact[n]) & ~seen)
+            u.append(np.full(len(ks), n))
+            v.append(ks)
+            sign.append(row[ks] - self.contact[n, ks])
+            seen[n] = True
+        self._flip(np.concatenate(u), np.concatenate(v), np.concatenate(sign), set(vertices))
+
+    def _follow_shift_moves(self):
+        """
+        Replace shift_moves with the current shift moves of the model, keeping the cached deltas
+        of those which remain.
+        """
+        known = self._shift_index
+        shift_moves = list(self.model.all_moves()[1])
+        index = {z: j for j, z in enumerate(shift_moves)}
+        for z in known.keys() - index.keys():
+            self._unwatch(z)
+        deltas = np.empty(len(shift_moves), dtype=np.int64)
+        for j, z in enumerate(shift_moves):
+            i = known.get(z)
+            if i is None:
+                deltas[j] = self.model.delta_shift(z)
+                self._watch(z, self.model.shift_scope(z))
+            else:
+                deltas[j] = self.shift_deltas[i]
+        self.shift_moves, self.shift_deltas, self._shift_index = shift_moves, deltas, index
+
+    def _flip(self, u: np.ndarray, v: np.ndarray, sign: np.ndarray, moved: set):
+        """
+        Apply contact edge flips (u, v) with sign +1 for added and -1 for removed edges.
+        """
+        adj = self.adj
+        rows = np.unique(np.concatenate([u, v]))
+        # Changes of the rows of flipped vertices, which D also receives as columns: flipping
+        # (u, v) adds sign * (A[v] - A[u, v]) to row u and sign * (A[u] - A[u, v]) to row v
+        iu, iv = np.searchsorted(rows, u), np.searchsorted(rows, v)
+        flips = np.zeros((len(rows), len(adj)))
+        np.add.at(flips, (iu, v), sign)
+        np.add.at(flips, (iv, u), sign)
+        a_uv = adj[u, v]
+        offset = np.bincount(np.concatenate([iu, iv]), np.tile(sign * a_uv, 2), len(rows))
+        update = np.rint(flips @ self._adj_float - offset[:, None]).astype(np.int64)
+        self.swap_deltas[rows] += update
+        self.swap_deltas[:, rows] += update.T
+        np.add.at(self.swap_deltas, (u, v), 2 * sign * a_uv)
+        np.add.at(self.swap_deltas, (v, u), 2 * sign * a_uv)
+        np.add.at(self.contact, (u, v), sign)
+        np.add.at(self.contact, (v, u), sign)
+        if len(rows):
+            self._update_row_best(rows)
+
+        dirty = set(self._unscoped)
+        for n in moved.union(rows.tolist()):
+            dirty.update(self._watchers[n])
+        for z in dirty:
+            self.shift_deltas[self._shift_index[z]] = self.model.delta_shift(z)
+            self._rewatch(z, self.model.shift_scope(z))
+
+    def _update_row_best(self, rows: np.ndarray):
+        """
+        Update the best swap of every row after the rows and columns in rows changed.
+        """
+        n, span = len(self.adj), self._range
+        touched = np.zeros(n, dtype=bool)
+        touched[rows] = True
+        # Changed entries (c, r) of the other rows, within the upper triangle r > c
+        changed = np.where(self._upper[:, rows], self.swap_deltas[:, rows], _LOWEST)
+        j = changed.argmax(axis=1)
+        cand_best = changed[span, j]
+        cand_arg = rows[j]
+        row_best, row_arg = self._row_best, self._row_arg
+        others = ~touched
+        # Rows whose best entry changed to a lower value need a rescan
+        dropped = others & touched[row_arg] & (self.swap_deltas[span, row_arg] < row_best)
+        keep = others & ~dropped
+        better = keep & ((cand_best > row_best)
+                         | ((cand_best == row_best) & (cand_arg < row_arg)))
+        row_best[better] = cand_best[better]
+        row_arg[better] = cand_arg[better]
+        self._scan_rows(np.concatenate([rows, np.flatnonzero(dropped)]))
@@ -1,8 +1,75 @@
-from typing import Dict
+import random
+from typing import Dict, Hashable, Iterable
 
+import numpy as np
 from networkx import Graph
 
 
+def contact_weights(indptr: np.ndarray, indices: np.ndarray, labels: np.ndarray,
+                    num_labels: int) -> np.ndarray:
+    """
+    Count the host edges running between every pair of chains.
+
+    Args:
+        indptr, indices: CSR adjacency of the host, see ember.hardware.adjacency.csr_adjacency
+        labels: chain label of every host node, -1 for unused nodes
+        num_labels: number of chains
+
+    Returns: symmetric (num_labels, num_labels) matrix of contact weights.
+    """
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    l1, l2 = labels[rows], labels[indices]
+    mask = (rows < indices) & (l1 >= 0) & (l2 >= 0) & (l1 != l2)
+    l1, l2 = l1[mask], l2[mask]
+    weights = np.bincount(l1 * num_labels + l2, minlength=num_labels * num_labels)
+    weights = weights.reshape(num_labels, num_labels)
+    return (weights + weights.T).astype(np.int32)
+
+
+class IndexedSet:
+    """
+    Set with O(1) insertion, removal and uniform random choice. Items are kept in a dense list
+    and removal moves the last item into the freed position.
+    """
+
+    def __init__(self, items: Iterable[Hashable] = ()):
+        self.items = []
+        self.index = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item: Hashable):
+        if item not in self.index:
+            self.index[item] = len(self.items)
+            self.items.append(item)
+
+    def remove(self, item: Hashable):
+        i = self.index.pop(item)
+        last = self.items.pop()
+        if i < len(self.items):
+            self.items[i] = last
+            self.index[last] = i
+
+    def discard(self, item: Hashable):
+        if item in self.index:
+            self.remove(item)
+
+    def choice(self):
+        return self.items[random.randrange(len(self.items))]
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __getitem__(self, i):
+        return self.items[i]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
 class MutableGraph:
     """
     This graph supports fast swapping of nodes by relabelling them.
@@ -14,7 +81,7 @@ class MutableGraph:
         if include_edges:
             for node_val, adj_dict in input_graph.adjacency():
                 for adj_val in [*adj_dict]:
-                    self.nodes[node_val].neighbours[self.nodes[adj_val]] = 0
+                    self.nodes[node_val].set_neighbour(self.nodes[adj_val], 0)
         self._dirty = True
         self._edges = self.edges
 
@@ -39,6 +106,35 @@ class MutableGraph:
         self.nodes[n1], self.nodes[n2] = self.nodes[n2], self.nodes[n1]
         self._dirty = True
 
+    def permute(self, order: Iterable[int]):
+        """
+        Relabel the nodes so that node n becomes the former node order[n].
+        """
+        self.nodes = [self.nodes[n] for n in order]
+        for n, node in enumerate(self.nodes):
+            node.val = n
+        self._dirty = True
+
+    def weight_matrix(self) -> np.ndarray:
+        """
+        Returns: (num_nodes, num_nodes) matrix of edge weights, indexed by node label.
+        """
+        rows, cols, weights = [], [], []
+        for node in self.nodes:
+            for nb, weight in node.neighbours.items():
+                rows.append(node.val)
+                cols.append(nb.val)
+                weights.append(weight)
+        matrix = np.zeros((self.num_nodes, self.num_nodes), dtype=np.int32)
+        matrix[rows, cols] = weights
+        return matrix
+
+    def neighbours(self, n: int):
+        return [nb.val for nb in self.nodes[n].neighbour_set]
+
+    def random_neighbour(self, n: int) -> int:
+        return self.nodes[n].neighbour_set.choice().val
+
     def has_edge(self, n1: int, n2: int) -> bool:
         e1 = self.nodes[n1] in self.nodes[n2].neighbours
         e2 = self.nodes[n2] in self.nodes[n1].neighbours
@@ -59,8 +155,8 @@ class MutableGraph:
             self.nodes[n1].neighbours[self.nodes[n2]] += 1
             self.nodes[n2].neighbours[self.nodes[n1]] += 1
         else:
-            self.nodes[n1].neighbours[self.nodes[n2]] = 1
-            self.nodes[n2].neighbours[self.nodes[n1]] = 1
+            self.nodes[n1].set_neighbour(self.nodes[n2], 1)
+            self.nodes[n2].set_neighbour(self.nodes[n1], 1)
             self._dirty = True
 
     def decrement_edge_weight(self, n1: int, n2: int):
@@ -68,22 +164,26 @@ class MutableGraph:
         w2 = self.nodes[n2].neighbours[self.nodes[n1]]
         assert w1 == w2
         if w1 == 1:
-            del self.nodes[n1].neighbours[self.nodes[n2]]
-            del self.nodes[n2].neighbours[self.nodes[n1]]
+            self.nodes[n1].remove_neighbour(self.nodes[n2])
+            self.nodes[n2].remove_neighbour(self.nodes[n1])
             self._dirty = True
         else:
             self.nodes[n1].neighbours[self.nodes[n2]] = w1 - 1
             self.nodes[n2].neighbours[self.nodes[n1]] = w1 - 1
 
+    def set_weights(self, weights: np.ndarray):
+        for n1, n2 in zip(*np.nonzero(np.triu(weights))):
+            self.add_edge(int(n1), int(n2), int(weights[n1, n2]))
+
     def add_edge(self, n1: int, n2: int, weight: int = 1):
         assert n1 != n2
-        self.nodes[n1].neighbours[self.nodes[n2]] = weight
-        self.nodes[n2].neighbours[self.nodes[n1]] = weight
+        self.nodes[n1].set_neighbour(self.nodes[n2], weight)
+        self.nodes[n2].set_neighbour(self.nodes[n1], weight)
         self._dirty = True
 
     def remove_edge(self, n1: int, n2: int):
-        del self.nodes[n1].neighbours[self.nodes[n2]]
-        del self.nodes[n2].neighbours[self.nodes[n1]]
+        self.nodes[n1].remove_neighbour(self.nodes[n2])
+        self.nodes[n2].remove_neighbour(self.nodes[n1])
         self._dirty = True
 
     def __str__(self):
@@ -96,6 +196,145 @@ class MutableGraph:
         return self.num_nodes
 
 
+class ArrayGraph:
+    """
+    Contact graph backed by a dense integer weight matrix. Rows and columns of the matrix are
+    indexed by slot, and a node-permutation index maps node labels to slots, so swapping two
+    nodes only exchanges two index entries. The neighbours of every slot are also kept in a
+    preallocated row of nbr_slots, so they can be walked or sampled without scanning the matrix.
+    """
+
+    def __init__(self, input_graph: Graph, include_edges: bool = True):
+        self.num_nodes = n = len(input_graph)
+        self.weights = np.zeros((n, n), dtype=np.int32)
+        self.slot = list(range(n))  # label -> slot
+        self.label = np.arange(n)  # slot -> label
+        self.nbr_slots = np.zeros((n, n), dtype=np.int32)  # first degree[s] entries are valid
+        self.nbr_pos = np.full((n, n), -1, dtype=np.int32)  # position of a slot in nbr_slots[s]
+        self.degree = np.zeros(n, dtype=np.int32)
+        if include_edges:
+            for n1, n2 in input_graph.edges:
+                self.add_edge(n1, n2)
+
+    @property
+    def edges(self):
+        s1, s2 = np.nonzero(np.triu(self.weights))
+        l1, l2 = self.label[s1], self.label[s2]
+        return set(zip(np.minimum(l1, l2).tolist(), np.maximum(l1, l2).tolist()))
+
+    def swap_node(self, n1: int, n2: int):
+        s1, s2 = self.slot[n1], self.slot[n2]
+        self.slot[n1], self.slot[n2] = s2, s1
+        self.label[s1], self.label[s2] = n2, n1
+
+    def permute(self, order: Iterable[int]):
+        """
+        Relabel the nodes so that node n becomes the former node order[n]. Only the index
+        between labels and slots changes.
+        """
+        slot = np.asarray(self.slot)[np.asarray(order)]
+        self.slot = slot.tolist()
+        self.label[slot] = np.arange(self.num_nodes)
+
+    def weight_matrix(self) -> np.ndarray:
+        """
+        Returns: (num_nodes, num_nodes) matrix of edge weights, indexed by node label.
+        """
+        return self.weights[np.ix_(self.slot, self.slot)]
+
+    def neighbours(self, n: int) -> np.ndarray:
+        s = self.slot[n]
+        return self.label[self.nbr_slots[s, :self.degree[s]]]
+
+    def random_neighbour(self, n: int) -> int:
+        s = self.slot[n]
+        return self.label.item(self.nbr_slots.item(s, random.randrange(self.degree.item(s))))
+
+    def random_neighbours(self, nodes: np.ndarray) -> np.ndarray:
+        """
+        Vectorised random_neighbour, drawing from numpy.random: a random neighbour of every
+        entry of nodes.
+        """
+        slots = np.asarray(self.slot)[nodes]
+        picks = (np.random.random(len(slots)) * self.degree[slots]).astype(np.int64)
+        return self.label[self.nbr_slots[slots, picks]]
+
+    def has_edge(self, n1: int, n2: int) -> bool:
+        return self.weights.item(self.slot[n1], self.slot[n2]) > 0
+
+    def edge_weight(self, n1: int, n2: int) -> int:
+        w = self.weights.item(self.slot[n1], self.slot[n2])
+        if w == 0:
+            raise KeyError((n1, n2))
+        return w
+
+    def increment_edge_weight(self, n1: int, n2: int):
+        s1, s2 = self.slot[n1], self.slot[n2]
+        w = self.weights.item(s1, s2) + 1
+        self.weights[s1, s2] = self.weights[s2, s1] = w
+        if w == 1:
+            self._link(s1, s2)
+
+    def decrement_edge_weight(self, n1: int, n2: int):
+        s1, s2 = self.slot[n1], self.slot[n2]
+        w = self.weights.item(s1, s2)
+        if w == 0:
+            raise KeyError((n1, n2))
+        self.weights[s1, s2] = self.weights[s2, s1] = w - 1
+        if w == 1:
+            self._unlink(s1, s2)
+
+    def set_weights(self, weights: np.ndarray):
+        self.weights[np.ix_(self.slot, self.slot)] = weights
+        self.nbr_pos.fill(-1)
+        for s in range(self.num_nodes):
+            nbs = np.flatnonzero(self.weights[s])
+            self.nbr_slots[s, :len(nbs)] = nbs
+            self.nbr_pos[s, nbs] = np.arange(len(nbs))
+            self.degree[s] = len(nbs)
+
+    def add_edge(self, n1: int, n2: int, weight: int = 1):
+        assert n1 != n2
+        s1, s2 = self.slot[n1], self.slot[n2]
+        if self.weights.item(s1, s2) == 0:
+            self._link(s1, s2)
+        self.weights[s1, s2] = self.weights[s2, s1] = weight
+
+    def remove_edge(self, n1: int, n2: int):
+        s1, s2 = self.slot[n1], self.slot[n2]
+        if self.weights.item(s1, s2) == 0:
+            raise KeyError((n1, n2))
+        self.weights[s1, s2] = self.weights[s2, s1] = 0
+        self._unlink(s1, s2)
+
+    def _link(self, s1: int, s2: int):
+        for a, b in ((s1, s2), (s2, s1)):
+            d = self.degree.item(a)
+            self.nbr_slots[a, d] = b
+            self.nbr_pos[a, b] = d
+            self.degree[a] = d + 1
+
+    def _unlink(self, s1: int, s2: int):
+        for a, b in ((s1, s2), (s2, s1)):
+            i = self.nbr_pos.item(a, b)
+            d = self.degree.item(a) - 1
+            last = self.nbr_slots.item(a, d)
+            self.nbr_slots[a, i] = last
+            self.nbr_pos[a, last] = i
+            self.nbr_pos[a, b] = -1
+            self.degree[a] = d
+
+    def __str__(self):
+        ret = ""
+        for n in range(self.num_nodes):
+            ret += "Val: {}, Neighbours: {}\n".format(
+                n, [(nb, self.edge_weight(n, nb)) for nb in self.neighbours(n).tolist()])
+        return ret
+
+    def __len__(self):
+        return self.num_nodes
+
+
 class _Node:
     """
     Internal node representation.
@@ -104,6 +343,15 @@ class _Node:
     def __init__(self, val: int, neighbours: Dict["_Node", int] = None):
         self.val = val
         self.neighbours = neighbours if neighbours is not None else {}
+        self.neighbour_set = IndexedSet(self.neighbours)
+
+    def set_neighbour(self, node: "_Node", weight: int):
+        self.neighbours[node] = weight
+        self.neighbour_set.add(node)
+
+    def remove_neighbour(self, node: "_Node"):
+        del self.neighbours[node]
+        self.neighbour_set.remove(node)
 
     def __str__(self):
         return "Val: {}, Neighbours: {}".format(
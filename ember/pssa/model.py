@@ -1,31 +1,53 @@
 import random
-from collections import deque, defaultdict
+from collections import defaultdict
 from functools import lru_cache
 from itertools import combinations
+from typing import Dict, List, Sequence, Tuple
 
-import dwave_networkx as dnx
+import numpy as np
 from networkx import Graph
 
+from ember.hardware.adjacency import adjacency_matrix
 from ember.hardware.chimera import ChimeraGraph
-from ember.hardware.transform import overlap_clique, double_triangle_clique
+from ember.hardware.prepared import PreparedHost
 from ember.hardware.transform_helper import divide_guiding_pattern
-from ember.pssa.graph import MutableGraph
+from ember.pssa.chains import ChainStore
+from ember.pssa.graph import ArrayGraph, IndexedSet, MutableGraph, contact_weights
+from ember.pssa.placement import greedy_placement
 
 __all__ = ["ProbabilisticSwapShiftModel", "CliqueOverlapModel"]
 
+_GRAPH_ENGINES = {"dict": MutableGraph, "array": ArrayGraph}
 
-class BaseModel:
 
-    def __init__(self, guest: Graph, host: ChimeraGraph):
-        if host.faulty_nodes or host.faulty_edges:
+class BaseModel:
+    # False if the shift moves returned by all_moves() change as moves are applied
+    fixed_shift_moves = True
+    # Solver name of the host data the model needs, see PreparedHost
+    _solver = None
+
+    def __init__(self, guest: Graph, host: ChimeraGraph, graph_engine: str = "dict",
+                 placement: str = "identity"):
+        base_host = host.host if isinstance(host, PreparedHost) else host
+        if base_host.faulty_nodes or base_host.faulty_edges:
             raise NotImplementedError(
                 "Chimera graphs with faults are not supported by these algorithms")
+        if graph_engine not in _GRAPH_ENGINES:
+            raise ValueError("Unsupported graph engine: {}".format(graph_engine))
+        if placement not in ("identity", "greedy"):
+            raise ValueError("Unsupported placement: {}".format(placement))
         self.guest = guest
+        self.prepared = PreparedHost.of(host, self._solver)
+        host = self.prepared.host
+        self.guest_adj = adjacency_matrix(guest)
+        self.guest_edges = tuple(guest.edges)
+        self._guest_edge_array = np.array(self.guest_edges, dtype=np.int64).reshape(-1, 2)
         self.host = host
-        m, l = host.params
-        dnx_coords = dnx.chimera_coordinates(m, t=l)
-        self.linear_to_chimera = dnx_coords.linear_to_chimera
-        self.chimera_to_linear = dnx_coords.chimera_to_linear
+        self.graph_engine = graph_engine
+        self.placement = placement
+        self.linear_to_chimera = self.prepared.coordinates.linear_to_chimera
+        self.chimera_to_linear = self.prepared.coordinates.chimera_to_linear
+        self.host_indptr, self.host_indices = self.prepared.csr
         self.forward_embed = None
 
     def _chimera_distance(self, g1: int, g2: int):
@@ -42,35 +64,198 @@ class BaseModel:
         return dist
 
     def _create_contact_graph(self, embed):
-        self.contact_graph = MutableGraph(self.guest, include_edges=False)
-        self.initial_cost = 0
-
-        for n1 in range(len(embed)):
-            e1 = embed[n1]
-            for n2 in range(n1):
-                e2 = embed[n2]
-                weight = 0
-                for g1 in e1:
-                    for g2 in e2:
-                        weight += 1 if self._chimera_distance(g1, g2) == 1 else 0
-                if weight > 0:
-                    self.contact_graph.add_edge(n1, n2, weight)
-                    self.initial_cost += 1 if self.guest.has_edge(n1, n2) else 0
+        self.contact_graph = _GRAPH_ENGINES[self.graph_engine](self.guest, include_edges=False)
+
+        labels = np.full(len(self.host_indptr) - 1, -1, dtype=np.int64)
+        for n in range(len(embed)):
+            labels[list(embed[n])] = n
+        weights = contact_weights(self.host_indptr, self.host_indices, labels, len(self.guest))
+        self.contact_graph.set_weights(weights)
+
+        self.initial_cost = int(np.count_nonzero((weights > 0) & (self.guest_adj > 0))) // 2
+
+    def _check_embedding(self, embedding: Dict[int, Sequence[int]]) -> List[List[int]]:
+        """
+        Returns: the chains of embedding, which must map every guest vertex to a nonempty chain
+            of host qubits, no two chains sharing a qubit
+        """
+        if self.placement != "identity":
+            # The placement would relabel the chains of the embedding
+            raise ValueError("Unsupported placement with an initial embedding: {}".format(
+                self.placement))
+        if sorted(embedding) != list(range(len(self.guest))):
+            raise ValueError("Embedding does not cover the guest vertices")
+        chains = [list(embedding[n]) for n in range(len(self.guest))]
+        qubits = [g for chain in chains for g in chain]
+        if not all(chains) or len(set(qubits)) != len(qubits) \
+                or not all(0 <= g < len(self.host) for g in qubits):
+            raise ValueError("Embedding chains must be nonempty and disjoint sets of host qubits")
+        return chains
+
+    def _place(self):
+        """
+        Assign the chains of the guiding pattern to guest vertices as chosen by placement and
+        record the result as the best state.
+        """
+        if self.placement == "greedy":
+            self.relabel(greedy_placement(self.guest_adj,
+                                          self.contact_graph.weight_matrix()).tolist())
+            self.mark_best()
+
+    def _reset_best(self):
+        self.best_labels = self.labels()
+        self._changed = set()
+
+    def mark_best(self):
+        """
+        Record the current state as the best one seen. Only the qubits relabelled since the
+        previous call are written.
+        """
+        for g in self._changed:
+            self.best_labels[g] = self.inverse_embed[g]
+        self._changed.clear()
+
+    def labels(self) -> np.ndarray:
+        """
+        Returns: chain label of every host qubit, -1 for unused qubits.
+        """
+        labels = np.full(len(self.host_indptr) - 1, -1, dtype=np.int32)
+        for n in range(len(self.forward_embed)):
+            labels[list(self.forward_embed[n])] = n
+        return labels
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        Arrays which together with the guest and host determine the state of the model, see
+        set_state.
+
+        Returns: dictionary with the chains concatenated in chain order ("chains") and their
+            lengths ("chain_lengths"), the contact weights ("weights") and the labels of the
+            embedding recorded by mark_best ("best_labels").
+        """
+        chains, chain_lengths = self._pack_chains()
+        return {
+            "chains": chains,
+            "chain_lengths": chain_lengths,
+            "weights": contact_weights(self.host_indptr, self.host_indices, self.labels(),
+                                       len(self.guest)),
+            "best_labels": self.best_labels.copy(),
+        }
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        """
+        Restore a state returned by get_state of a model of the same class, guest and host.
+        The contact graph is rebuilt from the stored weights and initial_cost set to the cost
+        of the restored state.
+        """
+        self.forward_embed = self._unpack_chains(state["chains"], state["chain_lengths"])
+        self.inverse_embed = self._inverse_embed(self.forward_embed)
+
+        weights = np.asarray(state["weights"], dtype=np.int32)
+        self.contact_graph = _GRAPH_ENGINES[self.graph_engine](self.guest, include_edges=False)
+        self.contact_graph.set_weights(weights)
+        self.initial_cost = int(np.count_nonzero((weights > 0) & (self.guest_adj > 0))) // 2
+
+        self.best_labels = np.asarray(state["best_labels"], dtype=np.int32).copy()
+        self._changed = set(np.flatnonzero(self.labels() != self.best_labels).tolist())
+
+    def _pack_chains(self):
+        """
+        Returns: Tuple (chains, lengths) of int32 arrays, the chains concatenated in order.
+        """
+        chains = [np.asarray(list(chain), dtype=np.int32) for chain in self.forward_embed]
+        return np.concatenate(chains), np.array([len(chain) for chain in chains], dtype=np.int32)
+
+    def _unpack_chains(self, chains: np.ndarray, lengths: np.ndarray):
+        """
+        Inverse of _pack_chains.
+        """
+        return [set(chain.tolist()) for chain in np.split(chains, np.cumsum(lengths)[:-1])]
+
+    def _swap_chains(self, n1: int, n2: int):
+        self.forward_embed[n1], self.forward_embed[n2] = \
+            self.forward_embed[n2], self.forward_embed[n1]
+
+    def _permute_chains(self, order: List[int]):
+        self.forward_embed[:] = [self.forward_embed[n] for n in order]
+
+    def _inverse_embed(self, forward_embed) -> Dict[int, int]:
+        return {g: n for n in range(len(forward_embed)) for g in forward_embed[n]}
+
+    def best_embedding(self) -> Dict[int, List[int]]:
+        """
+        Returns: the embedding recorded by the last call to mark_best.
+        """
+        emb = {i: [] for i in range(len(self.guest))}
+        qubits = np.flatnonzero(self.best_labels >= 0)
+        for g, n in zip(qubits.tolist(), self.best_labels[qubits].tolist()):
+            emb[n].append(g)
+        return emb
 
     def all_moves(self):
         pass
 
     def random_swap_move(self):
-        pass
+        n1, n1_nb = random.choice(self.guest_edges)
+        n2 = self.contact_graph.random_neighbour(n1_nb)
+        return n1, n2
 
     def random_shift_move(self, *args):
         pass
 
     def delta_swap(self, swap_move):
-        pass
+        n1, n2 = swap_move
+        diff = self.guest_adj[n2] - self.guest_adj[n1]
+        delta = int(diff[self.contact_graph.neighbours(n1)].sum()) \
+            - int(diff[self.contact_graph.neighbours(n2)].sum())
+        # The contact edge between n1 and n2 survives the swap
+        if self.guest_adj[n1, n2] and self.contact_graph.has_edge(n1, n2):
+            delta += 2
+        return delta
+
+    def random_swap_moves(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draw count swap moves at once, from the distribution of random_swap_move but with
+        numpy.random. Requires the "array" graph engine.
+
+        Returns: Tuple (n1, n2) of integer arrays
+        """
+        edges = self._guest_edge_array[np.random.randint(len(self.guest_edges), size=count)]
+        return edges[:, 0], self.contact_graph.random_neighbours(edges[:, 1])
+
+    def delta_swap_batch(self, n1: np.ndarray, n2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorised delta_swap over the moves (n1[i], n2[i]), all scored against the current
+        state. Requires the "array" graph engine.
+
+        Returns: Tuple (deltas, interactions). interactions[i, j] is the change of deltas[i]
+            once move j is applied, valid if the moves share no vertex. Applying a swap only
+            exchanges two columns of every other contact row, so the changes of several such
+            swaps add up.
+        """
+        contact = self.contact_graph
+        slot = np.asarray(contact.slot)
+        s1, s2 = slot[n1], slot[n2]
+        contacts = (contact.weights > 0).view(np.int8)
+        # Guest adjacency with its columns in slot order, to line up with the contact rows
+        adj = self.guest_adj[:, contact.label]
+        near = contacts[s1] - contacts[s2]
+        diff = adj[n2] - adj[n1]
+        deltas = (near * diff).sum(axis=1, dtype=np.int64)
+        deltas += 2 * (self.guest_adj[n1, n2] & contacts[s1, s2])
+        interactions = -(near[:, s1] - near[:, s2]) * (diff[:, s1] - diff[:, s2])
+        return deltas, interactions
 
     def swap(self, swap_move):
-        pass
+        n1, n2 = swap_move
+        self._changed.update(self.forward_embed[n1])
+        self._changed.update(self.forward_embed[n2])
+        for g1 in self.forward_embed[n1]:
+            self.inverse_embed[g1] = n2
+        for g2 in self.forward_embed[n2]:
+            self.inverse_embed[g2] = n1
+        self._swap_chains(n1, n2)
+        self.contact_graph.swap_node(n1, n2)
 
     def delta_shift(self, swap_move):
         pass
@@ -78,63 +263,232 @@ class BaseModel:
     def shift(self, swap_move):
         pass
 
-    def randomize(self):
+    def shift_vertices(self, shift_move):
+        """
+        Guest vertices whose chains shift_move changes. Every contact edge the shift adds or
+        removes has an endpoint among them.
+        """
         pass
 
+    def shift_scope(self, shift_move):
+        """
+        Guest vertices whose chains and contact edges delta_shift(shift_move) depends on, or
+        None if not known. The delta stays valid as long as none of them change.
+        """
+        return None
+
+    def shift_attribute(self, shift_move):
+        """
+        What shift_move changes, for tabu memory: a shift undoing shift_move, or applying it
+        again, changes the same attribute.
+        """
+        return shift_move
+
+    def randomize(self):
+        """
+        Assign the chains to guest vertices in random order, a restart for the descent drivers.
+        The contact graph and labels are relabelled rather than rebuilt, and initial_cost is set
+        to the cost of the new assignment.
+        """
+        order = list(range(len(self.guest)))
+        random.shuffle(order)
+        self.relabel(order)
+
+    def relabel(self, order: List[int]):
+        """
+        Make chain order[n] the chain of guest vertex n.
+        """
+        # New label of every old label, with -1 (unused qubit) kept at the end
+        new_label = np.empty(len(order) + 1, dtype=np.int64)
+        new_label[order] = np.arange(len(order))
+        new_label[-1] = -1
+        self._permute_chains(order)
+        if isinstance(self.inverse_embed, np.ndarray):
+            self.inverse_embed = new_label[self.inverse_embed].astype(np.int32)
+            self._changed.update(np.flatnonzero(self.inverse_embed >= 0).tolist())
+        else:
+            qubits = list(self.inverse_embed)
+            labels = np.fromiter(self.inverse_embed.values(), dtype=np.int64, count=len(qubits))
+            self.inverse_embed = dict(zip(qubits, new_label[labels].tolist()))
+            self._changed.update(qubits)
+
+        self.contact_graph.permute(order)
+        weights = self.contact_graph.weight_matrix()
+        self.initial_cost = int(np.count_nonzero((weights > 0) & (self.guest_adj > 0))) // 2
+
+
 class ProbabilisticSwapShiftModel(BaseModel):
     """
     Simulated annealing model which finds an embedding by swapping chains or by shifting nodes
     between chains. Uses pssa.hardware.transform.double_triangle_clique as a guiding pattern.
     """
+    fixed_shift_moves = False
+    _solver = "pssa"
 
-    def __init__(self, guest, host: ChimeraGraph):
+    def __init__(self, guest, host: ChimeraGraph, graph_engine: str = "dict",
+                 large_host: bool = False, placement: str = "identity",
+                 initial_embedding: Dict[int, Sequence[int]] = None,
+                 shift_sampler: str = "index"):
         """
         Initialize model with guest graph and host graph.
 
         Args:
             guest (nx.Graph): a guest instance
-            host (ChimeraGraph): Any Chimera host instance
+            host (ChimeraGraph): Any Chimera host instance, or a ChimeraLattice, or a
+                PreparedHost of either to share the host data between models
+            graph_engine (str): contact graph backend, either "dict" (MutableGraph) or "array"
+                (ArrayGraph)
+            large_host (bool): keep the qubit labels (inverse_embed) and the guiding pattern
+                labels in integer arrays instead of dictionaries over every host qubit. Meant
+                for hosts of 10^4 qubits and more, preferably given as a ChimeraLattice and
+                with graph_engine="array".
+            placement (str): assignment of guiding pattern chains to guest vertices, either
+                "identity" (chain i to vertex i) or "greedy" (see
+                ember.pssa.placement.greedy_placement)
+            initial_embedding (dict): start from this embedding, e.g. the best embedding of an
+                earlier run, instead of the guiding pattern. Every chain must be a path in the
+                host, in any order. Shifts keep their preference for the guiding pattern.
+                Requires placement="identity".
+            shift_sampler (str): how random_shift_move draws, either "index" (uniformly from an
+                index of the legal shifts kept up to date by every shift, see
+                _index_shift_moves) or "rejection" (a random chain end and a random legal
+                neighbour of it, or None if it has none). Rejection sampling proposes None
+                for most steps but makes shifts cheaper, and is faster per run at equal steps.
         """
-        super().__init__(guest, host)
-
-        guiding_pattern = double_triangle_clique(host)
-        initial_emb = divide_guiding_pattern(guiding_pattern, len(guest))
-
-        self.forward_embed = [deque(initial_emb[i]) for i in range(len(initial_emb))]
-        self.inverse_embed = {l: k for k, ll in initial_emb.items() for l in ll}
-        self.inverse_guiding_pattern = \
-            {l: k for k, ll in guiding_pattern.items() for l in ll}
+        if shift_sampler not in ("index", "rejection"):
+            raise ValueError("Unsupported shift sampler: {}".format(shift_sampler))
+        super().__init__(guest, host, graph_engine, placement)
+        self.large_host = large_host
+        self.shift_sampler = shift_sampler
+        # Whether the index of legal shift moves is kept, always for the "index" sampler and
+        # from the first call of all_moves for the "rejection" one
+        self._indexed = shift_sampler == "index"
+        # Neighbours of every qubit, iterated by every shift instead of the networkx host
+        indptr, indices = self.host_indptr.tolist(), self.host_indices.tolist()
+        self.host_neighbours = tuple(tuple(indices[indptr[g]:indptr[g + 1]])
+                                     for g in range(len(indptr) - 1))
+
+        guiding_pattern = dict(enumerate(self.prepared.double_triangle_clique))
+        if initial_embedding is None:
+            initial_emb = divide_guiding_pattern(guiding_pattern, len(guest))
+        else:
+            initial_emb = [self._path(n, chain)
+                           for n, chain in enumerate(self._check_embedding(initial_embedding))]
 
-        for i in range(len(host)):
-            if i not in self.inverse_embed:
-                self.inverse_embed[i] = -1
+        # Chains are paths, kept in order so that shifts can take either end
+        self.forward_embed = ChainStore(initial_emb[i] for i in range(len(initial_emb)))
+        self.inverse_embed = self._inverse_embed(self.forward_embed)
+        labels = self.prepared.double_triangle_labels
+        self.inverse_guiding_pattern = labels if large_host else dict(enumerate(labels.tolist()))
 
         self._create_contact_graph(initial_emb)
+        if self._indexed:
+            self._index_shift_moves()
+        self._reset_best()
+        self._place()
+
+    def _path(self, n: int, chain: List[int]) -> List[int]:
+        """
+        Returns: the qubits of chain n ordered as a path through the host, as shifts take
+            qubits from either end of a chain
+        """
+        members = set(chain)
+        if all(g2 in self.host_neighbours[g1] for g1, g2 in zip(chain, chain[1:])):
+            return chain
+        nbs = {g: [g_nb for g_nb in self.host_neighbours[g] if g_nb in members] for g in chain}
+        # Walk from every qubit in turn, least connected ones first, always stepping to the
+        # neighbour with the fewest unvisited neighbours
+        for start in sorted(chain, key=lambda g: len(nbs[g])):
+            path, seen = [start], {start}
+            while len(path) < len(chain):
+                options = [g for g in nbs[path[-1]] if g not in seen]
+                if not options:
+                    break
+                g = min(options, key=lambda g_nb: sum(g2 not in seen for g2 in nbs[g_nb]))
+                path.append(g)
+                seen.add(g)
+            if len(path) == len(chain):
+                return path
+        raise ValueError("Chain of vertex {} is not a path in the host: {}".format(n, chain))
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        super().set_state(state)
+        if self._indexed:
+            self._index_shift_moves()
+
+    def _pack_chains(self):
+        return self.forward_embed.packed()
+
+    def _unpack_chains(self, chains: np.ndarray, lengths: np.ndarray):
+        return ChainStore.from_packed(chains, lengths)
+
+    def _swap_chains(self, n1: int, n2: int):
+        self.forward_embed.swap(n1, n2)
+
+    def _inverse_embed(self, forward_embed):
+        """
+        Returns: chain label of every host qubit, -1 for unused qubits, as an array in
+            large_host mode and as a dictionary otherwise.
+        """
+        if self.large_host:
+            inverse_embed = np.full(len(self.host), -1, dtype=np.int32)
+            for n in range(len(forward_embed)):
+                inverse_embed[list(forward_embed[n])] = n
+            return inverse_embed
+        inverse_embed = {g: -1 for g in range(len(self.host))}
+        inverse_embed.update(super()._inverse_embed(forward_embed))
+        return inverse_embed
 
     def all_moves(self):
-        raise NotImplementedError()
+        """
+        Returns: Tuple (swaps, shifts) of every pair of guest vertices and of the legal shift
+            moves. shifts is the live index of _index_shift_moves, which changes as shifts are
+            applied; iterate over a copy while shifting.
+        """
+        if not self._indexed:
+            self._index_shift_moves()
+            self._indexed = True
+        return self._all_swap_moves(), self._any_dir_shifts
 
-    def random_swap_move(self):
-        n1, n1_nb = random.choice(tuple(self.guest.edges))
-        n2 = random.choice(tuple(
-            self.contact_graph.nodes[n1_nb].neighbours)).val
-        return n1, n2
+    @lru_cache
+    def _all_swap_moves(self):
+        return list(combinations(range(len(self.guest)), 2))
+
+    def _permute_chains(self, order):
+        # The chains themselves, and so the legal shift moves, stay the same
+        self.forward_embed.permute(order)
 
     def random_shift_move(self, any_dir=False):
+        """
+        Draw a shift as chosen by shift_sampler.
+
+        Args:
+            any_dir: allow shifts between qubits of different guiding pattern chains
+
+        Returns: shift move (g_from, g_to), or None if there is no legal shift (or, for the
+            "rejection" sampler, none at the drawn chain end)
+        """
+        if self.shift_sampler == "rejection":
+            return self._reject_shift_move(any_dir)
+        moves = self._any_dir_shifts if any_dir else self._pattern_shifts
+        if not moves:
+            return None
+        return moves.choice()
+
+    def _reject_shift_move(self, any_dir: bool):
+        chains = self.forward_embed
         n_to = random.randrange(len(self.guest))
-        if len(self.forward_embed[n_to]) < 2:
+        if chains.length(n_to) < 2:
             return None
-        g_to = self.forward_embed[n_to][0] if random.getrandbits(1) == 0 \
-            else self.forward_embed[n_to][-1]
+        g_to = chains.first(n_to) if random.getrandbits(1) == 0 else chains.last(n_to)
         cand = []
-        for g_to_nb in iter(self.host[g_to]):
+        for g_to_nb in self.host_neighbours[g_to]:
             n_to_nb = self.inverse_embed[g_to_nb]
             if n_to_nb == -1:
                 continue
             if self.inverse_embed[g_to] == n_to_nb:
                 continue
-            if self.forward_embed[n_to_nb][0] != g_to_nb \
-                    and self.forward_embed[n_to_nb][-1] != g_to_nb:
+            if chains.first(n_to_nb) != g_to_nb and chains.last(n_to_nb) != g_to_nb:
                 continue
             if any_dir:
                 cand.append(g_to_nb)
@@ -146,34 +500,67 @@ class ProbabilisticSwapShiftModel(BaseModel):
         g_from = random.choice(cand)
         return g_from, g_to
 
-    def delta_swap(self, swap_move):
-        n1, n2 = swap_move
-        delta = 0
-        for n1_nb in self.contact_graph.nodes[n1].neighbours:
-            if n2 == n1_nb.val:
-                continue
-            if self.guest.has_edge(n1, n1_nb.val):
-                delta -= 1
-            if self.guest.has_edge(n2, n1_nb.val):
-                delta += 1
-        for n2_nb in self.contact_graph.nodes[n2].neighbours:
-            if n1 == n2_nb.val:
-                continue
-            if self.guest.has_edge(n2, n2_nb.val):
-                delta -= 1
-            if self.guest.has_edge(n1, n2_nb.val):
-                delta += 1
-        return delta
+    def _index_shift_moves(self):
+        """
+        Build the index of legal shift moves. A shift (g_from, g_to) hands g_to over to the chain
+        of g_from and is legal if g_to and g_from are adjacent endpoints of different chains and
+        the chain of g_to keeps at least one qubit. _pattern_shifts holds the legal shifts within
+        a guiding pattern chain, _any_dir_shifts all of them.
 
-    def swap(self, swap_move):
-        n1, n2 = swap_move
-        for g1 in self.forward_embed[n1]:
-            self.inverse_embed[g1] = n2
-        for g2 in self.forward_embed[n2]:
-            self.inverse_embed[g2] = n1
-        self.forward_embed[n1], self.forward_embed[n2] = \
-            self.forward_embed[n2], self.forward_embed[n1]
-        self.contact_graph.swap_node(n1, n2)
+        Legality only depends on chain endpoints and lengths, which swaps leave unchanged, so the
+        index is only updated by shift, for the endpoints of the two chains involved.
+        """
+        self._pattern_shifts, self._any_dir_shifts = IndexedSet(), IndexedSet()
+        chains = self.forward_embed
+        endpoints = {g for n in range(len(chains)) for g in (chains.first(n), chains.last(n))}
+        self._update_shift_moves({}, self._shift_moves_at(endpoints))
+
+    def _shift_moves_at(self, qubits) -> Dict[tuple, bool]:
+        """
+        Returns: legal shift moves with one of qubits as g_from or g_to, mapped to whether they
+            stay within a guiding pattern chain
+        """
+        moves = {}
+        inverse_embed, inverse_guiding_pattern = self.inverse_embed, self.inverse_guiding_pattern
+        host_neighbours = self.host_neighbours
+        # Endpoints are read from the chain store's buffer directly, this is the hot path of
+        # every accepted shift
+        chains = self.forward_embed
+        buffer, head, tail = chains.buffer, chains.head, chains.tail
+        for g in qubits:
+            n = inverse_embed[g]
+            if buffer[head[n]] != g and buffer[tail[n] - 1] != g:
+                continue
+            shrinkable = tail[n] - head[n] >= 2
+            # Qubits outside the guiding pattern, possible after a warm start, are labelled -1
+            pattern = inverse_guiding_pattern[g]
+            for g_nb in host_neighbours[g]:
+                n_nb = inverse_embed[g_nb]
+                if n_nb == -1 or n_nb == n:
+                    continue
+                if buffer[head[n_nb]] != g_nb and buffer[tail[n_nb] - 1] != g_nb:
+                    continue
+                within_pattern = inverse_guiding_pattern[g_nb] == pattern != -1
+                if shrinkable:
+                    moves[g_nb, g] = within_pattern
+                if tail[n_nb] - head[n_nb] >= 2:
+                    moves[g, g_nb] = within_pattern
+        return moves
+
+    def _update_shift_moves(self, before: Dict[tuple, bool], after: Dict[tuple, bool]):
+        """
+        Replace the legal shift moves before with after in the index.
+        """
+        for shift_move, within_pattern in before.items():
+            if shift_move not in after:
+                self._any_dir_shifts.remove(shift_move)
+                if within_pattern:
+                    self._pattern_shifts.remove(shift_move)
+        for shift_move, within_pattern in after.items():
+            if shift_move not in before:
+                self._any_dir_shifts.add(shift_move)
+                if within_pattern:
+                    self._pattern_shifts.add(shift_move)
 
     def delta_shift(self, shift_move):
         g_from, g_to = shift_move
@@ -183,14 +570,14 @@ class ProbabilisticSwapShiftModel(BaseModel):
         delta = 0
 
         # Consider neighbours of g_to, increment delta for new segments added to n_from
-        for g_to_nb in iter(self.host[g_to]):
+        for g_to_nb in self.host_neighbours[g_to]:
             n_to_nb = self.inverse_embed[g_to_nb]
             if n_to_nb == -1:
                 continue
             if n_to_nb == n_from or n_to_nb == n_to:
                 continue
             if n_to_nb not in n_nb_count and not self.contact_graph.has_edge(n_from, n_to_nb) \
-                    and self.guest.has_edge(n_from, n_to_nb):
+                    and self.guest_adj[n_from, n_to_nb]:
                 delta += 1
             n_nb_count[n_to_nb] += 1
 
@@ -198,30 +585,51 @@ class ProbabilisticSwapShiftModel(BaseModel):
         for n_to_nb, count in n_nb_count.items():
             assert self.contact_graph.edge_weight(n_to_nb, n_to) >= count  # Debug
             if self.contact_graph.edge_weight(n_to_nb, n_to) == count \
-                    and self.guest.has_edge(n_to_nb, n_to):
+                    and self.guest_adj[n_to_nb, n_to]:
                 delta -= 1
         return delta
 
+    def shift_vertices(self, shift_move):
+        g_from, g_to = shift_move
+        return self.inverse_embed[g_from], self.inverse_embed[g_to]
+
+    def shift_attribute(self, shift_move):
+        # The qubit changing chains, which a shift undoing shift_move hands back
+        return shift_move[1]
+
+    def shift_scope(self, shift_move):
+        g_from, g_to = shift_move
+        scope = {self.inverse_embed[g_from], self.inverse_embed[g_to]}
+        scope.update(self.inverse_embed[g] for g in self.host_neighbours[g_to])
+        scope.discard(-1)
+        return scope
+
     def shift(self, shift_move):
         g_from, g_to = shift_move
         n_from = self.inverse_embed[g_from]
         n_to = self.inverse_embed[g_to]
 
+        chains = self.forward_embed
+        if self._indexed:
+            before = self._shift_moves_at((chains.first(n_from), chains.last(n_from),
+                                           chains.first(n_to), chains.last(n_to)))
+
         # Update forward embed
-        if self.forward_embed[n_from][-1] == g_from:
-            self.forward_embed[n_from].append(g_to)
+        if chains.last(n_from) == g_from:
+            chains.append(n_from, g_to)
         else:
-            self.forward_embed[n_from].appendleft(g_to)
-        if self.forward_embed[n_to][-1] == g_to:
-            self.forward_embed[n_to].pop()
+            chains.appendleft(n_from, g_to)
+        if chains.last(n_to) == g_to:
+            chains.pop(n_to)
         else:
-            self.forward_embed[n_to].popleft()
+            chains.popleft(n_to)
 
         # Update inverse embed
         self.inverse_embed[g_to] = n_from
+        self._changed.add(g_to)
 
         # Update contact hardware
-        for g_to_nb in iter(self.host[g_to]):
+        for g_to_nb in self.host_neighbours[g_to]:
             n_to_nb = self.inverse_embed[g_to_nb]
             if n_to_nb == -1:
                 continue
@@ -233,35 +641,53 @@ class ProbabilisticSwapShiftModel(BaseModel):
                 self.contact_graph.increment_edge_weight(n_from, n_to_nb)
                 self.contact_graph.decrement_edge_weight(n_to, n_to_nb)
 
+        if self._indexed:
+            self._update_shift_moves(before, self._shift_moves_at(
+                (chains.first(n_from), chains.last(n_from), chains.first(n_to),
+                 chains.last(n_to))))
+
 
 class CliqueOverlapModel(BaseModel):
     """
-    Simulated annealing model which finds an embedding by swapping chains or by conversion between
-    I-shaped chains, L-shaped chains and T-Shaped chains. Uses pssa.hardware.transform.overlap_clique
-    as a guiding pattern.
+    Simulated annealing model which finds an embedding by swapping chains or by conversion
+    between I-shaped chains, L-shaped chains and T-Shaped chains. Uses
+    pssa.hardware.transform.overlap_clique as a guiding pattern.
     """
+    _solver = "coa"
 
-    def __init__(self, guest, host: ChimeraGraph):
+    def __init__(self, guest, host: ChimeraGraph, graph_engine: str = "dict",
+                 placement: str = "identity", initial_embedding: Dict[int, Sequence[int]] = None):
         """
         Initialize model with guest graph and host graph.
 
         Args:
           guest (nx.Graph): a guest instance
-          host (ChimeraGraph): Any Chimera host instance
+          host (ChimeraGraph): Any Chimera host instance, or a PreparedHost of one to share the
+            host data between models
+          graph_engine (str): contact graph backend, either "dict" (MutableGraph) or "array"
+            (ArrayGraph)
+          placement (str): assignment of guiding pattern chains to guest vertices, either
+            "identity" (chain i to vertex i) or "greedy" (see
+            ember.pssa.placement.greedy_placement)
+          initial_embedding (dict): start from this embedding instead of the guiding pattern. It
+            must be a state the shifts can reach, such as the best embedding of an earlier run
+            on a guest with as many vertices. Requires placement="identity".
         """
-        super().__init__(guest, host)
-        initial_embed = overlap_clique(host)
+        super().__init__(guest, host, graph_engine, placement)
+        if initial_embedding is None:
+            initial_embed = self.prepared.overlap_clique
+        else:
+            initial_embed = self._check_embedding(initial_embedding)
 
         self.forward_embed = [set(initial_embed[i]) for i in range(len(guest))]
         self.inverse_embed = {n: i for i in range(len(guest)) for n in initial_embed[i]}
 
+        self._create_shift_tables()
+        if initial_embedding is not None:
+            self._check_overlap_states(self.prepared.overlap_clique)
         self._create_contact_graph(self.forward_embed)
-
-    def randomize(self):
-        random.shuffle(self.forward_embed)
-        self.inverse_embed = \
-            {n: i for i in range(len(self.guest)) for n in self.forward_embed[i]}
-        self._create_contact_graph(self.forward_embed)
+        self._reset_best()
+        self._place()
 
     @lru_cache
     def all_moves(self):
@@ -270,46 +696,11 @@ class CliqueOverlapModel(BaseModel):
         shifts = list(range(len(self.guest) - m * l))
         return swaps, shifts
 
-    def random_swap_move(self):
-        n1, n1_nb = random.choice(tuple(self.guest.edges))
-        n2 = random.choice(tuple(
-            self.contact_graph.nodes[n1_nb].neighbours)).val
-        return n1, n2
-
     def random_shift_move(self, *args):
         m, l = self.host.params
         z_idx = random.randint(0, len(self.guest) - m * l - 1)
         return z_idx
 
-    def delta_swap(self, swap_move):
-        n1, n2 = swap_move
-        delta = 0
-        for n1_nb in self.contact_graph.nodes[n1].neighbours:
-            if n2 == n1_nb.val:
-                continue
-            if self.guest.has_edge(n1, n1_nb.val):
-                delta -= 1
-            if self.guest.has_edge(n2, n1_nb.val):
-                delta += 1
-        for n2_nb in self.contact_graph.nodes[n2].neighbours:
-            if n1 == n2_nb.val:
-                continue
-            if self.guest.has_edge(n2, n2_nb.val):
-                delta -= 1
-            if self.guest.has_edge(n1, n2_nb.val):
-                delta += 1
-        return delta
-
-    def swap(self, swap_move):
-        n1, n2 = swap_move
-        for g1 in self.forward_embed[n1]:
-            self.inverse_embed[g1] = n2
-        for g2 in self.forward_embed[n2]:
-            self.inverse_embed[g2] = n1
-        self.forward_embed[n1], self.forward_embed[n2] = \
-            self.forward_embed[n2], self.forward_embed[n1]
-        self.contact_graph.swap_node(n1, n2)
-
     def delta_shift(self, shift_move):
         delta = 0
         n_minor, n_major, n_overlap = self._get_overlap_state(shift_move)
@@ -319,25 +710,32 @@ class CliqueOverlapModel(BaseModel):
             for n_nb in self._get_n_minors(shift_move):
                 if n_nb == n_minor:
                     continue
-                if self.guest.has_edge(n_major, n_nb):
+                if self.guest_adj[n_major, n_nb]:
                     delta -= 1
-                if self.guest.has_edge(n_minor, n_nb) \
+                if self.guest_adj[n_minor, n_nb] \
                         and not self.contact_graph.has_edge(n_minor, n_nb):
                     delta += 1
         elif n_overlap == n_minor:  # major gain, minor loss
             for n_nb in self._get_n_minors(shift_move):
                 if n_nb == n_minor:
                     continue
-                if self.guest.has_edge(n_minor, n_nb) \
+                if self.guest_adj[n_minor, n_nb] \
                         and self.contact_graph.edge_weight(n_minor, n_nb) == 1:
                     delta -= 1
-                if self.guest.has_edge(n_major, n_nb):
+                if self.guest_adj[n_major, n_nb]:
                     delta += 1
         else:
             raise Exception("Bad state")
 
         return delta
 
+    def shift_vertices(self, shift_move):
+        n_minor, n_major, _ = self._get_overlap_state(shift_move)
+        return n_minor, n_major
+
+    def shift_scope(self, shift_move):
+        return set(self._get_n_minors(shift_move)).union(self._get_overlap_state(shift_move))
+
     def shift(self, shift_move):
         n_minor, n_major, n_overlap = self._get_overlap_state(shift_move)
         if n_overlap == n_major:  # major loss, minor gain
@@ -345,6 +743,7 @@ class CliqueOverlapModel(BaseModel):
                 self.forward_embed[n_major].remove(g_nb)
                 self.forward_embed[n_minor].add(g_nb)
                 self.inverse_embed[g_nb] = n_minor
+                self._changed.add(g_nb)
             for n_nb in self._get_n_minors(shift_move):
                 if n_nb == n_minor:
                     continue
@@ -355,6 +754,7 @@ class CliqueOverlapModel(BaseModel):
                 self.forward_embed[n_major].add(g_nb)
                 self.forward_embed[n_minor].remove(g_nb)
                 self.inverse_embed[g_nb] = n_major
+                self._changed.add(g_nb)
             for n_nb in self._get_n_minors(shift_move):
                 if n_nb == n_minor:
                     continue
@@ -364,28 +764,67 @@ class CliqueOverlapModel(BaseModel):
             raise Exception("Bad state")
 
     def _get_g_minors(self, z_idx):
-        cell, unit = z_idx // 4, z_idx % 4
-        try:
-            for c in range(cell + 1):
-                yield self.chimera_to_linear((1 + cell, c, 1, unit))
-        except KeyError:
-            pass
+        return self._g_minors[z_idx]
 
     def _get_n_minors(self, z_idx):
-        cell = z_idx // 4
-        _, l = self.host.params
-        try:
-            for c in range(cell + 1):
-                for u in range(l):
-                    yield self.inverse_embed[
-                        self.chimera_to_linear((1 + cell, c, 0, u))]
-        except KeyError:
-            pass
+        inverse_embed = self.inverse_embed
+        return [inverse_embed[g] for g in self._n_minor_qubits[z_idx]]
 
     def _get_overlap_state(self, z_idx):
-        cell, unit = z_idx // 4, z_idx % 4
-        m, _ = self.host.params
+        g_minor, g_major, g_overlap = self._overlap_qubits[z_idx]
+        inverse_embed = self.inverse_embed
         # minor, major, overlap
-        return self.inverse_embed[self.chimera_to_linear((1 + cell, cell, 0, unit))], \
-               self.inverse_embed[self.chimera_to_linear((1 + cell, m - 1, 1, unit))], \
-               self.inverse_embed[self.chimera_to_linear((1 + cell, cell, 1, unit))]
+        return inverse_embed[g_minor], inverse_embed[g_major], inverse_embed[g_overlap]
+
+    def _check_overlap_states(self, guiding_pattern):
+        """
+        Check that the embedding uses the qubits of the guiding pattern and that every shift
+        finds its qubits owned by either its minor or its major chain.
+        """
+        pattern_qubits = {g for n in range(len(self.guest)) for g in guiding_pattern[n]}
+        if set(self.inverse_embed) != pattern_qubits:
+            raise ValueError("Embedding does not use the qubits of the guiding pattern")
+        for z_idx in self.all_moves()[1]:
+            n_minor, n_major, n_overlap = self._get_overlap_state(z_idx)
+            if n_overlap not in (n_minor, n_major) or any(
+                    self.inverse_embed[g] != n_overlap for g in self._g_minors[z_idx]):
+                raise ValueError("Embedding is not a state of the guiding pattern at shift "
+                                 "{}".format(z_idx))
+
+    def _create_shift_tables(self):
+        m, l = self.host.params
+        self._overlap_qubits, self._g_minors, n_minor_qubits = _overlap_tables(m, l)
+        # Qubits of chains not in the embedding are missing from inverse_embed; the neighbours
+        # of a shift end at the first of them
+        self._n_minor_qubits = []
+        for qubits in n_minor_qubits:
+            used = [g in self.inverse_embed for g in qubits] + [False]
+            self._n_minor_qubits.append(qubits[:used.index(False)])
+
+
+@lru_cache(maxsize=None)
+def _overlap_tables(m: int, l: int):
+    """
+    Host qubits read by the shift moves of CliqueOverlapModel, for every shift index z_idx up to
+    (m - 1) * l. For shift z_idx, with cell, unit = z_idx // 4, z_idx % 4:
+        overlap: qubits (1 + cell, cell, 0, unit), (1 + cell, m - 1, 1, unit) and
+            (1 + cell, cell, 1, unit) whose chains are the minor, the major and the current owner
+            of the overlap
+        g_minors: qubits (1 + cell, c, 1, unit) for c <= cell, which change owner
+        n_minors: qubits (1 + cell, c, 0, u) for c <= cell and every u, whose chains neighbour
+            the qubits in g_minors
+
+    Returns: Tuple (overlap, g_minors, n_minors) of tuples indexed by z_idx
+    """
+    def to_linear(i, j, u, k):
+        return ((m * i + j) * 2 + u) * l + k
+
+    overlap, g_minors, n_minors = [], [], []
+    for z_idx in range((m - 1) * l):
+        cell, unit = z_idx // 4, z_idx % 4
+        overlap.append((to_linear(1 + cell, cell, 0, unit), to_linear(1 + cell, m - 1, 1, unit),
+                        to_linear(1 + cell, cell, 1, unit)))
+        g_minors.append(tuple(to_linear(1 + cell, c, 1, unit) for c in range(cell + 1)))
+        n_minors.append(tuple(to_linear(1 + cell, c, 0, u)
+                              for c in range(cell + 1) for u in range(l)))
+    return tuple(overlap), tuple(g_minors), tuple(n_minors)
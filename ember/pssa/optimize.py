@@ -1,148 +1,1085 @@
-import copy
 import math
+import multiprocessing
+import os
 import random
-from itertools import cycle
-from typing import Callable, Tuple
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Sequence, Tuple, Type
 
+import numpy as np
+
+from ember.pssa.checkpoint import load_checkpoint, save_checkpoint
+from ember.pssa.delta_table import DeltaTable
 from ember.pssa.model import BaseModel
+from ember.pssa.schedule import AnnealingSchedule, scale_by_time
+from ember.pssa.telemetry import Recorder, Telemetry
+
+# Set in multi-start pool workers, see _init_multi_start_worker
+_multi_start_cancel = None
+# Shorter runs of swap steps are left to the scalar loop by batched annealing
+_MIN_BATCH = 8
+
+
+class _Budget:
+    """
+    Wall-clock budget and cancellation token of an optimizer run. The optimizers poll status()
+    every check_interval steps.
+    """
+
+    def __init__(self, time_budget: float = None, cancel=None):
+        self.deadline = None if time_budget is None else time.perf_counter() + time_budget
+        self.cancel = cancel
+
+    def status(self):
+        """
+        Returns: "cancelled" or "deadline" if the run has to stop, else None
+        """
+        if self.cancel is not None and self.cancel.is_set():
+            return "cancelled"
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return "deadline"
+        return None
+
+
+class _Monitor:
+    """
+    Counters of a run, forwarded to its Telemetry. Optimizers only create one when telemetry is
+    given and guard every use with `if monitor is not None`, so a run without telemetry does no
+    bookkeeping. Counters are only bumped on branches a step takes anyway; swap proposals are
+    derived as the steps that were not shift steps.
+    """
+
+    def __init__(self, telemetry: Telemetry, optimizer: str, optimal: int, cost: int,
+                 proposals: bool = True, acceptances: bool = True):
+        self.telemetry = telemetry
+        self.proposals = proposals
+        self.acceptances = acceptances
+        self.shift_proposals = self.shift_none = 0
+        self.swap_acceptances = self.shift_acceptances = 0
+        # Step the run started from, when resumed from a checkpoint
+        self.first_step = 0
+        # Optimizer specific counters
+        self.extra = {}
+        self.start = time.perf_counter()
+        self.next_sample = telemetry.interval
+        telemetry.on_start(optimizer, optimal, cost)
+
+    def counters(self, step: int) -> dict:
+        elapsed = time.perf_counter() - self.start
+        taken = step - self.first_step
+        counters = {"steps": step}
+        if self.proposals:
+            counters["swap_proposals"] = taken - self.shift_proposals
+            counters["shift_proposals"] = self.shift_proposals
+            counters["shift_none"] = self.shift_none
+        if self.acceptances:
+            counters["swap_acceptances"] = self.swap_acceptances
+            counters["shift_acceptances"] = self.shift_acceptances
+        counters.update(self.extra)
+        counters["elapsed"] = elapsed
+        counters["moves_per_second"] = taken / elapsed if elapsed > 0 else 0.0
+        return counters
+
+    def improved(self, step: int, cost: int):
+        self.telemetry.on_improvement(step, time.perf_counter() - self.start, cost)
+
+    def event(self, step: int, message: str):
+        self.telemetry.on_event(step, message)
+
+    def sample(self, step: int):
+        """
+        Called at the optimizer's check points, so samples are taken at the first check point
+        at least telemetry.interval steps after the previous one.
+        """
+        if step >= self.next_sample:
+            self.telemetry.on_sample(step, self.counters(step))
+            self.next_sample = step + self.telemetry.interval
+
+    def finish(self, step: int, status: str):
+        self.telemetry.on_finish(step, status, self.counters(step))
+
+
+def _monitor(telemetry: Telemetry, optimizer: str, model: BaseModel,
+             proposals: bool = True, acceptances: bool = True) -> _Monitor:
+    if telemetry is None:
+        return None
+    return _Monitor(telemetry, optimizer, len(model.guest.edges), model.initial_cost, proposals,
+                    acceptances)
+
+
+class _Checkpoints:
+    """
+    Periodic checkpoints of a run_simulated_annealing run, written at the first check point at
+    least interval steps after the previous one.
+    """
+
+    def __init__(self, path: str, interval: int, step: int):
+        self.path = path
+        self.interval = interval
+        self.next = step + interval
+
+    def check(self, model: BaseModel, step: int, cost_best: int):
+        if step >= self.next:
+            self.save(model, step, cost_best)
+
+    def save(self, model: BaseModel, step: int, cost_best: int):
+        save_checkpoint(self.path, model, step, cost_best)
+        self.next = step + self.interval
+
+
+def _finish(model: BaseModel, status: str, step: int, monitor: _Monitor, return_status: bool):
+    if monitor is not None:
+        monitor.finish(step, status)
+    emb = model.best_embedding()
+    return (emb, status) if return_status else emb
 
 
 def run_simulated_annealing(model: BaseModel,
                             schedule: Callable[[int], Tuple[float, bool, bool]],
-                            max_iterations: int):
-    print(f"Optimal: {len(model.guest.edges)}")
-    cost_best = cost = model.initial_cost
-    forward_embed_best = copy.deepcopy(model.forward_embed)
+                            max_iterations: int,
+                            time_budget: float = None,
+                            cancel=None,
+                            check_interval: int = 256,
+                            progress: str = "iterations",
+                            return_status: bool = False,
+                            telemetry: Telemetry = None,
+                            checkpoint: str = None,
+                            checkpoint_interval: int = 100000,
+                            resume: bool = False,
+                            batch_size: int = None):
+    """
+    Args:
+        model: model to anneal, its state is modified in place
+        schedule: maps a step to (temperature, shift_mode, any_dir). An AnnealingSchedule is
+            compiled a block at a time instead, see _run_compiled_simulated_annealing
+        max_iterations: number of steps
+        time_budget: maximum runtime in seconds
+        cancel: cancellation token, any object with an is_set() method such as a
+            threading.Event; the run stops once it is set
+        check_interval: number of steps between checks of time_budget and cancel
+        progress: "iterations" runs the schedule over max_iterations steps, "time" spreads
+            the same schedule over time_budget instead, see scale_by_time
+        return_status: also return why the run ended
+        telemetry: receives progress and counters, see ember.pssa.telemetry; the run is
+            silent without one
+        checkpoint: if set, the state of the run is saved to this file every
+            checkpoint_interval steps and when the run is stopped by time_budget or cancel,
+            see ember.pssa.checkpoint
+        checkpoint_interval: number of steps between checkpoints, checked every
+            check_interval steps (every block for compiled runs)
+        resume: if checkpoint exists, restore model and the random generators from it and
+            continue the schedule from the saved step. Resumes are not bit-reproducible: the
+            restored model rebuilds its move indices and contact graph neighbour lists in a
+            different order, so the same random numbers pick different moves and the run
+            diverges from an uninterrupted one, with the same schedule and statistics
+        batch_size: if set, runs of consecutive swap steps are drawn and scored up to
+            batch_size at a time, see _run_batched_simulated_annealing. Faster on schedules
+            with few shift steps. Requires an AnnealingSchedule and a model built with
+            graph_engine="array".
 
-    for step in range(max_iterations):
+    Returns: best embedding found, or if return_status is set a tuple (embedding, status)
+        with status one of "solved", "deadline", "cancelled" or "exhausted"
+    """
+    budget = _Budget(time_budget, cancel)
+    monitor = _monitor(telemetry, "run_simulated_annealing", model)
+    if progress == "time":
+        if time_budget is None:
+            raise Exception("Progress by time requires a time_budget")
+        if checkpoint is not None:
+            raise Exception("Checkpoints require progress=\"iterations\"")
+        schedule = scale_by_time(schedule, max_iterations, time_budget)
+        max_iterations = sys.maxsize
+    elif progress != "iterations":
+        raise Exception("Unsupported progress: {}".format(progress))
+    if batch_size is not None:
+        if not isinstance(schedule, AnnealingSchedule):
+            raise Exception("Batched annealing requires an AnnealingSchedule")
+        if model.graph_engine != "array":
+            raise Exception("Batched annealing requires graph_engine=\"array\"")
+
+    first_step, cost_best = 0, model.initial_cost
+    if resume and checkpoint is not None and os.path.exists(checkpoint):
+        first_step, cost_best = load_checkpoint(checkpoint, model)
+        if monitor is not None:
+            monitor.first_step = first_step
+            monitor.event(first_step, "Resumed from {} at step {}".format(checkpoint,
+                                                                          first_step))
+    else:
+        model.mark_best()
+    if cost_best == len(model.guest.edges):
+        # A warm start may already be a full embedding
+        return _finish(model, "solved", first_step, monitor, return_status)
+    checkpoints = None
+    if checkpoint is not None:
+        checkpoints = _Checkpoints(checkpoint, checkpoint_interval, first_step)
+
+    if batch_size is not None:
+        status, steps = _run_batched_simulated_annealing(model, schedule, max_iterations,
+                                                         batch_size, budget, check_interval,
+                                                         monitor, first_step, cost_best,
+                                                         checkpoints)
+    elif isinstance(schedule, AnnealingSchedule):
+        status, steps = _run_compiled_simulated_annealing(model, schedule, max_iterations,
+                                                          budget, check_interval, monitor,
+                                                          first_step, cost_best, checkpoints)
+    else:
+        status, steps = _run_simulated_annealing(model, schedule, max_iterations, budget,
+                                                 check_interval, monitor, first_step,
+                                                 cost_best, checkpoints)
+    return _finish(model, status, steps, monitor, return_status)
+
+
+def _run_simulated_annealing(model: BaseModel,
+                             schedule: Callable[[int], Tuple[float, bool, bool]],
+                             max_iterations: int, budget: _Budget, check_interval: int,
+                             monitor: _Monitor, first_step: int, cost_best: int,
+                             checkpoints: _Checkpoints):
+    """
+    Runs steps first_step to max_iterations - 1 from the state of model, whose best recorded
+    embedding has cost cost_best.
+
+    Returns: Tuple (status, steps) of the run
+    """
+    cost = model.initial_cost
+
+    for step in range(first_step, max_iterations):
+        if step % check_interval == 0:
+            status = budget.status()
+            if status:
+                if checkpoints is not None:
+                    checkpoints.save(model, step, cost_best)
+                return status, step
+            if monitor is not None:
+                monitor.sample(step)
+            if checkpoints is not None:
+                checkpoints.check(model, step, cost_best)
         temperature, shift_mode, any_dir = schedule(step)
-        if not shift_mode:  # swap
-            swap_move = model.random_swap_move()
-            delta = model.delta_swap(swap_move)
-        else:  # shift
-            shift_move = model.random_shift_move(any_dir)
-            if not shift_move:
-                continue
-            delta = model.delta_shift(shift_move)
+        delta = _metropolis_step(model, temperature, shift_mode, any_dir, monitor)
+        if delta:
+            cost += delta
+            if cost_best < cost:
+                cost_best = cost
+                model.mark_best()
+                if monitor is not None:
+                    monitor.improved(step, cost_best)
+                if cost_best == len(model.guest.edges):
+                    return "solved", step + 1
+
+    return "exhausted", max_iterations
+
+
+def _run_compiled_simulated_annealing(model: BaseModel, schedule: AnnealingSchedule,
+                                      max_iterations: int, budget: _Budget,
+                                      check_interval: int, monitor: _Monitor, first_step: int,
+                                      cost_best: int, checkpoints: _Checkpoints):
+    """
+    Simulated annealing over a precompiled schedule. Per step only the move is drawn and scored;
+    the Metropolis test is a comparison against the step's precomputed threshold.
+
+    Checkpoints are taken between blocks, before the next block is compiled, so that a resumed
+    run draws the same random numbers (though not the same moves, see run_simulated_annealing).
+
+    Returns: Tuple (status, steps) of the run
+    """
+    cost = model.initial_cost
+
+    for start in range(first_step, max_iterations, schedule.block_size):
+        if checkpoints is not None:
+            checkpoints.check(model, start, cost_best)
+        thresholds, shift_mode, any_dir = schedule.block(
+            start, min(start + schedule.block_size, max_iterations))
+        for i, threshold, shift, any_dir_step in zip(range(len(thresholds)), thresholds.tolist(),
+                                                     shift_mode.tolist(), any_dir.tolist()):
+            if i % check_interval == 0:
+                status = budget.status()
+                if status:
+                    if checkpoints is not None:
+                        checkpoints.save(model, start + i, cost_best)
+                    return status, start + i
+                if monitor is not None:
+                    monitor.sample(start + i)
+            if shift:
+                shift_move = model.random_shift_move(any_dir_step)
+                if monitor is not None:
+                    monitor.shift_proposals += 1
+                    monitor.shift_none += shift_move is None
+                if shift_move is None:
+                    continue
+                delta = model.delta_shift(shift_move)
+                if delta <= threshold:
+                    continue
+                model.shift(shift_move)
+                if monitor is not None:
+                    monitor.shift_acceptances += 1
+            else:
+                swap_move = model.random_swap_move()
+                delta = model.delta_swap(swap_move)
+                if delta <= threshold:
+                    continue
+                model.swap(swap_move)
+                if monitor is not None:
+                    monitor.swap_acceptances += 1
+
+            cost += delta
+            if cost_best < cost:
+                cost_best = cost
+                model.mark_best()
+                if monitor is not None:
+                    monitor.improved(start + i, cost_best)
+                if cost_best == len(model.guest.edges):
+                    return "solved", start + i + 1
+
+    return "exhausted", max_iterations
+
+
+def _run_batched_simulated_annealing(model: BaseModel, schedule: AnnealingSchedule,
+                                     max_iterations: int, batch_size: int, budget: _Budget,
+                                     check_interval: int, monitor: _Monitor, first_step: int,
+                                     cost_best: int, checkpoints: _Checkpoints):
+    """
+    Simulated annealing over a precompiled schedule which handles runs of consecutive swap
+    steps together. The moves of up to batch_size such steps are drawn and scored at once
+    against the state at the start of the run, see model.delta_swap_batch. Walking the run in
+    order, the score of a move is corrected for the swaps accepted before it, which is exact
+    for moves sharing no vertex with them; moves which do share one are rejected. Shift steps
+    and runs shorter than _MIN_BATCH are taken one by one as in
+    _run_compiled_simulated_annealing.
+
+    Returns: Tuple (status, steps) of the run
+    """
+    cost = model.initial_cost
+    next_check = first_step
 
-        try:
-            ans = math.exp(delta / temperature)
-        except:
-            ans = float("inf")
+    for start in range(first_step, max_iterations, schedule.block_size):
+        if checkpoints is not None:
+            checkpoints.check(model, start, cost_best)
+        stop = min(start + schedule.block_size, max_iterations)
+        thresholds, shift_mode, any_dir = schedule.block(start, stop)
+        # Offset of the first shift step at or after every step of the block
+        shifts = np.flatnonzero(shift_mode)
+        next_shift = np.append(shifts, stop - start)[
+            np.searchsorted(shifts, np.arange(stop - start))].tolist()
+        threshold_list, shift_list, any_dir_list = \
+            thresholds.tolist(), shift_mode.tolist(), any_dir.tolist()
 
-        if ans > random.random():
-            if shift_mode:
-                # noinspection PyUnboundLocalVariable
+        i = 0
+        while i < stop - start:
+            if start + i >= next_check:
+                next_check = start + i + check_interval
+                status = budget.status()
+                if status:
+                    if checkpoints is not None:
+                        checkpoints.save(model, start + i, cost_best)
+                    return status, start + i
+                if monitor is not None:
+                    monitor.sample(start + i)
+
+            if next_shift[i] - i >= _MIN_BATCH:
+                run = min(next_shift[i], i + batch_size) - i
+                n1, n2 = model.random_swap_moves(run)
+                deltas, interactions = model.delta_swap_batch(n1, n2)
+                shared = (n1[:, None] == n1) | (n1[:, None] == n2) | (n2[:, None] == n1) \
+                    | (n2[:, None] == n2)
+                run_thresholds = thresholds[i:i + run]
+                blocked = np.zeros(run, dtype=bool)
+                j = 0
+                while True:
+                    passed = np.flatnonzero((deltas[j:] > run_thresholds[j:]) & ~blocked[j:])
+                    if not len(passed):
+                        break
+                    j += passed.item(0)
+                    model.swap((n1.item(j), n2.item(j)))
+                    if monitor is not None:
+                        monitor.swap_acceptances += 1
+                    cost += deltas.item(j)
+                    if cost_best < cost:
+                        cost_best = cost
+                        model.mark_best()
+                        if monitor is not None:
+                            monitor.improved(start + i + j, cost_best)
+                        if cost_best == len(model.guest.edges):
+                            return "solved", start + i + j + 1
+                    deltas += interactions[:, j]
+                    blocked |= shared[:, j]
+                    j += 1
+                i += run
+                continue
+
+            threshold = threshold_list[i]
+            if shift_list[i]:
+                shift_move = model.random_shift_move(any_dir_list[i])
+                i += 1
+                if monitor is not None:
+                    monitor.shift_proposals += 1
+                    monitor.shift_none += shift_move is None
+                if shift_move is None:
+                    continue
+                delta = model.delta_shift(shift_move)
+                if delta <= threshold:
+                    continue
                 model.shift(shift_move)
+                if monitor is not None:
+                    monitor.shift_acceptances += 1
             else:
-                # noinspection PyUnboundLocalVariable
+                swap_move = model.random_swap_move()
+                i += 1
+                delta = model.delta_swap(swap_move)
+                if delta <= threshold:
+                    continue
                 model.swap(swap_move)
+                if monitor is not None:
+                    monitor.swap_acceptances += 1
+
             cost += delta
             if cost_best < cost:
                 cost_best = cost
-                forward_embed_best = copy.deepcopy(model.forward_embed)
-                print("Updated best cost: {}".format(cost_best))
+                model.mark_best()
+                if monitor is not None:
+                    monitor.improved(start + i - 1, cost_best)
                 if cost_best == len(model.guest.edges):
-                    print("Solution found")
-                    return _to_dwave_embedding(forward_embed_best)
+                    return "solved", start + i
+
+    return "exhausted", max_iterations
+
+
+def _metropolis_step(model: BaseModel, temperature: float, shift_mode: bool, any_dir: bool,
+                     monitor: _Monitor = None) -> int:
+    """
+    Propose a random move and apply it if it passes the Metropolis test.
 
-    print("No solution found")
-    return _to_dwave_embedding(forward_embed_best)
+    Returns: the change in cost, 0 if the move was rejected
+    """
+    if not shift_mode:  # swap
+        swap_move = model.random_swap_move()
+        delta = model.delta_swap(swap_move)
+    else:  # shift
+        shift_move = model.random_shift_move(any_dir)
+        if monitor is not None:
+            monitor.shift_proposals += 1
+            monitor.shift_none += shift_move is None
+        if shift_move is None:
+            return 0
+        delta = model.delta_shift(shift_move)
+
+    try:
+        ans = math.exp(delta / temperature)
+    except:
+        ans = float("inf")
+
+    if ans > random.random():
+        if shift_mode:
+            # noinspection PyUnboundLocalVariable
+            model.shift(shift_move)
+            if monitor is not None:
+                monitor.shift_acceptances += 1
+        else:
+            # noinspection PyUnboundLocalVariable
+            model.swap(swap_move)
+            if monitor is not None:
+                monitor.swap_acceptances += 1
+        return delta
+    return 0
+
+
+def run_parallel_tempering(model: BaseModel,
+                           temperatures: Sequence[float],
+                           move_schedule: Callable[[int], Tuple[bool, bool]],
+                           max_iterations: int,
+                           exchange_interval: int = 1000,
+                           seed: int = None,
+                           time_budget: float = None,
+                           cancel=None,
+                           check_interval: int = 256,
+                           return_status: bool = False,
+                           telemetry: Telemetry = None):
+    """
+    Parallel tempering (replica exchange). One replica of model runs per temperature, each in
+    its own worker process. Every exchange_interval steps the replicas at neighbouring
+    temperatures swap temperatures with the usual Metropolis criterion, alternating between
+    even and odd pairs. All workers stop once any replica finds a full embedding.
+
+    Args:
+        model: model to copy into every replica, its own state is left unchanged
+        temperatures: ascending temperature ladder, one replica per entry
+        move_schedule: maps a replica's step to (shift_mode, any_dir); sent to the workers so
+            it must be picklable
+        max_iterations: number of steps per replica
+        exchange_interval: number of steps between exchanges
+        seed: base seed of the worker RNGs, replica i uses seed + i
+        time_budget: maximum runtime in seconds
+        cancel: cancellation token, any object with an is_set() method
+        check_interval: number of steps between checks of the workers' stop event
+        return_status: also return why the run ended
+        telemetry: receives progress and counters, see ember.pssa.telemetry. Steps count the
+            steps of one replica and are reported at exchanges, along with the counters
+            exchanges_proposed and exchanges_accepted.
+
+    Returns: best embedding found by any replica, or if return_status is set a tuple
+        (embedding, status) with status one of "solved", "deadline", "cancelled" or "exhausted"
+    """
+    if any(t <= 0 for t in temperatures) or list(temperatures) != sorted(temperatures):
+        raise Exception("Unsupported temperature ladder: {}".format(temperatures))
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+
+    budget = _Budget(time_budget, cancel)
+    optimal = len(model.guest.edges)
+    monitor = _monitor(telemetry, "run_parallel_tempering", model, proposals=False,
+                       acceptances=False)
+    if monitor is not None:
+        monitor.extra.update(exchanges_proposed=0, exchanges_accepted=0)
+    ctx = multiprocessing.get_context()
+    # Set by the first replica to solve, or by this process when the budget runs out
+    stop = ctx.Event()
+    pipes, workers = [], []
+    for i in range(len(temperatures)):
+        parent, child = ctx.Pipe()
+        worker = ctx.Process(target=_tempering_worker,
+                             args=(model, move_schedule, seed + i, child, stop, check_interval),
+                             daemon=True)
+        worker.start()
+        # Only the worker holds its end, so that the pipe closes if the worker dies
+        child.close()
+        pipes.append(parent)
+        workers.append(worker)
+
+    # order[k] is the replica currently at temperatures[k]
+    order = list(range(len(temperatures)))
+    cost_best = model.initial_cost
+    status = "exhausted"
+    done = 0
+    try:
+        for start in range(0, max_iterations, exchange_interval):
+            status = budget.status() or "exhausted"
+            if status != "exhausted":
+                break
+            steps = min(exchange_interval, max_iterations - start)
+            for k, replica in enumerate(order):
+                pipes[replica].send((temperatures[k], steps))
+            costs = []
+            for pipe, worker in zip(pipes, workers):
+                cost, replica_best = _tempering_receive(pipe, worker, stop, budget)
+                costs.append(cost)
+                if cost_best < replica_best:
+                    cost_best = replica_best
+                    if monitor is not None:
+                        monitor.improved(start + steps, cost_best)
+            done = start + steps
+            if monitor is not None:
+                monitor.sample(done)
+            if cost_best == optimal:
+                status = "solved"
+                break
+            status = budget.status() or "exhausted"
+            if status != "exhausted":
+                break
+
+            for k in range(start // exchange_interval % 2, len(order) - 1, 2):
+                i, j = order[k], order[k + 1]
+                x = (1 / temperatures[k] - 1 / temperatures[k + 1]) * (costs[j] - costs[i])
+                accepted = x >= 0 or math.exp(x) > random.random()
+                if accepted:
+                    order[k], order[k + 1] = j, i
+                if monitor is not None:
+                    monitor.extra["exchanges_proposed"] += 1
+                    monitor.extra["exchanges_accepted"] += accepted
+
+        results = []
+        for pipe, worker in zip(pipes, workers):
+            pipe.send(None)
+            results.append(_tempering_receive(pipe, worker, stop, budget))
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join(timeout=1)
+            if worker.is_alive():
+                worker.terminate()
+
+    if monitor is not None:
+        monitor.finish(done, status)
+    emb = max(results, key=lambda result: result[0])[1]
+    return (emb, status) if return_status else emb
+
+
+class _ReplicaFailure:
+    """
+    Sent by a tempering worker in place of its answer when the replica raised.
+    """
+
+    def __init__(self, trace: str):
+        self.trace = trace
+
+
+def _tempering_receive(pipe, worker, stop, budget: _Budget):
+    """
+    Wait for the answer of a replica, setting stop once the budget runs out.
+
+    Returns: the answer, raises if the replica failed or its process died
+    """
+    while not pipe.poll(0.01):
+        if not stop.is_set() and budget.status():
+            stop.set()
+        if not worker.is_alive() and not pipe.poll():
+            break
+    try:
+        answer = pipe.recv()
+    except EOFError:
+        # The pipe closes when the process dies
+        worker.join(timeout=1)
+        raise Exception("Tempering replica exited with code {}".format(worker.exitcode))
+    if isinstance(answer, _ReplicaFailure):
+        raise Exception("Tempering replica failed:\n{}".format(answer.trace))
+    return answer
+
+
+def _tempering_worker(model: BaseModel, move_schedule: Callable[[int], Tuple[bool, bool]],
+                      seed: int, pipe, stop, check_interval: int):
+    """
+    Process target of a replica, sending a _ReplicaFailure back if the replica raises.
+    """
+    try:
+        _tempering_replica(model, move_schedule, seed, pipe, stop, check_interval)
+    except Exception:
+        pipe.send(_ReplicaFailure(traceback.format_exc()))
+
+
+def _tempering_replica(model: BaseModel, move_schedule: Callable[[int], Tuple[bool, bool]],
+                       seed: int, pipe, stop, check_interval: int):
+    """
+    Replica loop of run_parallel_tempering. Receives (temperature, steps) and answers with
+    (cost, best cost) until it receives None, then answers with (best cost, best embedding).
+    """
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    optimal = len(model.guest.edges)
+    cost_best = cost = model.initial_cost
+    model.mark_best()
+    if cost_best == optimal:
+        stop.set()
+    step = 0
+
+    while True:
+        request = pipe.recv()
+        if request is None:
+            pipe.send((cost_best, model.best_embedding()))
+            return
+        temperature, steps = request
+        for _ in range(steps):
+            shift_mode, any_dir = move_schedule(step)
+            step += 1
+            delta = _metropolis_step(model, temperature, shift_mode, any_dir)
+            if delta:
+                cost += delta
+                if cost_best < cost:
+                    cost_best = cost
+                    model.mark_best()
+                    if cost_best == optimal:
+                        stop.set()
+            if step % check_interval == 0 and stop.is_set():
+                break
+        pipe.send((cost, cost_best))
+
+
+def run_multi_start(model_cls: Type[BaseModel],
+                    guest,
+                    host,
+                    schedule: Callable[[int], Tuple[float, bool, bool]],
+                    max_iterations: int,
+                    num_runs: int,
+                    processes: int = None,
+                    seed: int = None,
+                    time_budget: float = None,
+                    cancel=None,
+                    check_interval: int = 256,
+                    progress: str = "iterations",
+                    return_status: bool = False,
+                    telemetry: Telemetry = None,
+                    **model_kwargs):
+    """
+    Independent simulated annealing runs from distinct seeds in a process pool. Once one run
+    finds a full embedding the others are cancelled.
+
+    Args:
+        model_cls: model to build in each run, e.g. CliqueOverlapModel
+        guest: guest graph
+        host: host ChimeraGraph
+        schedule: as for run_simulated_annealing; sent to the workers so it must be picklable
+        max_iterations: number of steps per run
+        num_runs: number of runs, at most processes of them in parallel
+        processes: pool size, defaults to the number of CPUs
+        seed: base seed, run i uses seed + i for model construction and annealing
+        time_budget: maximum runtime of the whole call in seconds
+        cancel: cancellation token, any object with an is_set() method
+        check_interval: number of steps between a run's checks for cancellation
+        progress: "iterations" or "time", as for run_simulated_annealing. With "time" each
+            run spreads the schedule over what is left of time_budget when it starts.
+        return_status: also return why the call ended
+        telemetry: receives progress and counters, see ember.pssa.telemetry. It is called in
+            this process as runs complete: steps are summed over completed runs, every run is
+            reported as an event and the counters hold runs and steps.
+        **model_kwargs: passed to model_cls
+
+    Returns: Tuple (embedding, runs). embedding is the first full embedding found, or else the
+        best over all runs, or None if no run completed. runs holds one dictionary per run that
+        was started, in order of completion, with keys seed, iterations, walltime, cost and
+        solved. Walltime covers model construction and annealing, in seconds. If return_status
+        is set, a third entry holds one of "solved", "deadline", "cancelled" or "exhausted".
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    if progress == "time" and time_budget is None:
+        raise Exception("Progress by time requires a time_budget")
+    if progress not in ("iterations", "time"):
+        raise Exception("Unsupported progress: {}".format(progress))
+    budget = _Budget(time_budget, cancel)
+    # Absolute, so that it can be compared across processes
+    deadline = None if time_budget is None else time.time() + time_budget
+
+    optimal = len(guest.edges)
+    monitor = None
+    if telemetry is not None:
+        # The initial cost depends on the seed of each run
+        monitor = _Monitor(telemetry, "run_multi_start", optimal, None, proposals=False,
+                           acceptances=False)
+        monitor.extra["runs"] = 0
+    steps = 0
+    ctx = multiprocessing.get_context()
+    stop = ctx.Event()
+    best, runs, status = None, [], budget.status() or "exhausted"
+    if status != "exhausted":
+        stop.set()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx,
+                             initializer=_init_multi_start_worker,
+                             initargs=(stop,)) as pool:
+        pending = {pool.submit(_multi_start_run, model_cls, guest, host, schedule,
+                               max_iterations, seed + i, model_kwargs, check_interval,
+                               deadline, progress)
+                   for i in range(num_runs)}
+        while pending:
+            done, pending = wait(pending, timeout=0.01, return_when=FIRST_COMPLETED)
+            if status == "exhausted" and budget.status():
+                status = budget.status()
+                stop.set()
+                for other in pending:
+                    other.cancel()
+            for future in done:
+                if future.cancelled():
+                    continue
+                report = future.result()
+                emb = report.pop("embedding")
+                runs.append(report)
+                steps += report["iterations"]
+                if monitor is not None:
+                    monitor.extra["runs"] += 1
+                    monitor.event(steps, "Run with seed {}: cost {} after {} steps in {:.2f}s"
+                                  .format(report["seed"], report["cost"], report["iterations"],
+                                          report["walltime"]))
+                if best is None or best[0] < report["cost"]:
+                    best = report["cost"], emb
+                    if monitor is not None:
+                        monitor.improved(steps, best[0])
+                if report["solved"] and status != "solved":
+                    status = "solved"
+                    stop.set()
+                    for other in pending:
+                        other.cancel()
+
+    if monitor is not None:
+        monitor.finish(steps, status)
+    # No run reports if all of them are cancelled before they start
+    emb = None if best is None else best[1]
+    return (emb, runs, status) if return_status else (emb, runs)
+
+
+def _init_multi_start_worker(stop):
+    global _multi_start_cancel
+    _multi_start_cancel = stop
+
+
+def _multi_start_run(model_cls: Type[BaseModel], guest, host,
+                     schedule: Callable[[int], Tuple[float, bool, bool]], max_iterations: int,
+                     seed: int, model_kwargs: dict, check_interval: int, deadline: float,
+                     progress: str) -> dict:
+    """
+    One run of run_multi_start, stopping early when the pool's stop event is set or the
+    deadline (as time.time()) passes.
+    """
+    start = time.perf_counter()
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    model = model_cls(guest, host, **model_kwargs)
+    time_budget = None if deadline is None else max(deadline - time.time(), 1e-3)
+    # Reports the steps taken and the best cost
+    recorder = Recorder(interval=sys.maxsize)
+    emb, status = run_simulated_annealing(model, schedule, max_iterations,
+                                          time_budget=time_budget,
+                                          cancel=_multi_start_cancel,
+                                          check_interval=check_interval, progress=progress,
+                                          return_status=True, telemetry=recorder)
+    return {
+        "seed": seed,
+        "iterations": recorder.counters["steps"],
+        "walltime": time.perf_counter() - start,
+        "cost": recorder.best_costs[-1][2],
+        "solved": status == "solved",
+        "embedding": emb,
+    }
 
 
 def run_steepest_descent_with_kicks(model: BaseModel, kicks: int,
-                                    max_iterations: int):
-    print(f"Optimal: {len(model.guest.edges)}")
+                                    max_iterations: int,
+                                    time_budget: float = None,
+                                    cancel=None,
+                                    check_interval: int = 1,
+                                    return_status: bool = False,
+                                    telemetry: Telemetry = None):
+    """
+    Args:
+        model: model to optimize, its state is modified in place
+        kicks: number of random moves applied at a local optimum
+        max_iterations: number of steps
+        time_budget: maximum runtime in seconds
+        cancel: cancellation token, any object with an is_set() method
+        check_interval: number of steps between checks of time_budget and cancel
+        return_status: also return why the run ended
+        telemetry: receives progress and counters, see ember.pssa.telemetry; kicks are
+            reported as events
+
+    Returns: best embedding found, or if return_status is set a tuple (embedding, status)
+        with status one of "solved", "deadline", "cancelled" or "exhausted"
+    """
+    budget = _Budget(time_budget, cancel)
+    monitor = _monitor(telemetry, "run_steepest_descent_with_kicks", model, proposals=False)
 
     cost_best = cost = model.initial_cost
-    forward_embed_best = copy.deepcopy(model.forward_embed)
+    model.mark_best()
+    if cost_best == len(model.guest.edges):
+        return _finish(model, "solved", 0, monitor, return_status)
 
-    swap_moves, shift_moves = model.all_moves()
-    moves = [("swap", move) for move in swap_moves]
-    moves += [("shift", move) for move in shift_moves]
+    swap_moves, _ = model.all_moves()
+    # Deltas of all moves, updated incrementally as moves are applied
+    table = DeltaTable(model)
 
     for step in range(max_iterations):
-        best_delta, best_move, type = 0, None, None
-        for move in swap_moves:
-            delta = model.delta_swap(move)
-            if delta > best_delta:
-                best_delta, best_move, type = delta, move, "swap"
-        for move in shift_moves:
-            delta = model.delta_shift(move)
-            if delta > best_delta:
-                best_delta, best_move, type = delta, move, "shift"
+        if step % check_interval == 0:
+            status = budget.status()
+            if status:
+                return _finish(model, status, step, monitor, return_status)
+            if monitor is not None:
+                monitor.sample(step)
+        best_delta, type, best_move = table.best_move()
         if best_delta > 0:
-            print( f"\tStep: {step}\tCost: {cost}\tBest Cost: {cost_best}\tDelta: {best_delta}")
             if type == "swap":
-                model.swap(best_move)
+                table.swap(best_move)
             elif type == "shift":
-                model.shift(best_move)
+                table.shift(best_move)
+            if monitor is not None:
+                monitor.swap_acceptances += type == "swap"
+                monitor.shift_acceptances += type == "shift"
             cost += best_delta
             if cost_best < cost:
                 cost_best = cost
-                forward_embed_best = copy.deepcopy(model.forward_embed)
-                print(f"Updated best cost: {cost_best}")
+                model.mark_best()
+                if monitor is not None:
+                    monitor.improved(step, cost_best)
                 if cost_best == len(model.guest.edges):
-                    print("Solution found")
-                    return _to_dwave_embedding(forward_embed_best)
+                    return _finish(model, "solved", step + 1, monitor, return_status)
         else:
             for _ in range(kicks):
-                type, move = random.choice(moves)
-                if type == "swap":
-                    delta = model.delta_swap(move)
-                    model.swap(move)
-                elif type == "shift":
+                # Shift moves are taken from the table, which follows them as they change
+                i = random.randrange(len(swap_moves) + len(table.shift_moves))
+                if i < len(swap_moves):
+                    delta = model.delta_swap(swap_moves[i])
+                    table.swap(swap_moves[i])
+                else:
+                    move = table.shift_moves[i - len(swap_moves)]
                     delta = model.delta_shift(move)
-                    model.shift(move)
-                # noinspection PyUnboundLocalVariable
+                    table.shift(move)
                 cost += delta
-            print(f"Performed random restart with new cost: {cost}")
-    return _to_dwave_embedding(forward_embed_best)
+            if monitor is not None:
+                monitor.event(step, f"Performed random restart with new cost: {cost}")
+    return _finish(model, "exhausted", max_iterations, monitor, return_status)
+
+
+def run_tabu_search(model: BaseModel, max_iterations: int, tenure: int = 30,
+                    shift_tenure: int = None,
+                    time_budget: float = None,
+                    cancel=None,
+                    check_interval: int = 1,
+                    return_status: bool = False,
+                    telemetry: Telemetry = None):
+    """
+    Tabu search over the swap and shift moves of model.all_moves(). Every step applies the best
+    admissible move, even a worsening one. Vertices moved by a swap are tabu for tenure steps.
+    What a shift changes, see model.shift_attribute (the qubit handed to another chain for
+    ProbabilisticSwapShiftModel), is tabu for shift_tenure steps, so that no shift undoes or
+    repeats it meanwhile. A tabu move is still admissible if it leads to a new best cost
+    (aspiration). If no move is admissible, the best tabu move is applied.
+
+    Args:
+        model: model to optimize, its state is modified in place
+        max_iterations: number of steps
+        tenure: steps a swapped vertex stays tabu, randomised by up to 50% to avoid cycles
+        shift_tenure: steps a shifted attribute stays tabu, defaults to tenure
+        time_budget: maximum runtime in seconds
+        cancel: cancellation token, any object with an is_set() method
+        check_interval: number of steps between checks of time_budget and cancel
+        return_status: also return why the run ended
+        telemetry: receives progress and counters, see ember.pssa.telemetry
+
+    Returns: best embedding found, or if return_status is set a tuple (embedding, status)
+        with status one of "solved", "deadline", "cancelled" or "exhausted"
+    """
+    if shift_tenure is None:
+        shift_tenure = tenure
+    budget = _Budget(time_budget, cancel)
+    monitor = _monitor(telemetry, "run_tabu_search", model, proposals=False)
+
+    cost_best = cost = model.initial_cost
+    model.mark_best()
+    if cost_best == len(model.guest.edges):
+        return _finish(model, "solved", 0, monitor, return_status)
+
+    table = DeltaTable(model)
+    # Step until which each vertex / shift attribute is tabu, shifts are keyed by attribute
+    # since the table's list of them changes for models without fixed_shift_moves
+    vertex_tabu = np.zeros(len(model.guest), dtype=np.int64)
+    shift_tabu = {}
+
+    for step in range(max_iterations):
+        if step % check_interval == 0:
+            status = budget.status()
+            if status:
+                return _finish(model, status, step, monitor, return_status)
+            if monitor is not None:
+                monitor.sample(step)
+        best = delta, type, move = table.best_move(tie_break="random")
+        if type is None:
+            # No moves at all
+            return _finish(model, "exhausted", step, monitor, return_status)
+        if cost + delta <= cost_best:
+            shift_allowed = np.fromiter(
+                (shift_tabu.get(model.shift_attribute(z), 0) <= step
+                 for z in table.shift_moves), dtype=bool, count=len(table.shift_moves))
+            delta, type, move = table.best_move(vertex_tabu <= step, shift_allowed,
+                                                tie_break="random")
+            if type is None:
+                # Every move is tabu, waiting for tenures to expire would stall the search
+                delta, type, move = best
+
+        if type == "swap":
+            table.swap(move)
+            vertex_tabu[list(move)] = step + tenure + random.randint(0, tenure // 2)
+        elif type == "shift":
+            table.shift(move)
+            shift_tabu[model.shift_attribute(move)] = \
+                step + shift_tenure + random.randint(0, shift_tenure // 2)
+        if monitor is not None:
+            monitor.swap_acceptances += type == "swap"
+            monitor.shift_acceptances += type == "shift"
+        cost += delta
+        if cost_best < cost:
+            cost_best = cost
+            model.mark_best()
+            if monitor is not None:
+                monitor.improved(step, cost_best)
+            if cost_best == len(model.guest.edges):
+                return _finish(model, "solved", step + 1, monitor, return_status)
+
+    return _finish(model, "exhausted", max_iterations, monitor, return_status)
+
+
+def _cycle_moves(model: BaseModel):
+    """
+    Repeatedly yield (type, move) for every move of model.all_moves(), swaps first. Shift moves
+    of a model without fixed_shift_moves are read anew on each pass and skipped once they stop
+    being legal. Stops after a pass without moves.
+    """
+    swap_moves, shift_moves = model.all_moves()
+    while True:
+        moved = False
+        for move in swap_moves:
+            moved = True
+            yield "swap", move
+        for move in list(shift_moves):
+            if model.fixed_shift_moves or move in shift_moves:
+                moved = True
+                yield "shift", move
+        if not moved:
+            return
 
 
 def run_next_descent_with_random_restarts(model: BaseModel,
-                                          max_iterations: int):
-    print(f"Optimal: {len(model.guest.edges)}")
+                                          max_iterations: int,
+                                          time_budget: float = None,
+                                          cancel=None,
+                                          check_interval: int = 256,
+                                          return_status: bool = False,
+                                          telemetry: Telemetry = None):
+    """
+    Args:
+        model: model to optimize, its state is modified in place
+        max_iterations: number of moves evaluated
+        time_budget: maximum runtime in seconds
+        cancel: cancellation token, any object with an is_set() method
+        check_interval: number of steps between checks of time_budget and cancel
+        return_status: also return why the run ended
+        telemetry: receives progress and counters, see ember.pssa.telemetry; restarts are
+            reported as events
+
+    Returns: best embedding found, or if return_status is set a tuple (embedding, status)
+        with status one of "solved", "deadline", "cancelled" or "exhausted"
+    """
+    budget = _Budget(time_budget, cancel)
+    monitor = _monitor(telemetry, "run_next_descent_with_random_restarts", model)
 
     cost_best = cost = model.initial_cost
-    forward_embed_best = copy.deepcopy(model.forward_embed)
+    model.mark_best()
+    if cost_best == len(model.guest.edges):
+        return _finish(model, "solved", 0, monitor, return_status)
 
     swap_moves, shift_moves = model.all_moves()
-    moves = [("swap", move) for move in swap_moves]
-    moves += [("shift", move) for move in shift_moves]
 
-    iter = 0
-    for step, (type, move) in zip(range(max_iterations), cycle(moves)):
+    iter, step = 0, -1
+    for step, (type, move) in zip(range(max_iterations), _cycle_moves(model)):
+        if step % check_interval == 0:
+            status = budget.status()
+            if status:
+                return _finish(model, status, step, monitor, return_status)
+            if monitor is not None:
+                monitor.sample(step)
         if type == "swap":
             delta = model.delta_swap(move)
         elif type == "shift":
             delta = model.delta_shift(move)
+        if monitor is not None:
+            monitor.shift_proposals += type == "shift"
         # noinspection PyUnboundLocalVariable
         if delta > 0:
-            print(f"\tStep: {step}\tCost: {cost}\tBest Cost: {cost_best}\tDelta: {delta}")
             if type == "swap":
                 model.swap(move)
             elif type == "shift":
                 model.shift(move)
+            if monitor is not None:
+                monitor.swap_acceptances += type == "swap"
+                monitor.shift_acceptances += type == "shift"
             cost += delta
             iter = 0
             if cost_best < cost:
                 cost_best = cost
-                forward_embed_best = copy.deepcopy(model.forward_embed)
-                print(f"Updated best cost: {cost_best}")
+                model.mark_best()
+                if monitor is not None:
+                    monitor.improved(step, cost_best)
                 if cost_best == len(model.guest.edges):
-                    print("Solution found")
-                    return _to_dwave_embedding(forward_embed_best)
+                    return _finish(model, "solved", step + 1, monitor, return_status)
         else:
             iter += 1
-        if iter == len(moves):
+        if iter == len(swap_moves) + len(shift_moves):
             model.randomize()
             cost = model.initial_cost
-            print(f"Random restart with new cost: {cost}")
-
-    return _to_dwave_embedding(forward_embed_best)
-
+            if monitor is not None:
+                monitor.event(step, f"Random restart with new cost: {cost}")
 
-def _to_dwave_embedding(emb):
-    result = {i: list(emb[i]) for i in range(len(emb))}
-    return result
+    return _finish(model, "exhausted", step + 1, monitor, return_status)
@@ -0,0 +1,41 @@
+import numpy as np
+
+__all__ = ["greedy_placement"]
+
+
+def greedy_placement(guest_adj: np.ndarray, contact: np.ndarray) -> np.ndarray:
+    """
+    Assign guest vertices to the chains of a guiding pattern so that adjacent guest vertices
+    tend to land on chains in contact. Guest vertices are placed one at a time, the one with
+    the most placed neighbours first (ties broken by degree), each onto the free chain in
+    contact with the most chains of its placed neighbours (ties broken by the number of
+    contacts of the chain). The scores of all guest vertices on all chains are kept in a matrix
+    which placing vertex v on chain c updates by adding row c of contact to the rows of the
+    neighbours of v.
+
+    Args:
+        guest_adj: (n, n) 0/1 adjacency matrix of the guest
+        contact: (n, n) 0/1 contact matrix of the chains
+
+    Returns: chain of every guest vertex, a permutation of range(n), see BaseModel.relabel.
+    """
+    n = len(guest_adj)
+    guest_adj = np.asarray(guest_adj, dtype=np.int64)
+    contact = np.asarray(contact > 0, dtype=np.int64)
+    guest_degree, chain_degree = guest_adj.sum(axis=1), contact.sum(axis=1)
+    lowest = np.iinfo(np.int64).min
+
+    order = np.full(n, -1, dtype=np.int64)
+    # Placed neighbours of every guest vertex, and contacts of every chain with them
+    placed_nbs = np.zeros(n, dtype=np.int64)
+    scores = np.zeros((n, n), dtype=np.int64)
+    vertex_free, chain_free = np.ones(n, dtype=bool), np.ones(n, dtype=bool)
+    for _ in range(n):
+        v = int(np.argmax(np.where(vertex_free, placed_nbs * (n + 1) + guest_degree, lowest)))
+        c = int(np.argmax(np.where(chain_free, scores[v] * (n + 1) + chain_degree, lowest)))
+        order[v] = c
+        vertex_free[v], chain_free[c] = False, False
+        nbs = np.flatnonzero(guest_adj[v])
+        placed_nbs[nbs] += 1
+        scores[nbs] += contact[c]
+    return order
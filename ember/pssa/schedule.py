@@ -0,0 +1,176 @@
+import time
+from functools import partial
+from typing import Callable, Tuple
+
+import numpy as np
+
+__all__ = ["AnnealingSchedule", "coa_schedule", "pssa_schedule", "metropolis_thresholds",
+           "scale_by_time"]
+
+
+class AnnealingSchedule:
+    """
+    Precompiled annealing schedule. Instead of calling a Python function on every step, the
+    temperature, shift_mode and any_dir of a whole block of steps are computed with NumPy, along
+    with the random numbers of the Metropolis test. run_simulated_annealing detects this class
+    and takes its compiled path; the object also remains callable like a plain schedule.
+    """
+
+    def __init__(self,
+                 temperature: Callable[[np.ndarray], np.ndarray],
+                 shift_probability: Callable[[np.ndarray], np.ndarray],
+                 any_dir_probability: Callable[[np.ndarray], np.ndarray] = None,
+                 block_size: int = 4096):
+        """
+        Args:
+            temperature: maps an array of steps to their temperatures
+            shift_probability: maps an array of steps to the probability of a shift step
+            any_dir_probability: maps an array of steps to the probability that a shift step
+                may move in any direction, never if not given
+            block_size: number of steps compiled at a time
+        """
+        self.temperature = temperature
+        self.shift_probability = shift_probability
+        self.any_dir_probability = any_dir_probability
+        self.block_size = block_size
+
+    def block(self, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Compile steps start to stop - 1.
+
+        Returns: Tuple (thresholds, shift_mode, any_dir) of arrays. A move with cost change
+            delta passes the Metropolis test iff delta > threshold, as
+            exp(delta / T) > u <=> delta > T * log(u); a zero temperature accepts everything.
+        """
+        return self.compile(np.arange(start, stop))
+
+    def compile(self, steps: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        As block, for an arbitrary array of steps which need not be integers.
+        """
+        thresholds = metropolis_thresholds(np.broadcast_to(self.temperature(steps), steps.shape))
+        shift_mode = np.random.random(len(steps)) < self.shift_probability(steps)
+        if self.any_dir_probability is None:
+            any_dir = np.zeros(len(steps), dtype=bool)
+        else:
+            any_dir = shift_mode & (np.random.random(len(steps)) < self.any_dir_probability(steps))
+        return thresholds, shift_mode, any_dir
+
+    def __call__(self, step: int) -> Tuple[float, bool, bool]:
+        steps = np.array([step])
+        temperature = float(np.broadcast_to(self.temperature(steps), steps.shape)[0])
+        shift_mode = bool(np.random.random() < self.shift_probability(steps)[0])
+        any_dir = self.any_dir_probability is not None and shift_mode \
+            and bool(np.random.random() < self.any_dir_probability(steps)[0])
+        return temperature, shift_mode, any_dir
+
+
+class _TimeScaledSchedule:
+    """
+    Plain schedule whose progression follows the clock, see scale_by_time.
+    """
+
+    def __init__(self, schedule: Callable[[int], Tuple[float, bool, bool]], max_iterations: int,
+                 time_budget: float):
+        self.schedule = schedule
+        self.max_iterations = max_iterations
+        self.time_budget = time_budget
+        self.start = time.perf_counter()
+
+    def __call__(self, step: int) -> Tuple[float, bool, bool]:
+        progress = (time.perf_counter() - self.start) / self.time_budget
+        return self.schedule(min(int(progress * self.max_iterations), self.max_iterations - 1))
+
+
+class _TimeScaledAnnealingSchedule(AnnealingSchedule):
+    """
+    AnnealingSchedule whose progression follows the clock, see scale_by_time. The time of each
+    step of a block is extrapolated from the step rate of the previous block.
+    """
+
+    def __init__(self, schedule: AnnealingSchedule, max_iterations: int, time_budget: float):
+        super().__init__(schedule.temperature, schedule.shift_probability,
+                         schedule.any_dir_probability, schedule.block_size)
+        self.max_iterations = max_iterations
+        self.time_budget = time_budget
+        self.start = time.perf_counter()
+        self._last_block = None
+
+    def block(self, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        elapsed = time.perf_counter() - self.start
+        times = np.full(stop - start, elapsed)
+        if self._last_block is not None and elapsed > self._last_block[1]:
+            rate = (start - self._last_block[0]) / (elapsed - self._last_block[1])
+            times += np.arange(stop - start) / rate
+        self._last_block = start, elapsed
+        return self.compile(np.minimum(times / self.time_budget * self.max_iterations,
+                                       self.max_iterations - 1))
+
+    def __call__(self, step: int) -> Tuple[float, bool, bool]:
+        progress = (time.perf_counter() - self.start) / self.time_budget
+        return super().__call__(min(int(progress * self.max_iterations), self.max_iterations - 1))
+
+
+def scale_by_time(schedule, max_iterations: int, time_budget: float):
+    """
+    Make a schedule progress with elapsed wall-clock time instead of the step count: at time t
+    after this call it behaves like step t / time_budget * max_iterations of the original
+    schedule, so it reaches its final temperature as the budget runs out.
+
+    Args:
+        schedule: a plain schedule or an AnnealingSchedule
+        max_iterations: number of steps the schedule was written for
+        time_budget: seconds over which to spread those steps
+
+    Returns: a schedule of the same kind
+    """
+    if isinstance(schedule, AnnealingSchedule):
+        return _TimeScaledAnnealingSchedule(schedule, max_iterations, time_budget)
+    return _TimeScaledSchedule(schedule, max_iterations, time_budget)
+
+
+def metropolis_thresholds(temperatures: np.ndarray) -> np.ndarray:
+    """
+    Draw the Metropolis test of one step per temperature: a move with cost change delta is
+    accepted iff delta > threshold. Zero temperatures accept every move.
+    """
+    with np.errstate(divide="ignore"):
+        thresholds = temperatures * np.log(np.random.random(len(temperatures)))
+    thresholds[temperatures == 0] = -np.inf
+    return thresholds
+
+
+def _two_phase_temperature(steps: np.ndarray, max_iterations: int) -> np.ndarray:
+    progress_ratio = steps / max_iterations
+    return np.where(steps < max_iterations // 2,
+                    0.603 * (1 - 2 * progress_ratio),
+                    0.334 * 2 * (1 - progress_ratio))
+
+
+def _coa_shift_probability(steps: np.ndarray, max_iterations: int) -> np.ndarray:
+    return 1 - (0.3 * steps / max_iterations - 1) ** 2
+
+
+def _pssa_shift_probability(steps: np.ndarray, max_iterations: int) -> np.ndarray:
+    return np.minimum(1.2 * steps / max_iterations, 0.8)
+
+
+def _pssa_any_dir_probability(steps: np.ndarray, max_iterations: int) -> np.ndarray:
+    return np.where(steps < max_iterations // 2, 0.8 * steps / max_iterations, 1.0)
+
+
+def coa_schedule(max_iterations: int) -> AnnealingSchedule:
+    """
+    Compiled form of the schedule used for CliqueOverlapModel in ember.pssa.example.
+    """
+    return AnnealingSchedule(partial(_two_phase_temperature, max_iterations=max_iterations),
+                             partial(_coa_shift_probability, max_iterations=max_iterations))
+
+
+def pssa_schedule(max_iterations: int) -> AnnealingSchedule:
+    """
+    Compiled form of the schedule used for ProbabilisticSwapShiftModel in ember.pssa.example.
+    """
+    return AnnealingSchedule(partial(_two_phase_temperature, max_iterations=max_iterations),
+                             partial(_pssa_shift_probability, max_iterations=max_iterations),
+                             partial(_pssa_any_dir_probability, max_iterations=max_iterations))
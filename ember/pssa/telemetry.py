@@ -0,0 +1,135 @@
+from typing import List, Tuple
+
+__all__ = ["Telemetry", "PrintSink", "Recorder"]
+
+
+class Telemetry:
+    """
+    Receives the progress of an optimizer run from ember.pssa.optimize. Subclass it and override
+    the hooks of interest; every hook does nothing by default. Optimizers run without telemetry
+    unless one is passed, and then skip all of this bookkeeping.
+
+    Counters passed to on_sample and on_finish are cumulative over the run:
+        steps: steps taken
+        swap_proposals, swap_acceptances: swap moves scored and applied
+        shift_proposals, shift_acceptances: shift moves drawn and applied
+        shift_none: shift proposals for which the model had no legal move
+        elapsed: seconds since the start of the run
+        moves_per_second: steps / elapsed
+    Optimizers which do not propose moves one at a time only report the counters that apply.
+    """
+
+    def __init__(self, interval: int = 10000):
+        """
+        Args:
+            interval: number of steps between calls to on_sample
+        """
+        self.interval = interval
+
+    def on_start(self, optimizer: str, optimal: int, cost: int):
+        """
+        Args:
+            optimizer: name of the optimizer function
+            optimal: cost of a full embedding
+            cost: initial cost, None for run_multi_start where it differs between runs
+        """
+        pass
+
+    def on_improvement(self, step: int, elapsed: float, cost: int):
+        """
+        Called whenever the best cost improves.
+        """
+        pass
+
+    def on_event(self, step: int, message: str):
+        """
+        Called on notable events such as kicks and restarts.
+        """
+        pass
+
+    def on_sample(self, step: int, counters: dict):
+        pass
+
+    def on_finish(self, step: int, status: str, counters: dict):
+        """
+        Args:
+            status: one of "solved", "deadline", "cancelled" or "exhausted"
+        """
+        pass
+
+
+class PrintSink(Telemetry):
+    """
+    Prints progress to stdout, as the optimizers used to do.
+    """
+
+    def __init__(self, interval: int = 10000, samples: bool = False):
+        """
+        Args:
+            interval: number of steps between samples
+            samples: also print the counters every interval steps
+        """
+        super().__init__(interval)
+        self.samples = samples
+
+    def on_start(self, optimizer: str, optimal: int, cost: int):
+        print(f"Optimal: {optimal}")
+
+    def on_improvement(self, step: int, elapsed: float, cost: int):
+        print(f"Updated best cost: {cost}")
+
+    def on_event(self, step: int, message: str):
+        print(message)
+
+    def on_sample(self, step: int, counters: dict):
+        if self.samples:
+            print("\t".join(f"{key}: {value:.6g}" for key, value in counters.items()))
+
+    def on_finish(self, step: int, status: str, counters: dict):
+        if status == "solved":
+            print("Solution found")
+        elif status == "exhausted":
+            print("No solution found")
+        else:
+            print("Stopped: {}".format(status))
+
+
+class Recorder(Telemetry):
+    """
+    Keeps everything in memory, e.g. for dashboards or tests.
+
+    Attributes:
+        optimizer: name of the optimizer
+        best_costs: best cost trajectory as (step, elapsed, cost)
+        events: (step, message) pairs
+        samples: (step, counters) pairs
+        status: final status
+        counters: final counters
+    """
+
+    def __init__(self, interval: int = 10000):
+        super().__init__(interval)
+        self.optimizer = None
+        self.best_costs: List[Tuple[int, float, int]] = []
+        self.events: List[Tuple[int, str]] = []
+        self.samples: List[Tuple[int, dict]] = []
+        self.status = None
+        self.counters = None
+
+    def on_start(self, optimizer: str, optimal: int, cost: int):
+        self.optimizer = optimizer
+        if cost is not None:
+            self.best_costs.append((0, 0.0, cost))
+
+    def on_improvement(self, step: int, elapsed: float, cost: int):
+        self.best_costs.append((step, elapsed, cost))
+
+    def on_event(self, step: int, message: str):
+        self.events.append((step, message))
+
+    def on_sample(self, step: int, counters: dict):
+        self.samples.append((step, counters))
+
+    def on_finish(self, step: int, status: str, counters: dict):
+        self.status = status
+        self.counters = counters
@@ -0,0 +1,47 @@
+import random
+from collections import deque
+
+import pytest
+
+from ember.pssa.chains import ChainStore
+
+
+@pytest.mark.parametrize("slack", [1, 8])
+def test_chain_store_matches_deques(slack):
+    random.seed(slack)
+    expected = [deque(range(10 * n, 10 * n + random.randint(1, 6))) for n in range(20)]
+    chains = ChainStore(expected, slack=slack)
+
+    for step in range(5000):
+        n1, n2 = random.sample(range(len(expected)), 2)
+        op = random.randrange(3)
+        if op == 0 and len(expected[n2]) > 1:
+            # Move an endpoint of n2 onto either end of n1, like a shift
+            g = expected[n2].pop() if random.getrandbits(1) else expected[n2].popleft()
+            assert (chains.pop(n2) if g == chains.last(n2) else chains.popleft(n2)) == g
+            if random.getrandbits(1):
+                expected[n1].append(g)
+                chains.append(n1, g)
+            else:
+                expected[n1].appendleft(g)
+                chains.appendleft(n1, g)
+        elif op == 1:
+            expected[n1], expected[n2] = expected[n2], expected[n1]
+            chains.swap(n1, n2)
+        for n in (n1, n2):
+            assert chains.length(n) == len(expected[n])
+            assert chains.first(n) == expected[n][0] and chains.last(n) == expected[n][-1]
+
+    assert [list(chain) for chain in chains] == [list(chain) for chain in expected]
+    copy = chains.copy()
+    copy.swap(0, 1)
+    assert list(chains[0]) == list(expected[0])
+    restored = ChainStore.from_packed(*chains.packed())
+    assert [list(chain) for chain in restored] == [list(chain) for chain in expected]
+    # Relocated chains leave regions behind, which compaction bounds
+    assert len(chains.buffer) <= 4 * sum(len(chain) + 2 * max(slack, len(chain) // 2)
+                                         for chain in expected) + 1000
+
+
+if __name__ == '__main__':
+    pytest.main()
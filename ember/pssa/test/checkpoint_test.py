@@ -0,0 +1,96 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ember.hardware.chimera import ChimeraGraph
+from ember.pssa.checkpoint import load_checkpoint, save_checkpoint
+from ember.pssa.model import CliqueOverlapModel, ProbabilisticSwapShiftModel
+from ember.pssa.optimize import run_simulated_annealing
+from ember.pssa.schedule import coa_schedule
+from ember.pssa.telemetry import Recorder
+
+host = ChimeraGraph(6, 4)
+guest = nx.gnp_random_graph(26, 0.15, seed=2)
+
+
+@pytest.mark.parametrize("model_cls", [ProbabilisticSwapShiftModel, CliqueOverlapModel])
+@pytest.mark.parametrize("graph_engine", ["dict", "array"])
+def test_checkpoint_round_trip(model_cls, graph_engine, tmp_path):
+    random.seed(0)
+    model = model_cls(guest, host, graph_engine=graph_engine)
+    for _ in range(20):
+        model.swap(model.random_swap_move())
+    model.mark_best()
+    for _ in range(50):
+        shift_move = model.random_shift_move(True)
+        if shift_move:
+            model.shift(shift_move)
+        model.swap(model.random_swap_move())
+    path = str(tmp_path / "run.npz")
+    save_checkpoint(path, model, 1234, 40)
+    expected_random, expected_np = random.random(), np.random.random()
+
+    restored = model_cls(guest, host, graph_engine=graph_engine)
+    assert load_checkpoint(path, restored) == (1234, 40)
+    assert random.random() == expected_random and np.random.random() == expected_np
+    # Chain order matters for ProbabilisticSwapShiftModel only
+    assert [list(chain) if model_cls is ProbabilisticSwapShiftModel else set(chain)
+            for chain in restored.forward_embed] == \
+           [list(chain) if model_cls is ProbabilisticSwapShiftModel else set(chain)
+            for chain in model.forward_embed]
+    assert restored.inverse_embed == model.inverse_embed
+    assert restored.best_embedding() == model.best_embedding()
+    for n1 in range(len(guest)):
+        for n2 in range(len(guest)):
+            assert restored.contact_graph.has_edge(n1, n2) == model.contact_graph.has_edge(n1, n2)
+            if model.contact_graph.has_edge(n1, n2):
+                assert restored.contact_graph.edge_weight(n1, n2) == \
+                       model.contact_graph.edge_weight(n1, n2)
+            if n1 != n2:
+                assert restored.delta_swap((n1, n2)) == model.delta_swap((n1, n2))
+    restored.mark_best()
+    model.mark_best()
+    assert restored.best_embedding() == model.best_embedding()
+
+
+def test_checkpoint_rejects_other_model(tmp_path):
+    path = str(tmp_path / "run.npz")
+    save_checkpoint(path, CliqueOverlapModel(guest, host), 0, 0)
+    with pytest.raises(Exception):
+        load_checkpoint(path, CliqueOverlapModel(nx.gnp_random_graph(26, 0.15, seed=3), host))
+
+
+class CancelAfter:
+    def __init__(self, checks):
+        self.checks = checks
+
+    def is_set(self):
+        self.checks -= 1
+        return self.checks < 0
+
+
+def test_simulated_annealing_resumes(tmp_path):
+    random.seed(5)
+    np.random.seed(5)
+    path = str(tmp_path / "run.npz")
+    big_guest, big_host = nx.gnp_random_graph(60, 0.5, seed=5), ChimeraGraph(8, 4)
+    model = CliqueOverlapModel(big_guest, big_host)
+    _, status = run_simulated_annealing(model, coa_schedule(3000), 3000, cancel=CancelAfter(4),
+                                        check_interval=100, checkpoint=path, return_status=True)
+    assert status == "cancelled"
+    assert load_checkpoint(path, CliqueOverlapModel(big_guest, big_host))[0] == 400
+
+    recorder = Recorder()
+    resumed = CliqueOverlapModel(big_guest, big_host)
+    _, status = run_simulated_annealing(resumed, coa_schedule(3000), 3000, checkpoint=path,
+                                        checkpoint_interval=1000, resume=True,
+                                        return_status=True, telemetry=recorder)
+    assert recorder.events[0] == (400, "Resumed from {} at step 400".format(path))
+    assert status == "exhausted"
+    assert recorder.counters["swap_proposals"] + recorder.counters["shift_proposals"] == 2600
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -2,7 +2,7 @@ import networkx as nx
 import pytest
 
 from ember.hardware.chimera import ChimeraGraph
-from ember.pssa.model import BaseModel
+from ember.pssa.model import BaseModel, CliqueOverlapModel, ProbabilisticSwapShiftModel
 
 
 def test_chimera_distance_dict():
@@ -43,5 +43,27 @@ def test_contact_graph():
     assert not contact.has_edge(1, 3)
 
 
+@pytest.mark.parametrize("model_cls", [ProbabilisticSwapShiftModel, CliqueOverlapModel])
+@pytest.mark.parametrize("graph_engine", ["dict", "array"])
+def test_contact_graph_matches_chimera_distance(model_cls, graph_engine):
+    guest = nx.gnp_random_graph(25, 0.3, seed=4)
+    host = ChimeraGraph(4, 4)
+    model = model_cls(guest, host, graph_engine=graph_engine)
+    embed = model.forward_embed
+
+    expected, cost = {}, 0
+    for n1 in range(len(embed)):
+        for n2 in range(n1):
+            weight = sum(1 for g1 in embed[n1] for g2 in embed[n2]
+                         if model._chimera_distance(g1, g2) == 1)
+            if weight > 0:
+                expected[(n2, n1)] = weight
+                cost += 1 if guest.has_edge(n1, n2) else 0
+
+    contact = model.contact_graph
+    assert {e: contact.edge_weight(*e) for e in contact.edges} == expected
+    assert model.initial_cost == cost
+
+
 if __name__ == '__main__':
     pytest.main()
@@ -20,6 +20,7 @@ def delta_shift(input, contact, target, inverse, g_from, g_to):
     model = ProbabilisticSwapShiftModel(input, D_WAVE_2000Q())
     model.contact_graph = contact
     model.host = target
+    model.host_neighbours = tuple(tuple(target[g]) for g in range(len(target)))
     model.inverse_embed = inverse
     return model.delta_shift((g_from, g_to))
 
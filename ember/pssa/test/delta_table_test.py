@@ -0,0 +1,85 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ember.hardware.chimera import ChimeraGraph
+from ember.pssa.delta_table import DeltaTable
+from ember.pssa.model import CliqueOverlapModel, ProbabilisticSwapShiftModel
+
+
+@pytest.mark.parametrize("graph_engine", ["dict", "array"])
+def test_table_tracks_moves(graph_engine):
+    random.seed(0)
+    guest = nx.gnp_random_graph(40, 0.3, seed=1)
+    model = CliqueOverlapModel(guest, ChimeraGraph(8, 4), graph_engine=graph_engine)
+    table = DeltaTable(model)
+    swap_moves, shift_moves = model.all_moves()
+
+    for _ in range(40):
+        if random.random() < 0.5:
+            table.swap(random.choice(swap_moves))
+        else:
+            table.shift(random.choice(shift_moves))
+        for move in swap_moves[::5]:
+            assert table.swap_deltas[move] == model.delta_swap(move)
+        assert table.shift_deltas.tolist() == [model.delta_shift(z) for z in shift_moves]
+
+
+def test_table_follows_pssa_shift_moves():
+    random.seed(2)
+    guest = nx.gnp_random_graph(40, 0.2, seed=2)
+    model = ProbabilisticSwapShiftModel(guest, ChimeraGraph(8, 4))
+    table = DeltaTable(model)
+    swap_moves, shift_moves = model.all_moves()
+
+    for _ in range(40):
+        if random.random() < 0.5:
+            table.swap(random.choice(swap_moves))
+        else:
+            table.shift(shift_moves.choice())
+        assert set(table.shift_moves) == set(shift_moves)
+        for move in swap_moves[::5]:
+            assert table.swap_deltas[move] == model.delta_swap(move)
+        assert table.shift_deltas.tolist() == [model.delta_shift(z) for z in table.shift_moves]
+
+
+def test_best_move():
+    random.seed(1)
+    guest = nx.gnp_random_graph(40, 0.3, seed=1)
+    model = CliqueOverlapModel(guest, ChimeraGraph(8, 4))
+    table = DeltaTable(model)
+    swap_moves, shift_moves = model.all_moves()
+
+    best = max([(model.delta_swap(move), "swap", move) for move in swap_moves]
+               + [(model.delta_shift(move), "shift", move) for move in shift_moves],
+               key=lambda entry: entry[0])
+    assert table.best_move()[0] == best[0]
+
+
+@pytest.mark.parametrize("model_cls", [CliqueOverlapModel, ProbabilisticSwapShiftModel])
+def test_best_move_tracks_moves(model_cls):
+    random.seed(3)
+    np.random.seed(3)
+    guest = nx.gnp_random_graph(40, 0.3, seed=3)
+    model = model_cls(guest, ChimeraGraph(8, 4))
+    table = DeltaTable(model)
+    swap_moves = model.all_moves()[0]
+
+    for _ in range(30):
+        table.swap(random.choice(swap_moves))
+        if table.shift_moves:
+            table.shift(random.choice(table.shift_moves))
+        allowed = np.random.random(len(guest)) < 0.7
+        for vertex_allowed in (None, allowed):
+            swaps = [(table.swap_deltas[move], move) for move in swap_moves
+                     if vertex_allowed is None or vertex_allowed[list(move)].all()]
+            shifts = list(zip(table.shift_deltas, table.shift_moves))
+            # First best move in all_moves() order, swaps first
+            best_delta, best = max(swaps + shifts, key=lambda entry: entry[0])
+            assert table.best_move(vertex_allowed)[::2] == (best_delta, best)
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,93 @@
+import networkx as nx
+import pytest
+
+from ember.pssa.graph import ArrayGraph, IndexedSet, MutableGraph
+
+
+def build(graph_cls):
+    graph = graph_cls(nx.empty_graph(5), include_edges=False)
+    graph.add_edge(0, 1, weight=2)
+    graph.add_edge(1, 2)
+    graph.add_edge(3, 4, weight=3)
+    return graph
+
+
+@pytest.mark.parametrize("graph_cls", [MutableGraph, ArrayGraph])
+def test_weights(graph_cls):
+    graph = build(graph_cls)
+    graph.increment_edge_weight(1, 2)
+    graph.increment_edge_weight(0, 4)
+    graph.decrement_edge_weight(0, 1)
+    graph.decrement_edge_weight(3, 4)
+
+    assert graph.edge_weight(0, 1) == 1
+    assert graph.edge_weight(2, 1) == 2
+    assert graph.edge_weight(4, 0) == 1
+    assert graph.edge_weight(3, 4) == 2
+    assert not graph.has_edge(0, 2)
+    assert graph.edges == {(0, 1), (1, 2), (0, 4), (3, 4)}
+
+    graph.decrement_edge_weight(0, 1)
+    assert not graph.has_edge(0, 1)
+    with pytest.raises(KeyError):
+        graph.edge_weight(0, 1)
+
+
+@pytest.mark.parametrize("graph_cls", [MutableGraph, ArrayGraph])
+def test_swap_node(graph_cls):
+    graph = build(graph_cls)
+    graph.swap_node(1, 3)
+
+    assert graph.edge_weight(0, 3) == 2
+    assert graph.edge_weight(3, 2) == 1
+    assert graph.edge_weight(1, 4) == 3
+    assert not graph.has_edge(0, 1)
+    assert sorted(graph.neighbours(3)) == [0, 2]
+    assert graph.edges == {(0, 3), (2, 3), (1, 4)}
+
+
+@pytest.mark.parametrize("graph_cls", [MutableGraph, ArrayGraph])
+def test_permute(graph_cls):
+    graph = build(graph_cls)
+    graph.swap_node(0, 2)
+    graph.permute([4, 2, 0, 1, 3])
+
+    assert graph.edge_weight(1, 3) == 2
+    assert graph.edge_weight(2, 3) == 1
+    assert graph.edge_weight(0, 4) == 3
+    assert graph.edges == {(1, 3), (2, 3), (0, 4)}
+    weights = graph.weight_matrix()
+    assert weights[1, 3] == weights[3, 1] == 2 and weights[0, 4] == 3
+    assert weights.sum() == 12
+
+
+@pytest.mark.parametrize("graph_cls", [MutableGraph, ArrayGraph])
+def test_neighbour_arrays(graph_cls):
+    graph = build(graph_cls)
+    graph.increment_edge_weight(1, 4)
+    graph.decrement_edge_weight(1, 2)
+    graph.swap_node(0, 4)
+    graph.remove_edge(3, 0)
+
+    expected = {0: [1], 1: [0, 4], 2: [], 3: [], 4: [1]}
+    for n, nbs in expected.items():
+        assert sorted(graph.neighbours(n)) == nbs
+    for _ in range(20):
+        assert graph.random_neighbour(1) in (0, 4)
+
+
+def test_indexed_set():
+    items = IndexedSet([3, 1, 4])
+    items.add(1)
+    items.remove(3)
+    items.discard(7)
+    items.add(5)
+
+    assert len(items) == 3
+    assert sorted(items) == [1, 4, 5]
+    assert 3 not in items
+    assert items.choice() in (1, 4, 5)
+
+
+if __name__ == '__main__':
+    pytest.main()
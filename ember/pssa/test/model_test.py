@@ -0,0 +1,210 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ember.hardware.chimera import ChimeraGraph, ChimeraLattice
+from ember.pssa.model import CliqueOverlapModel, ProbabilisticSwapShiftModel
+
+
+@pytest.mark.parametrize("m, l", [(1, 4), (3, 4), (4, 2)])
+def test_chimera_lattice_adjacency(m, l):
+    lattice, graph = ChimeraLattice(m, l), ChimeraGraph(m, l)
+
+    assert len(lattice) == len(graph)
+    assert all(sorted(lattice[g]) == sorted(graph[g]) for g in graph)
+
+
+@pytest.mark.parametrize("graph_engine", ["dict", "array"])
+def test_large_host_tracks_default(graph_engine):
+    random.seed(0)
+    guest = nx.gnp_random_graph(30, 0.2, seed=1)
+    model = ProbabilisticSwapShiftModel(guest, ChimeraGraph(6, 4))
+    random.seed(0)
+    large = ProbabilisticSwapShiftModel(guest, ChimeraLattice(6, 4), graph_engine=graph_engine,
+                                        large_host=True)
+    assert isinstance(large.inverse_embed, np.ndarray)
+    assert large.initial_cost == model.initial_cost
+
+    for _ in range(300):
+        shift_move = model.random_shift_move(True)
+        if shift_move:
+            assert large.delta_shift(shift_move) == model.delta_shift(shift_move)
+            model.shift(shift_move)
+            large.shift(shift_move)
+        swap_move = model.random_swap_move()
+        assert large.delta_swap(swap_move) == model.delta_swap(swap_move)
+        model.swap(swap_move)
+        large.swap(swap_move)
+    model.mark_best()
+    large.mark_best()
+
+    assert [list(chain) for chain in large.forward_embed] == \
+           [list(chain) for chain in model.forward_embed]
+    assert large.best_embedding() == model.best_embedding()
+
+
+def legal_shift_moves(model, any_dir):
+    """
+    Every shift move random_shift_move could propose, found by scanning all chain endpoints.
+    """
+    moves = set()
+    chains, inverse = model.forward_embed, model.inverse_embed
+    for n_to in range(len(chains)):
+        if chains.length(n_to) < 2:
+            continue
+        for g_to in (chains.first(n_to), chains.last(n_to)):
+            for g_from in model.host[g_to]:
+                n_from = inverse[g_from]
+                if n_from == -1 or n_from == n_to \
+                        or g_from not in (chains.first(n_from), chains.last(n_from)):
+                    continue
+                if any_dir or model.inverse_guiding_pattern[g_from] == \
+                        model.inverse_guiding_pattern[g_to]:
+                    moves.add((g_from, g_to))
+    return moves
+
+
+@pytest.mark.parametrize("large_host", [False, True])
+def test_shift_move_index(large_host):
+    random.seed(2)
+    host = ChimeraLattice(6, 4) if large_host else ChimeraGraph(6, 4)
+    model = ProbabilisticSwapShiftModel(nx.gnp_random_graph(40, 0.2, seed=2), host,
+                                        large_host=large_host)
+    for step in range(500):
+        shift_move = model.random_shift_move(step % 2 == 0)
+        assert shift_move is not None
+        model.shift(shift_move)
+        model.swap(model.random_swap_move())
+        if step % 50 == 0:
+            for any_dir in (False, True):
+                moves = model._any_dir_shifts if any_dir else model._pattern_shifts
+                assert set(moves) == legal_shift_moves(model, any_dir)
+
+
+def test_rejection_shift_sampler():
+    random.seed(4)
+    model = ProbabilisticSwapShiftModel(nx.gnp_random_graph(40, 0.2, seed=4), ChimeraGraph(6, 4),
+                                        shift_sampler="rejection")
+    shifts = 0
+    for step in range(2000):
+        any_dir = step % 2 == 0
+        shift_move = model.random_shift_move(any_dir)
+        if shift_move is not None:
+            assert shift_move in legal_shift_moves(model, any_dir)
+            model.shift(shift_move)
+            shifts += 1
+        if step == 1000:
+            # all_moves starts keeping the index of legal shift moves
+            assert set(model.all_moves()[1]) == legal_shift_moves(model, True)
+    assert shifts > 0
+    assert set(model._any_dir_shifts) == legal_shift_moves(model, True)
+    with pytest.raises(ValueError):
+        ProbabilisticSwapShiftModel(nx.empty_graph(4), ChimeraGraph(6, 4), shift_sampler="x")
+
+
+@pytest.mark.parametrize("model_cls", [ProbabilisticSwapShiftModel, CliqueOverlapModel])
+@pytest.mark.parametrize("graph_engine", ["dict", "array"])
+def test_randomize_relabels_chains(model_cls, graph_engine):
+    random.seed(3)
+    guest = nx.gnp_random_graph(40, 0.2, seed=3)
+    model = model_cls(guest, ChimeraGraph(6, 4), graph_engine=graph_engine)
+    for _ in range(100):
+        shift_move = model.random_shift_move(True)
+        if shift_move is not None:
+            model.shift(shift_move)
+    chains = sorted(sorted(chain) for chain in model.forward_embed)
+    shift_moves = list(model.all_moves()[1])
+
+    model.randomize()
+    assert sorted(sorted(chain) for chain in model.forward_embed) == chains
+    assert sorted(model.all_moves()[1]) == sorted(shift_moves)
+    if model_cls is ProbabilisticSwapShiftModel:
+        assert set(shift_moves) == legal_shift_moves(model, True)
+    assert all(model.inverse_embed[g] == n
+               for n, chain in enumerate(model.forward_embed) for g in chain)
+    model.mark_best()
+    assert np.array_equal(model.best_labels, model.labels())
+
+    weights, cost = model.contact_graph.weight_matrix(), model.initial_cost
+    model._create_contact_graph(model.forward_embed)
+    assert np.array_equal(weights, model.contact_graph.weight_matrix())
+    assert cost == model.initial_cost
+
+
+@pytest.mark.parametrize("model_cls,large_host", [(ProbabilisticSwapShiftModel, False),
+                                                  (ProbabilisticSwapShiftModel, True),
+                                                  (CliqueOverlapModel, False)])
+def test_warm_start(model_cls, large_host):
+    random.seed(5)
+    guest = nx.gnp_random_graph(40, 0.2, seed=5)
+    host = ChimeraLattice(6, 4) if large_host else ChimeraGraph(6, 4)
+    kwargs = {"large_host": True} if large_host else {}
+    model = model_cls(guest, host, **kwargs)
+    for _ in range(200):
+        shift_move = model.random_shift_move(True)
+        if shift_move is not None:
+            model.shift(shift_move)
+        model.swap(model.random_swap_move())
+    model.mark_best()
+
+    # best_embedding lists chain qubits in label order, not in path order
+    warm = model_cls(guest, host, initial_embedding=model.best_embedding(), **kwargs)
+    assert warm.initial_cost == int(np.count_nonzero(
+        (model.contact_graph.weight_matrix() > 0) & (model.guest_adj > 0))) // 2
+    assert np.array_equal(warm.contact_graph.weight_matrix(),
+                          model.contact_graph.weight_matrix())
+    assert np.array_equal(warm.best_labels, model.labels())
+    if model_cls is ProbabilisticSwapShiftModel:
+        assert all(g2 in warm.host_neighbours[g1]
+                   for chain in warm.forward_embed for g1, g2 in zip(chain, chain[1:]))
+        assert set(warm.all_moves()[1]) == legal_shift_moves(warm, True)
+    else:
+        assert [set(chain) for chain in warm.forward_embed] == model.forward_embed
+
+    broken = model.best_embedding()
+    broken[0], broken[1] = broken[0] + broken[1][:1], broken[1][1:] or broken[2]
+    match = "not a path" if model_cls is ProbabilisticSwapShiftModel else "not a state"
+    with pytest.raises(ValueError, match=match):
+        model_cls(guest, host, initial_embedding=broken, **kwargs)
+
+
+def reference_overlap(model, z_idx):
+    """
+    Shift neighbourhood computed directly from Chimera coordinates.
+    """
+    m, l = model.host.params
+    cell, unit = z_idx // 4, z_idx % 4
+    to_linear, inverse = model.chimera_to_linear, model.inverse_embed
+    g_minors = [to_linear((1 + cell, c, 1, unit)) for c in range(cell + 1)]
+    n_minors = []
+    for c in range(cell + 1):
+        for u in range(l):
+            g = to_linear((1 + cell, c, 0, u))
+            if g not in inverse:
+                return g_minors, n_minors
+            n_minors.append(inverse[g])
+    return g_minors, n_minors
+
+
+@pytest.mark.parametrize("num_vertices", [70, 90, 124])
+def test_overlap_tables(num_vertices):
+    random.seed(num_vertices)
+    guest = nx.gnp_random_graph(num_vertices, 0.2, seed=1)
+    model = CliqueOverlapModel(guest, ChimeraGraph(16, 4))
+    model.randomize()
+    m, _ = model.host.params
+    for z_idx in model.all_moves()[1]:
+        g_minors, n_minors = reference_overlap(model, z_idx)
+        assert list(model._get_g_minors(z_idx)) == g_minors
+        assert list(model._get_n_minors(z_idx)) == n_minors
+        cell, unit = z_idx // 4, z_idx % 4
+        assert model._get_overlap_state(z_idx) == tuple(
+            model.inverse_embed[model.chimera_to_linear(q)]
+            for q in ((1 + cell, cell, 0, unit), (1 + cell, m - 1, 1, unit),
+                      (1 + cell, cell, 1, unit)))
+
+
+if __name__ == '__main__':
+    pytest.main()
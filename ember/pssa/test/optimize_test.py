@@ -0,0 +1,372 @@
+import os
+import random
+import threading
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ember.hardware.chimera import ChimeraGraph
+from ember.pssa.model import CliqueOverlapModel, ProbabilisticSwapShiftModel
+from ember.pssa.optimize import run_multi_start, run_parallel_tempering, \
+    run_next_descent_with_random_restarts, run_simulated_annealing, \
+    run_steepest_descent_with_kicks, run_tabu_search
+from ember.pssa.schedule import AnnealingSchedule, coa_schedule
+from ember.pssa.telemetry import Recorder
+
+host = ChimeraGraph(6, 4)
+guest = nx.gnp_random_graph(26, 0.15, seed=2)
+
+
+def embedding_cost(emb, guest, host):
+    inverse = {g: n for n, chain in emb.items() for g in chain}
+    contacts = {(inverse[g1], inverse[g2]) for g1, g2 in host.edges
+                if g1 in inverse and g2 in inverse}
+    return sum(1 for n1, n2 in guest.edges if (n1, n2) in contacts or (n2, n1) in contacts)
+
+
+def current_embedding(model):
+    return {n: sorted(model.forward_embed[n]) for n in range(len(model.guest))}
+
+
+def schedule(step):
+    return 0.6 * (1 - step / 20000), step % 3 == 0, step % 2 == 0
+
+
+@pytest.mark.parametrize("model_cls", [ProbabilisticSwapShiftModel, CliqueOverlapModel])
+def test_best_embedding_snapshot(model_cls):
+    random.seed(0)
+    model = model_cls(guest, host)
+    for _ in range(10):
+        model.swap(model.random_swap_move())
+    model.mark_best()
+    expected = current_embedding(model)
+    for _ in range(10):
+        model.swap(model.random_swap_move())
+
+    assert {n: sorted(chain) for n, chain in model.best_embedding().items()} == expected
+
+
+@pytest.mark.parametrize("model_cls", [ProbabilisticSwapShiftModel, CliqueOverlapModel])
+def test_simulated_annealing_returns_best(model_cls):
+    random.seed(1)
+    model = model_cls(guest, host)
+    initial_cost = model.initial_cost
+    emb = run_simulated_annealing(model, schedule, 20000)
+
+    qubits = [g for chain in emb.values() for g in chain]
+    assert len(qubits) == len(set(qubits))
+    assert all(emb.values())
+    assert embedding_cost(emb, guest, host) >= initial_cost
+
+
+def test_simulated_annealing_solves():
+    random.seed(1)
+    model = CliqueOverlapModel(guest, host)
+    emb = run_simulated_annealing(model, schedule, 20000)
+
+    assert embedding_cost(emb, guest, host) == len(guest.edges)
+
+
+def test_steepest_descent_with_kicks_returns_best():
+    random.seed(4)
+    model = CliqueOverlapModel(guest, host)
+    initial_cost = model.initial_cost
+    emb = run_steepest_descent_with_kicks(model, 5, 200)
+
+    assert embedding_cost(emb, guest, host) >= initial_cost
+
+
+def test_next_descent_without_moves():
+    model = CliqueOverlapModel(guest, host)
+    model.all_moves = lambda: ([], [])
+    emb, status = run_next_descent_with_random_restarts(model, 1000, return_status=True)
+
+    assert status == "exhausted"
+    assert embedding_cost(emb, guest, host) == model.initial_cost
+
+
+def test_tabu_search_solves():
+    random.seed(4)
+    model = CliqueOverlapModel(guest, host)
+    emb = run_tabu_search(model, 2000)
+
+    qubits = [g for chain in emb.values() for g in chain]
+    assert len(qubits) == len(set(qubits))
+    assert embedding_cost(emb, guest, host) == len(guest.edges)
+
+
+def test_tabu_search_keeps_shifted_qubits_tabu():
+    random.seed(4)
+    big_guest = nx.gnp_random_graph(60, 0.5, seed=5)
+    model = ProbabilisticSwapShiftModel(big_guest, ChimeraGraph(8, 4))
+    shifted = []
+    shift = model.shift
+    model.shift = lambda move: shifted.append(move[1]) or shift(move)
+    run_tabu_search(model, 100, tenure=1000)
+
+    assert shifted
+    assert len(shifted) == len(set(shifted))
+
+
+def test_tabu_search_moves_when_every_move_is_tabu():
+    random.seed(0)
+    model = CliqueOverlapModel(nx.gnp_random_graph(10, 0.9, seed=1), ChimeraGraph(2, 4))
+    recorder = Recorder()
+    run_tabu_search(model, 200, tenure=10 ** 6, telemetry=recorder)
+
+    counters = recorder.counters
+    assert recorder.status == "exhausted"
+    assert counters["swap_acceptances"] + counters["shift_acceptances"] == counters["steps"] == 200
+
+
+def test_warm_start_from_solution():
+    random.seed(4)
+    emb = run_tabu_search(CliqueOverlapModel(guest, host), 2000)
+    # A guest which lost an edge is still embedded by the solution
+    changed = guest.copy()
+    changed.remove_edge(*next(iter(guest.edges)))
+    recorder = Recorder()
+    model = CliqueOverlapModel(changed, host, initial_embedding=emb)
+    emb, status = run_simulated_annealing(model, schedule, 20000, return_status=True,
+                                          telemetry=recorder)
+
+    assert model.initial_cost == len(changed.edges)
+    assert status == recorder.status == "solved"
+    assert recorder.counters["steps"] == 0
+    assert embedding_cost(emb, changed, host) == len(changed.edges)
+
+
+def test_compiled_simulated_annealing_solves():
+    np.random.seed(1)
+    random.seed(1)
+    compiled = AnnealingSchedule(lambda steps: 0.6 * (1 - steps / 20000),
+                                 lambda steps: 1 / 3, lambda steps: 1 / 2)
+    model = CliqueOverlapModel(guest, host)
+    emb = run_simulated_annealing(model, compiled, 20000)
+
+    assert embedding_cost(emb, guest, host) == len(guest.edges)
+
+
+def test_delta_swap_batch():
+    random.seed(6)
+    np.random.seed(6)
+    model = CliqueOverlapModel(nx.gnp_random_graph(30, 0.4, seed=6), host, graph_engine="array")
+    n1, n2 = model.random_swap_moves(40)
+    deltas, interactions = model.delta_swap_batch(n1, n2)
+
+    assert list(deltas) == [model.delta_swap((a, b)) for a, b in zip(n1, n2)]
+    model.swap((n1[0], n2[0]))
+    disjoint = [i for i in range(1, 40) if not {n1[i], n2[i]} & {n1[0], n2[0]}]
+    assert disjoint
+    for i in disjoint:
+        assert deltas[i] + interactions[i, 0] == model.delta_swap((n1[i], n2[i]))
+
+
+@pytest.mark.parametrize("shift_probability", [0.0, 1 / 3])
+def test_batched_simulated_annealing(shift_probability):
+    np.random.seed(1)
+    random.seed(1)
+    compiled = AnnealingSchedule(lambda steps: 0.6 * (1 - steps / 20000),
+                                 lambda steps: shift_probability, lambda steps: 1 / 2)
+    model = CliqueOverlapModel(guest, host, graph_engine="array")
+    recorder = Recorder()
+    emb, status = run_simulated_annealing(model, compiled, 20000, return_status=True,
+                                          batch_size=64, telemetry=recorder)
+
+    assert embedding_cost(emb, guest, host) == recorder.best_costs[-1][2]
+    if shift_probability:
+        assert status == "solved"
+        assert embedding_cost(emb, guest, host) == len(guest.edges)
+
+
+def test_batched_simulated_annealing_requirements():
+    compiled = AnnealingSchedule(lambda steps: 0.6, lambda steps: 0.0, lambda steps: 0.5)
+    with pytest.raises(Exception):
+        run_simulated_annealing(CliqueOverlapModel(guest, host), compiled, 100, batch_size=64)
+    with pytest.raises(Exception):
+        run_simulated_annealing(CliqueOverlapModel(guest, host, graph_engine="array"),
+                                schedule, 100, batch_size=64)
+
+
+def hot_shift_schedule(step):
+    return 100.0, True, False
+
+
+def test_simulated_annealing_applies_first_coa_shift():
+    model = CliqueOverlapModel(guest, host)
+    model.random_shift_move = lambda *args: 0
+    before = model._get_overlap_state(0)[2]
+    recorder = Recorder()
+    run_simulated_annealing(model, hot_shift_schedule, 1, telemetry=recorder)
+
+    assert model._get_overlap_state(0)[2] != before
+    assert recorder.counters["shift_none"] == 0
+    assert recorder.counters["shift_acceptances"] == 1
+
+
+def move_schedule(step):
+    return step % 3 == 0, step % 2 == 0
+
+
+def test_parallel_tempering_solves():
+    random.seed(3)
+    model = CliqueOverlapModel(guest, host)
+    emb = run_parallel_tempering(model, [0.05, 0.15, 0.4], move_schedule, 20000,
+                                 exchange_interval=500, seed=3)
+
+    qubits = [g for chain in emb.values() for g in chain]
+    assert len(qubits) == len(set(qubits))
+    assert embedding_cost(emb, guest, host) == len(guest.edges)
+
+
+def failing_schedule(step):
+    if step == 700:
+        raise ValueError("schedule failed")
+    return False, False
+
+
+def exiting_schedule(step):
+    if step == 700:
+        os._exit(3)
+    return False, False
+
+
+def test_parallel_tempering_worker_failure():
+    model = CliqueOverlapModel(nx.gnp_random_graph(60, 0.5, seed=5), ChimeraGraph(8, 4))
+    with pytest.raises(Exception, match="schedule failed"):
+        run_parallel_tempering(model, [0.05, 0.2], failing_schedule, 20000,
+                               exchange_interval=500, seed=1)
+    with pytest.raises(Exception, match="exited with code 3"):
+        run_parallel_tempering(model, [0.05, 0.2], exiting_schedule, 20000,
+                               exchange_interval=500, seed=1)
+
+
+def test_multi_start_cancels_after_solution():
+    emb, runs = run_multi_start(CliqueOverlapModel, guest, host, schedule, 20000, num_runs=4,
+                                processes=2, seed=5)
+
+    assert embedding_cost(emb, guest, host) == len(guest.edges)
+    assert any(run["solved"] for run in runs)
+    assert all(run["cost"] == len(guest.edges) for run in runs if run["solved"])
+    assert len({run["seed"] for run in runs}) == len(runs)
+    assert all(run["iterations"] <= 20000 and run["walltime"] > 0 for run in runs)
+
+
+def cold_schedule(step):
+    return 0.0001, False, False
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_simulated_annealing_deadline(compiled):
+    random.seed(5)
+    big_guest = nx.gnp_random_graph(60, 0.5, seed=5)
+    model = CliqueOverlapModel(big_guest, ChimeraGraph(8, 4))
+    schedule = coa_schedule(10 ** 6) if compiled else cold_schedule
+    emb, status = run_simulated_annealing(model, schedule, 10 ** 6, time_budget=0.2,
+                                          return_status=True)
+
+    assert status == "deadline"
+    assert embedding_cost(emb, big_guest, ChimeraGraph(8, 4)) >= model.initial_cost
+
+
+def test_simulated_annealing_progress_by_time():
+    random.seed(5)
+    model = CliqueOverlapModel(guest, host)
+    emb, status = run_simulated_annealing(model, coa_schedule(20000), 20000, time_budget=5,
+                                          progress="time", return_status=True)
+
+    assert status == "solved"
+
+
+def test_optimizers_cancelled():
+    cancel = threading.Event()
+    cancel.set()
+    model = CliqueOverlapModel(guest, host)
+    assert run_simulated_annealing(model, schedule, 1000, cancel=cancel,
+                                   return_status=True)[1] == "cancelled"
+    assert run_steepest_descent_with_kicks(model, 5, 1000, cancel=cancel,
+                                           return_status=True)[1] == "cancelled"
+    assert run_tabu_search(model, 1000, cancel=cancel, return_status=True)[1] == "cancelled"
+    assert run_multi_start(CliqueOverlapModel, guest, host, schedule, 1000, num_runs=2,
+                           processes=2, cancel=cancel, return_status=True)[2] == "cancelled"
+
+
+def test_parallel_tempering_deadline():
+    big_guest = nx.gnp_random_graph(60, 0.5, seed=5)
+    model = CliqueOverlapModel(big_guest, ChimeraGraph(8, 4))
+    emb, status = run_parallel_tempering(model, [0.05, 0.2], move_schedule, 10 ** 7,
+                                         exchange_interval=10 ** 6, seed=1, time_budget=0.5,
+                                         return_status=True)
+
+    assert status == "deadline"
+    assert all(emb.values())
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_simulated_annealing_telemetry(compiled, capsys):
+    random.seed(1)
+    np.random.seed(1)
+    model = CliqueOverlapModel(guest, host)
+    recorder = Recorder(interval=1000)
+    run_simulated_annealing(model, coa_schedule(20000) if compiled else schedule, 20000,
+                            telemetry=recorder)
+
+    assert capsys.readouterr().out == ""
+    assert recorder.optimizer == "run_simulated_annealing"
+    assert recorder.status == "solved"
+    costs = [cost for _, _, cost in recorder.best_costs]
+    assert costs[0] == model.initial_cost and costs[-1] == len(guest.edges)
+    assert costs == sorted(set(costs))
+    counters = recorder.counters
+    assert counters["swap_proposals"] + counters["shift_proposals"] == counters["steps"]
+    assert counters["swap_acceptances"] <= counters["swap_proposals"]
+    assert counters["shift_acceptances"] <= counters["shift_proposals"]
+    assert counters["shift_none"] == 0
+    assert [step for step, _ in recorder.samples] == sorted(step for step, _ in recorder.samples)
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_simulated_annealing_counts_moves(compiled):
+    random.seed(1)
+    np.random.seed(1)
+    model = CliqueOverlapModel(nx.gnp_random_graph(60, 0.5, seed=5), ChimeraGraph(8, 4))
+    proposed, accepted = [], []
+    random_shift_move, shift, swap = model.random_shift_move, model.shift, model.swap
+    model.random_shift_move = lambda *args: proposed.append(random_shift_move(*args)) or \
+        proposed[-1]
+    model.shift = lambda move: accepted.append("shift") or shift(move)
+    model.swap = lambda move: accepted.append("swap") or swap(move)
+    if compiled:
+        schedule_ = AnnealingSchedule(lambda steps: 0.6 * (1 - steps / 20000),
+                                      lambda steps: 1 / 3, lambda steps: 1 / 2)
+    else:
+        schedule_ = schedule
+    recorder = Recorder()
+    run_simulated_annealing(model, schedule_, 3000, telemetry=recorder)
+
+    counters = recorder.counters
+    # COA shift move 0 is a move like any other
+    assert 0 in proposed
+    assert counters["steps"] == 3000
+    assert counters["shift_proposals"] == len(proposed)
+    assert counters["swap_proposals"] == 3000 - len(proposed)
+    assert counters["shift_none"] == 0
+    assert counters["shift_acceptances"] == accepted.count("shift")
+    assert counters["swap_acceptances"] == accepted.count("swap")
+
+
+def test_tabu_search_telemetry():
+    random.seed(4)
+    model = CliqueOverlapModel(guest, host)
+    recorder = Recorder()
+    run_tabu_search(model, 2000, telemetry=recorder)
+
+    assert recorder.status == "solved"
+    assert recorder.best_costs[-1][2] == len(guest.edges)
+    assert recorder.counters["swap_acceptances"] + recorder.counters["shift_acceptances"] == \
+        recorder.counters["steps"]
+
+
+if __name__ == '__main__':
+    pytest.main()
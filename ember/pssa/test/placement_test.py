@@ -0,0 +1,48 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ember.hardware.adjacency import adjacency_matrix
+from ember.hardware.chimera import ChimeraGraph
+from ember.pssa.model import CliqueOverlapModel, ProbabilisticSwapShiftModel
+from ember.pssa.placement import greedy_placement
+
+
+def test_greedy_placement_recovers_contacts():
+    # Chains in contact like a shuffled path, a random assignment keeps about 2 of its edges
+    contact = adjacency_matrix(nx.relabel_nodes(nx.path_graph(20), dict(enumerate(
+        np.random.RandomState(0).permutation(20).tolist()))))
+    order = greedy_placement(adjacency_matrix(nx.path_graph(20)), contact)
+
+    assert sorted(order.tolist()) == list(range(20))
+    assert sum(contact[order[v], order[v + 1]] for v in range(19)) >= 15
+
+
+@pytest.mark.parametrize("model_cls", [ProbabilisticSwapShiftModel, CliqueOverlapModel])
+def test_greedy_placement_model(model_cls):
+    random.seed(0)
+    guest = nx.gnp_random_graph(40, 0.2, seed=4)
+    identity = model_cls(guest, ChimeraGraph(6, 4))
+    greedy = model_cls(guest, ChimeraGraph(6, 4), placement="greedy")
+
+    assert greedy.initial_cost > identity.initial_cost
+    assert np.array_equal(greedy.best_labels, greedy.labels())
+    weights = greedy.contact_graph.weight_matrix()
+    greedy._create_contact_graph(greedy.forward_embed)
+    assert np.array_equal(weights, greedy.contact_graph.weight_matrix())
+    with pytest.raises(ValueError, match="Unsupported placement: random"):
+        model_cls(guest, ChimeraGraph(6, 4), placement="random")
+
+
+@pytest.mark.parametrize("model_cls", [ProbabilisticSwapShiftModel, CliqueOverlapModel])
+def test_greedy_placement_rejects_initial_embedding(model_cls):
+    guest = nx.gnp_random_graph(40, 0.2, seed=4)
+    emb = model_cls(guest, ChimeraGraph(6, 4)).best_embedding()
+    with pytest.raises(ValueError, match="initial embedding: greedy"):
+        model_cls(guest, ChimeraGraph(6, 4), placement="greedy", initial_embedding=emb)
+
+
+if __name__ == '__main__':
+    pytest.main()
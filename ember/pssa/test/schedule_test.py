@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+import pytest
+
+from ember.pssa.schedule import AnnealingSchedule, coa_schedule, pssa_schedule, scale_by_time
+
+
+def test_block_matches_schedule():
+    np.random.seed(0)
+    schedule = pssa_schedule(1000)
+    thresholds, shift_mode, any_dir = schedule.block(0, 1000)
+
+    assert thresholds.shape == shift_mode.shape == any_dir.shape == (1000,)
+    assert not (any_dir & ~shift_mode).any()
+    assert not shift_mode[:5].any() and shift_mode[-200:].mean() > 0.6
+    assert (thresholds <= 0).all()
+
+
+def test_thresholds_follow_metropolis():
+    np.random.seed(1)
+    schedule = AnnealingSchedule(lambda steps: 0.5, lambda steps: 0.0, block_size=100000)
+    thresholds, shift_mode, any_dir = schedule.block(0, 100000)
+
+    assert not shift_mode.any() and not any_dir.any()
+    for delta in (0, -1, -2):
+        assert (delta > thresholds).mean() == pytest.approx(np.exp(delta / 0.5), abs=0.01)
+
+    # Zero temperature accepts everything
+    thresholds, _, _ = AnnealingSchedule(lambda steps: 0.0, lambda steps: 0.0).block(0, 10)
+    assert (thresholds == -np.inf).all()
+
+
+def test_schedule_is_callable():
+    np.random.seed(2)
+    temperature, shift_mode, any_dir = coa_schedule(1000)(100)
+
+    assert temperature == pytest.approx(0.603 * 0.8)
+    assert isinstance(shift_mode, bool) and any_dir is False
+
+
+def test_scale_by_time():
+    plain = scale_by_time(lambda step: (step, False, False), 1000, 0.2)
+    compiled = scale_by_time(coa_schedule(1000), 1000, 0.2)
+    assert plain(999)[0] < 100
+    assert compiled(999)[0] > 0.5
+    time.sleep(0.1)
+
+    assert 400 <= plain(0)[0] < 1000
+    assert isinstance(compiled, AnnealingSchedule)
+    assert compiled(0)[0] < 0.45
+
+
+if __name__ == '__main__':
+    pytest.main()
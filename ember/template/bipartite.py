@@ -4,6 +4,7 @@ import numpy as np
 from networkx import Graph
 
 from ember.hardware.chimera import ChimeraGraph
+from ember.hardware.prepared import PreparedHost
 from ember.hardware.transform import bipartite_with_faults
 
 __all__ = ["BipartiteSat"]
@@ -100,6 +101,51 @@ def _run_bipartite_sat(I, input_edges, adj, h_count, v_count, verbose, timeout,
         return result
 
 
+def prepare_bipartite(host: ChimeraGraph):
+    """
+    Host-only part of BipartiteSat: the bipartite template and the adjacency between its two
+    partitions, with chains of identical adjacency grouped together.
+
+    Returns: Tuple (h_groups, v_groups, adj) where h_groups[i] and v_groups[j] are the chains
+        of row i and column j of adj
+    """
+    h_embed, v_embed = bipartite_with_faults(host)
+    adj = _construct_adj_matrix(host, h_embed, v_embed)
+    return _compress_to_unique(h_embed, v_embed, adj)
+
+
+def _construct_adj_matrix(host: ChimeraGraph, h_embed, v_embed):
+
+    def neighbours(graph, chain):
+        chain = set(chain)
+        nb_nodes = {node for c in chain for node in graph[c]}
+        nb_nodes.difference_update(chain)
+        return nb_nodes
+
+    v_inverse = {
+        v: i for i in range(len(v_embed)) for v in v_embed[i]
+    }
+
+    adj = np.zeros((len(h_embed), len(v_embed)))
+    for i, h_chain in enumerate(h_embed):
+        for nb in neighbours(host, h_chain):
+            adj[i][v_inverse[nb]] = 1
+
+    return adj
+
+
+# removes duplicate nodes and reconstruct adjacency matrix
+def _compress_to_unique(h_embed, v_embed, adj):
+    adj, h_inverse = np.unique(adj, return_inverse=True, axis=0)
+    adj, v_inverse = np.unique(adj, return_inverse=True, axis=1)
+    h_group, v_group = defaultdict(list), defaultdict(list)
+    for idx, chain in zip(h_inverse, h_embed):
+        h_group[idx].append(chain)
+    for idx, chain in zip(v_inverse, v_embed):
+        v_group[idx].append(chain)
+    return h_group, v_group, adj
+
+
 class BipartiteSat:
     """
     Extension of bipartite template-based minor embedding to allow embedding on Chimera graph with 
@@ -111,43 +157,17 @@ class BipartiteSat:
         """
         Args:
             guest (nx.Graph): a guest instance
-            host (ChimeraGraph): Any Chimera host instance
+            host (ChimeraGraph): Any Chimera host instance, or a PreparedHost to share the
+                template between guests
         """
+        prepared = PreparedHost.of(host, "bipartite")
         self.guest = guest
-        self.host = host
-        self.h_embed, self.v_embed = bipartite_with_faults(host)
-        self.adj = self._construct_adj_matrix()
-        self.h_embed, self.v_embed, self.adj = self._compress_to_unique()
-
-    def _construct_adj_matrix(self):
-
-        def neighbours(graph, chain):
-            chain = set(chain)
-            nb_nodes = {node for c in chain for node in graph[c]}
-            nb_nodes.difference_update(chain)
-            return nb_nodes
-
-        v_inverse = {
-            v: i for i in range(len(self.v_embed)) for v in self.v_embed[i]
-        }
-
-        adj = np.zeros((len(self.h_embed), len(self.v_embed)))
-        for i, h_chain in enumerate(self.h_embed):
-            for nb in neighbours(self.host, h_chain):
-                adj[i][v_inverse[nb]] = 1
-
-        return adj
-
-    # removes duplicate nodes and reconstruct adjacency matrix
-    def _compress_to_unique(self):
-        adj, h_inverse = np.unique(self.adj, return_inverse=True, axis=0)
-        adj, v_inverse = np.unique(adj, return_inverse=True, axis=1)
-        h_group, v_group = defaultdict(list), defaultdict(list)
-        for idx, chain in zip(h_inverse, self.h_embed):
-            h_group[idx].append(chain)
-        for idx, chain in zip(v_inverse, self.v_embed):
-            v_group[idx].append(chain)
-        return h_group, v_group, adj
+        self.host = prepared.host
+        h_embed, v_embed, adj = prepared.bipartite
+        self.adj = np.array(adj)
+        # solve hands out chains by popping them from their groups
+        self.h_embed = {i: list(chains) for i, chains in enumerate(h_embed)}
+        self.v_embed = {i: list(chains) for i, chains in enumerate(v_embed)}
 
     def solve(self, verbose=True, timeout=500, return_walltime=False):
         """
@@ -5,6 +5,7 @@ import numpy as np
 from ortools.sat.python import cp_model
 
 from ember.hardware.chimera import ChimeraGraph
+from ember.hardware.prepared import PreparedHost
 from ember.hardware.transform import quadripartite_with_faults
 
 __all__ = ["QuadripartiteSat"]
@@ -143,6 +144,104 @@ def _run_quadripartite(I, G, U1, U2, U3, U4, adj12, adj23, adj34, verbose,
         return result
 
 
+def prepare_quadripartite(host: ChimeraGraph):
+    """
+    Host-only part of QuadripartiteSat: the quadripartite template, the adjacency between
+    consecutive partitions with chains of identical adjacency grouped together, and the
+    adjacent chain pairs of partitions 2 and 3.
+
+    Returns: Tuple (U1, U2, U3, U4, adj12, adj23, adj34, U23) where Uk[i] are the chains of
+        group i of partition k and U23[(i, j)] the adjacent pairs of chains of groups U2[i] and
+        U3[j]
+    """
+    U1, U2, U3, U4 = quadripartite_with_faults(host)
+    chimera = host.internal
+    adj12 = _construct_adj_matrix(chimera, U1, U2)
+    adj23 = _construct_adj_matrix(chimera, U2, U3)
+    adj34 = _construct_adj_matrix(chimera, U3, U4)
+    U1, U2, U3, U4, adj12, adj23, adj34 = _compress_to_unique(chimera, U1, U2, U3, U4, adj12,
+                                                              adj23, adj34)
+    return U1, U2, U3, U4, adj12, adj23, adj34, _create_U2_U3_pairs(chimera, U2, U3, adj23)
+
+
+def _neighbours(graph, chain):
+    chain = set(chain)
+    nb_nodes = {node for c in chain for node in graph[c]}
+    nb_nodes.difference_update(chain)
+    return nb_nodes
+
+
+def _construct_adj_matrix(chimera, p1, p2):
+
+    v_inverse = {v: i for i in range(len(p2)) for v in p2[i]}
+
+    adj = np.zeros((len(p1), len(p2)))
+    for i, h_chain in enumerate(p1):
+        for nb in _neighbours(chimera, h_chain):
+            try:
+                adj[i][v_inverse[nb]] = 1
+            except:
+                pass
+    return adj
+
+
+# removes duplicate nodes and reconstruct adjacency matrix
+def _compress_to_unique(chimera, U1, U2, U3, U4, adj12, adj23, adj34):
+    u1_group, u2_group, u3_group, u4_group = \
+        defaultdict(list), defaultdict(list), defaultdict(list), defaultdict(list)
+
+    u2_ind, u3_ind = np.where(adj23 == 1)
+    adj1234 = np.concatenate([adj12[:, u2_ind], np.transpose(adj34[u3_ind, :])])
+    adj1234, adj1234_ind = np.unique(adj1234, return_inverse=True, axis=1)
+
+    adj12_ind = np.array(adj1234_ind)
+    for unconnected in sorted(set(range(len(U2))) - set(u2_ind)):
+        adj12_ind = np.insert(adj12_ind, unconnected, max(adj12_ind) + 1)
+
+    adj34_ind = np.array(adj1234_ind)
+    for unconnected in sorted(set(range(len(U3))) - set(u3_ind)):
+        adj34_ind = np.insert(adj34_ind, unconnected, max(adj34_ind) + 1)
+
+    for idx, chain in zip(adj12_ind, U2):
+        u2_group[idx].append(chain)
+
+    for idx, chain in zip(adj34_ind, U3):
+        u3_group[idx].append(chain)
+
+    new_u2 = [u2_group[key][0] for key in sorted(list(u2_group.keys()))]
+    new_u3 = [u3_group[key][0] for key in sorted(list(u3_group.keys()))]
+
+    adj12 = _construct_adj_matrix(chimera, U1, new_u2)
+    adj23 = _construct_adj_matrix(chimera, new_u2, new_u3)
+    adj34 = _construct_adj_matrix(chimera, new_u3, U4)
+
+    adj12, u1_inv = np.unique(adj12, return_inverse=True, axis=0)
+    adj34, u4_inv = np.unique(adj34, return_inverse=True, axis=1)
+
+    for idx, chain in zip(u1_inv, U1):
+        u1_group[idx].append(chain)
+
+    for idx, chain in zip(u4_inv, U4):
+        u4_group[idx].append(chain)
+
+    return u1_group, u2_group, u3_group, u4_group, adj12, adj23, adj34
+
+
+def _create_U2_U3_pairs(chimera, U2, U3, adj23):
+    index2, index3 = np.where(adj23 == 1)
+    U23 = defaultdict(list)
+
+    for i in range(len(index2)):
+        u2 = U2[index2[i]]
+        u3 = U3[index3[i]]
+        for chain2 in u2:
+            for nb in _neighbours(chimera, chain2):
+                for chain3 in u3:
+                    if nb in chain3:
+                        U23[(index2[i], index3[i])].append((chain2, chain3))
+    return U23
+
+
 class QuadripartiteSat:
     """
     extension of quadripartite template-based minor embedding to allow embedding on Chimera graph 
@@ -154,93 +253,18 @@ class QuadripartiteSat:
         """
         Args:
             guest (nx.Graph): a guest instance
-            host (ChimeraGraph): Any Chimera host instance
+            host (ChimeraGraph): Any Chimera host instance, or a PreparedHost to share the
+                template between guests
         """
+        prepared = PreparedHost.of(host, "quadripartite")
         self.guest = guest
-        self.host = host
-        self.U1, self.U2, self.U3, self.U4 = quadripartite_with_faults(host)
-        self.adj12 = self._construct_adj_matrix(self.U1, self.U2)
-        self.adj23 = self._construct_adj_matrix(self.U2, self.U3)
-        self.adj34 = self._construct_adj_matrix(self.U3, self.U4)
-        self.U1, self.U2, self.U3, self.U4, \
-        self.adj12, self.adj23, self.adj34 = self._compress_to_unique()
-        self.U23 = self._create_U2_U3_pairs()
-
-    def _neighbours(self, graph, chain):
-        chain = set(chain)
-        nb_nodes = {node for c in chain for node in graph[c]}
-        nb_nodes.difference_update(chain)
-        return nb_nodes
-
-    def _construct_adj_matrix(self, p1, p2):
-
-        v_inverse = {v: i for i in range(len(p2)) for v in p2[i]}
-        chimera = self.host.internal
-
-        adj = np.zeros((len(p1), len(p2)))
-        for i, h_chain in enumerate(p1):
-            for nb in self._neighbours(chimera, h_chain):
-                try:
-                    adj[i][v_inverse[nb]] = 1
-                except:
-                    pass
-        return adj
-
-    # removes duplicate nodes and reconstruct adjacency matrix
-    def _compress_to_unique(self):
-        u1_group, u2_group, u3_group, u4_group = \
-            defaultdict(list), defaultdict(list), defaultdict(list), defaultdict(list)
-
-        u2_ind, u3_ind = np.where(self.adj23 == 1)
-        adj1234 = np.concatenate([self.adj12[:, u2_ind], np.transpose(self.adj34[u3_ind, :])])
-        adj1234, adj1234_ind = np.unique(adj1234, return_inverse=True, axis=1)
-
-        adj12_ind = np.array(adj1234_ind)
-        for unconnected in sorted(set(range(len(self.U2))) - set(u2_ind)):
-            adj12_ind = np.insert(adj12_ind, unconnected, max(adj12_ind) + 1)
-
-        adj34_ind = np.array(adj1234_ind)
-        for unconnected in sorted(set(range(len(self.U3))) - set(u3_ind)):
-            adj34_ind = np.insert(adj34_ind, unconnected, max(adj34_ind) + 1)
-
-        for idx, chain in zip(adj12_ind, self.U2):
-            u2_group[idx].append(chain)
-
-        for idx, chain in zip(adj34_ind, self.U3):
-            u3_group[idx].append(chain)
-
-        new_u2 = [u2_group[key][0] for key in sorted(list(u2_group.keys()))]
-        new_u3 = [u3_group[key][0] for key in sorted(list(u3_group.keys()))]
-
-        adj12 = self._construct_adj_matrix(self.U1, new_u2)
-        adj23 = self._construct_adj_matrix(new_u2, new_u3)
-        adj34 = self._construct_adj_matrix(new_u3, self.U4)
-
-        adj12, u1_inv = np.unique(adj12, return_inverse=True, axis=0)
-        adj34, u4_inv = np.unique(adj34, return_inverse=True, axis=1)
-
-        for idx, chain in zip(u1_inv, self.U1):
-            u1_group[idx].append(chain)
-
-        for idx, chain in zip(u4_inv, self.U4):
-            u4_group[idx].append(chain)
-
-        return u1_group, u2_group, u3_group, u4_group, adj12, adj23, adj34
-
-    def _create_U2_U3_pairs(self):
-        index2, index3 = np.where(self.adj23 == 1)
-        U23 = defaultdict(list)
-        chimera = self.host.internal
-
-        for i in range(len(index2)):
-            u2 = self.U2[index2[i]]
-            u3 = self.U3[index3[i]]
-            for chain2 in u2:
-                for nb in self._neighbours(chimera, chain2):
-                    for chain3 in u3:
-                        if nb in chain3:
-                            U23[(index2[i], index3[i])].append((chain2, chain3))
-        return U23
+        self.host = prepared.host
+        U1, U2, U3, U4, adj12, adj23, adj34, U23 = prepared.quadripartite
+        # solve hands out chains by popping them from their groups
+        self.U1, self.U2, self.U3, self.U4 = (
+            {i: list(chains) for i, chains in enumerate(groups)} for groups in (U1, U2, U3, U4))
+        self.adj12, self.adj23, self.adj34 = np.array(adj12), np.array(adj23), np.array(adj34)
+        self.U23 = defaultdict(list, {key: list(pairs) for key, pairs in U23.items()})
 
     def solve(self, verbose=True, timeout=500, return_walltime=False):
         """
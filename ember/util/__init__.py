@@ -1,3 +1,5 @@
-__all__ = ["check_embedding", "plot_chimera_embedding"]
+__all__ = ["check_embedding", "plot_chimera_embedding", "EmbeddingCache", "embed_many"]
 
 from ember.util.dwave_tools import *
+from ember.util.batch import embed_many
+from ember.util.embedding_cache import EmbeddingCache
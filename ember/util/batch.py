@@ -0,0 +1,108 @@
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List
+
+import numpy as np
+from networkx import Graph
+
+from ember.hardware.prepared import PreparedHost
+from ember.pssa.model import CliqueOverlapModel, ProbabilisticSwapShiftModel
+from ember.pssa.optimize import run_simulated_annealing
+from ember.pssa.schedule import coa_schedule, pssa_schedule
+
+__all__ = ["embed_many"]
+
+_SOLVERS = ("pssa", "coa", "bipartite", "quadripartite")
+
+# Set in embed_many pool workers, see _init_batch_worker
+_batch_host = None
+
+
+def embed_many(guests: Iterable[Graph], host, solver: str = "coa",
+               max_iterations: int = 10 ** 6, processes: int = 1, seed: int = None,
+               timeout: float = 500, cache=None, **model_kwargs) -> List[Dict[int, List[int]]]:
+    """
+    Embed every guest into the same host, preparing the host data of the solver once instead
+    of once per guest, see ember.hardware.prepared.PreparedHost.
+
+    Args:
+        guests: guest graphs, each with vertices 0..len(guest)-1
+        host: ChimeraGraph (or ChimeraLattice for "pssa" and "coa"), or a PreparedHost covering
+            solver
+        solver: "pssa" (ProbabilisticSwapShiftModel with pssa_schedule), "coa"
+            (CliqueOverlapModel with coa_schedule), "bipartite" (BipartiteSat) or
+            "quadripartite" (QuadripartiteSat)
+        max_iterations: annealing steps per guest for "pssa" and "coa"
+        processes: number of worker processes; the prepared host is sent to each worker once
+        seed: if set, guest i is embedded with seed + i
+        timeout: maximum time per guest in seconds, the time budget of the annealing runs and
+            the timeout of the template solvers
+        cache: an EmbeddingCache consulted before solving a guest and given every full
+            embedding found
+        **model_kwargs: passed to the model for "pssa" and "coa"
+
+    Returns: embedding of every guest, in order. Embeddings the solver did not complete are
+        returned as found: partial for the templates, best found for the annealing models.
+    """
+    if solver not in _SOLVERS:
+        raise Exception("Unsupported solver: {}".format(solver))
+    prepared = PreparedHost.of(host, solver)
+    guests = list(guests)
+    seeds = [None if seed is None else seed + i for i in range(len(guests))]
+
+    embeddings = [None] * len(guests)
+    if cache is not None:
+        embeddings = [cache.get(guest, prepared.host) for guest in guests]
+    todo = [i for i in range(len(guests)) if embeddings[i] is None]
+
+    if processes > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context(),
+                                 initializer=_init_batch_worker, initargs=(prepared,)) as pool:
+            futures = {i: pool.submit(_embed_one, guests[i], None, solver, max_iterations,
+                                      seeds[i], timeout, model_kwargs) for i in todo}
+            for i in todo:
+                embeddings[i] = futures[i].result()
+    else:
+        for i in todo:
+            embeddings[i] = _embed_one(guests[i], prepared, solver, max_iterations, seeds[i],
+                                       timeout, model_kwargs)
+
+    if cache is not None:
+        for i in todo:
+            cache.put(guests[i], prepared.host, embeddings[i])
+    return embeddings
+
+
+def _init_batch_worker(prepared: PreparedHost):
+    global _batch_host
+    _batch_host = prepared
+
+
+def _embed_one(guest: Graph, prepared: PreparedHost, solver: str, max_iterations: int,
+               seed: int, timeout: float, model_kwargs: dict) -> Dict[int, List[int]]:
+    """
+    Embedding of a single guest by embed_many. In pool workers prepared is None and the host
+    set by _init_batch_worker is used.
+    """
+    if prepared is None:
+        prepared = _batch_host
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed % 2 ** 32)
+
+    # The template solvers need OR-Tools
+    if solver == "bipartite":
+        from ember.template.bipartite import BipartiteSat
+        return BipartiteSat(guest, prepared).solve(verbose=False, timeout=timeout)
+    if solver == "quadripartite":
+        from ember.template.quadripartite import QuadripartiteSat
+        return QuadripartiteSat(guest, prepared).solve(verbose=False, timeout=timeout)
+
+    if solver == "pssa":
+        model = ProbabilisticSwapShiftModel(guest, prepared, **model_kwargs)
+        schedule = pssa_schedule(max_iterations)
+    else:
+        model = CliqueOverlapModel(guest, prepared, **model_kwargs)
+        schedule = coa_schedule(max_iterations)
+    return run_simulated_annealing(model, schedule, max_iterations, time_budget=timeout)
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import time
+import uuid
+import zipfile
+import zlib
+from typing import Callable, Dict, List, Optional
+
+import networkx as nx
+import numpy as np
+from networkx import Graph
+from networkx.algorithms.isomorphism import GraphMatcher
+
+from ember.hardware.adjacency import csr_adjacency
+from ember.hardware.chimera import ChimeraGraph, ChimeraLattice
+from ember.pssa.graph import contact_weights
+
+__all__ = ["EmbeddingCache"]
+
+_FORMAT_VERSION = 1
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of full embeddings, shared by any solver, keyed by the guest up to
+    isomorphism and by the host preset: its params and fault sets.
+
+    Guests are bucketed by their Weisfeiler-Lehman hash, which isomorphic graphs share. On a
+    lookup every entry of the bucket is matched against the guest with VF2, and a cached
+    embedding is returned remapped through the isomorphism found. Entries are files in a
+    directory, written under unique names, and their modification times order them for LRU
+    eviction, so several processes can share a cache. Unreadable files are skipped.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1024):
+        """
+        Args:
+            path: cache directory, created if missing
+            max_entries: number of embeddings kept, the least recently used ones are evicted
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._clock = 0
+        os.makedirs(path, exist_ok=True)
+
+    def get(self, guest: Graph, host: ChimeraGraph) -> Optional[Dict[int, List[int]]]:
+        """
+        Returns: a cached embedding of guest, or of a graph isomorphic to it, into host, or None
+        """
+        embedding = self._lookup(guest, host)
+        if embedding is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return embedding
+
+    def _lookup(self, guest: Graph, host: ChimeraGraph) -> Optional[Dict[int, List[int]]]:
+        bucket = self._bucket(guest, host)
+        for name in self._entries(bucket):
+            file = os.path.join(self.path, name)
+            try:
+                with np.load(file, allow_pickle=False) as data:
+                    if int(data["format_version"]) != _FORMAT_VERSION:
+                        continue
+                    cached = nx.Graph()
+                    cached.add_nodes_from(range(len(data["chain_lengths"])))
+                    cached.add_edges_from(data["guest_edges"].tolist())
+                    chains = np.split(data["chains"], np.cumsum(data["chain_lengths"])[:-1])
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile, zlib.error):
+                # Evicted by another process, or corrupt
+                continue
+            matcher = GraphMatcher(guest, cached)
+            if matcher.is_isomorphic():
+                self._touch(file)
+                return {n: chains[matcher.mapping[n]].tolist() for n in guest}
+        return None
+
+    def put(self, guest: Graph, host: ChimeraGraph, embedding: Dict[int, List[int]]):
+        """
+        Store a full embedding of guest, a graph with vertices 0..len(guest)-1, into host. An
+        embedding that is not full is ignored.
+        """
+        if _is_full(embedding, guest, host) and self._lookup(guest, host) is None:
+            self._store(guest, host, embedding)
+
+    def _store(self, guest: Graph, host: ChimeraGraph, embedding: Dict[int, List[int]]):
+        chains = [np.asarray(embedding[n], dtype=np.int64) for n in range(len(guest))]
+        file = os.path.join(self.path, "{}_{}.npz".format(self._bucket(guest, host),
+                                                          uuid.uuid4().hex))
+        tmp = file + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f,
+                format_version=_FORMAT_VERSION,
+                guest_edges=np.array(list(guest.edges), dtype=np.int64).reshape(-1, 2),
+                chains=np.concatenate(chains),
+                chain_lengths=np.array([len(chain) for chain in chains], dtype=np.int64))
+        os.replace(tmp, file)
+        self._touch(file)
+        self._evict()
+
+    def embed(self, guest: Graph, host: ChimeraGraph,
+              solver: Callable[[Graph, ChimeraGraph], Dict[int, List[int]]]) \
+            -> Dict[int, List[int]]:
+        """
+        Look guest up and on a miss run solver(guest, host), caching its embedding if it is
+        full. For example
+
+            cache.embed(guest, host, lambda g, h: BipartiteSat(g, h).solve(verbose=False))
+
+        Returns: the cached or solved embedding
+        """
+        embedding = self.get(guest, host)
+        if embedding is None:
+            embedding = solver(guest, host)
+            # get just missed, put would look guest up again
+            if _is_full(embedding, guest, host):
+                self._store(guest, host, embedding)
+        return embedding
+
+    def _bucket(self, guest: Graph, host: ChimeraGraph) -> str:
+        faulty_edges = sorted(tuple(sorted(edge)) for edge in host.faulty_edges)
+        key = "{}|{}|{}|{}|{}|{}".format(
+            nx.weisfeiler_lehman_graph_hash(guest), len(guest), guest.number_of_edges(),
+            tuple(host.params), sorted(host.faulty_nodes), faulty_edges)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _entries(self, bucket: str) -> List[str]:
+        return sorted(name for name in os.listdir(self.path)
+                      if name.startswith(bucket) and name.endswith(".npz"))
+
+    def _touch(self, file: str):
+        """
+        Mark file as used now. Times only increase within a process, file system timestamps can
+        be coarser than the gap between two uses.
+        """
+        self._clock = max(time.time_ns(), self._clock + 1)
+        os.utime(file, ns=(self._clock, self._clock))
+
+    def _evict(self):
+        """
+        Remove the least recently used entries beyond max_entries.
+        """
+        files = [os.path.join(self.path, name) for name in os.listdir(self.path)
+                 if name.endswith(".npz")]
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=lambda file: os.stat(file).st_mtime_ns)
+        for file in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+
+
+def _is_full(embedding: Dict[int, List[int]], guest: Graph, host: ChimeraGraph) -> bool:
+    """
+    Returns: whether every guest vertex has a nonempty connected chain, no two chains share a
+        qubit and every guest edge is realised by a host edge between the two chains
+    """
+    if any(not embedding.get(n) for n in guest):
+        return False
+    inverse = {g: n for n in guest for g in embedding[n]}
+    if isinstance(host, ChimeraLattice):
+        indptr, indices = host.csr()
+    else:
+        m, l = host.params
+        indptr, indices = csr_adjacency(host, num_nodes=m * m * 2 * l)
+    if len(inverse) != sum(len(embedding[n]) for n in guest) \
+            or not all(0 <= g < len(indptr) - 1 and g not in host.faulty_nodes for g in inverse):
+        return False
+    if not all(_is_connected(embedding[n], indptr, indices) for n in guest):
+        return False
+    labels = np.full(len(indptr) - 1, -1, dtype=np.int64)
+    labels[list(inverse)] = list(inverse.values())
+    weights = contact_weights(indptr, indices, labels, len(guest))
+    return all(weights[n1, n2] > 0 for n1, n2 in guest.edges)
+
+
+def _is_connected(chain: List[int], indptr: np.ndarray, indices: np.ndarray) -> bool:
+    members = set(chain)
+    seen, todo = {chain[0]}, [chain[0]]
+    while todo:
+        g = todo.pop()
+        for g_nb in indices[indptr[g]:indptr[g + 1]].tolist():
+            if g_nb in members and g_nb not in seen:
+                seen.add(g_nb)
+                todo.append(g_nb)
+    return len(seen) == len(members)
@@ -0,0 +1,70 @@
+import pickle
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ember.hardware.chimera import ChimeraGraph
+from ember.hardware.prepared import PreparedHost
+from ember.pssa.model import CliqueOverlapModel, ProbabilisticSwapShiftModel
+from ember.util.batch import embed_many
+
+host = ChimeraGraph(6, 4)
+guests = [nx.gnp_random_graph(20, 0.2, seed=i) for i in range(3)]
+
+
+def test_prepared_host_pickles_read_only():
+    prepared = PreparedHost(host, ("pssa", "coa"))
+    assert not prepared.csr[0].flags.writeable
+    assert not prepared.double_triangle_labels.flags.writeable
+    with pytest.raises(Exception):
+        PreparedHost.of(prepared, "bipartite")
+
+    copy = pickle.loads(pickle.dumps(prepared))
+    assert copy.overlap_clique == prepared.overlap_clique
+    assert copy.double_triangle_clique == prepared.double_triangle_clique
+    assert copy.coordinates.linear_to_chimera(37) == prepared.coordinates.linear_to_chimera(37)
+    assert np.array_equal(copy.csr[1], prepared.csr[1])
+
+
+def test_prepared_host_skips_models_for_faulty_host():
+    faulty = ChimeraGraph(6, 4, node_faults=[5])
+    prepared = PreparedHost(faulty)
+    assert prepared.solvers == ()
+    assert prepared.csr is None
+    # The template solvers are only prepared when asked for
+    assert PreparedHost(host).solvers == ("pssa", "coa")
+    with pytest.raises(ValueError, match="not supported by solver: coa"):
+        PreparedHost(faulty, ("coa",))
+
+
+@pytest.mark.parametrize("model_cls,solver", [(ProbabilisticSwapShiftModel, "pssa"),
+                                              (CliqueOverlapModel, "coa")])
+def test_models_share_prepared_host(model_cls, solver):
+    prepared = PreparedHost(host, (solver,))
+    for guest in guests:
+        random.seed(0)
+        plain = model_cls(guest, host)
+        random.seed(0)
+        shared = model_cls(guest, prepared)
+        assert shared.host is host
+        assert shared.initial_cost == plain.initial_cost
+        assert shared.best_embedding() == plain.best_embedding()
+
+
+def is_embedding(emb, g, h):
+    return all(any(h.has_edge(q1, q2) for q1 in emb[n1] for q2 in emb[n2])
+               for n1, n2 in g.edges)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_embed_many(processes):
+    embeddings = embed_many(guests, host, solver="coa", max_iterations=20000,
+                            processes=processes, seed=0)
+    assert len(embeddings) == len(guests)
+    assert all(is_embedding(emb, guest, host) for emb, guest in zip(embeddings, guests))
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,107 @@
+import random
+
+import networkx as nx
+import pytest
+
+from ember.hardware.chimera import ChimeraGraph, ChimeraLattice
+from ember.pssa.model import CliqueOverlapModel
+from ember.pssa.optimize import run_tabu_search
+from ember.util.embedding_cache import EmbeddingCache
+
+host = ChimeraGraph(6, 4, node_faults=[3, 40])
+guest = nx.gnp_random_graph(20, 0.2, seed=2)
+
+
+def solve(g, h):
+    random.seed(0)
+    return run_tabu_search(CliqueOverlapModel(g, ChimeraGraph(6, 4)), 2000)
+
+
+def is_embedding(emb, g, h):
+    inverse = {q: n for n, chain in emb.items() for q in chain}
+    return all(any(h.has_edge(q1, q2) for q1 in emb[n1] for q2 in emb[n2])
+               for n1, n2 in g.edges) and len(inverse) == sum(map(len, emb.values()))
+
+
+def test_hit_remaps_isomorphic_guest(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    fault_free = ChimeraGraph(6, 4)
+    emb = cache.embed(guest, fault_free, solve)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    order = list(range(len(guest)))
+    random.Random(1).shuffle(order)
+    permuted = nx.relabel_nodes(guest, dict(enumerate(order)))
+    cached = EmbeddingCache(str(tmp_path)).embed(permuted, fault_free, pytest.fail)
+    assert is_embedding(cached, permuted, fault_free)
+    assert sorted(map(sorted, cached.values())) == sorted(map(sorted, emb.values()))
+
+    # Other faults are another host
+    assert cache.get(guest, host) is None
+    assert cache.get(nx.gnp_random_graph(20, 0.2, seed=3), fault_free) is None
+    assert (cache.hits, cache.misses) == (0, 3)
+
+
+def test_partial_embeddings_not_cached(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put(guest, host, {n: [] for n in guest})
+    assert cache.get(guest, host) is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_entries=2)
+    fault_free = ChimeraGraph(6, 4)
+    guests = [nx.gnp_random_graph(20, 0.2, seed=seed) for seed in (2, 3, 4)]
+    cache.embed(guests[0], fault_free, solve)
+    cache.embed(guests[1], fault_free, solve)
+    assert cache.get(guests[0], fault_free) is not None
+    cache.embed(guests[2], fault_free, solve)
+
+    assert cache.get(guests[1], fault_free) is None
+    assert cache.get(guests[0], fault_free) is not None
+    assert cache.get(guests[2], fault_free) is not None
+    assert cache.hits == 3
+
+
+def test_lattice_host(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    lattice = ChimeraLattice(6, 4)
+    emb = solve(guest, lattice)
+    cache.put(guest, lattice, emb)
+    assert cache.get(guest, lattice) is not None
+
+    # A qubit apart from the chain disconnects it
+    used = {g for chain in emb.values() for g in chain}
+    apart = next(g for g in range(len(lattice))
+                 if g not in used and not set(lattice[g]) & set(emb[0]))
+    broken = {**emb, 0: emb[0] + [apart]}
+    cache = EmbeddingCache(str(tmp_path / "other"))
+    cache.put(guest, lattice, broken)
+    assert cache.get(guest, lattice) is None
+
+
+def test_embed_looks_up_once(tmp_path, monkeypatch):
+    cache = EmbeddingCache(str(tmp_path))
+    lookups = []
+    lookup = cache._lookup
+    monkeypatch.setattr(cache, "_lookup", lambda *args: lookups.append(1) or lookup(*args))
+    cache.embed(guest, ChimeraGraph(6, 4), solve)
+    assert len(lookups) == 1
+    assert cache.get(guest, ChimeraGraph(6, 4)) is not None
+
+
+def test_corrupt_entries_skipped(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    fault_free = ChimeraGraph(6, 4)
+    cache.embed(guest, fault_free, solve)
+    file, = tmp_path.iterdir()
+    file.write_bytes(file.read_bytes()[:40])
+    assert cache.get(guest, fault_free) is None
+
+    cache.embed(guest, fault_free, solve)
+    assert cache.get(guest, fault_free) is not None
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+if __name__ == '__main__':
+    pytest.main()